@@ -0,0 +1,136 @@
+"""Micro-benchmark for parsing a campground availability sweep into records.
+
+Compares the original approach (plain dataclasses, string statuses and `strptime` for
+every date) with the slotted records, `CampsiteStatus` codes and cached ISO-date
+parser in `recyoself`.
+
+    python benchmarks/availability_records.py --sites 500 --days 90
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable
+
+from recyoself.campsite_availability import CampsiteAvailability
+from recyoself.utils.dates import parse_iso_date
+
+STATUSES = ["Available", "Reserved", "NYR", "Management", "Not Available"]
+
+
+@dataclass(order=True)
+class LegacyCampsiteAvailabilityInfo:
+
+    date: datetime.date = field(compare=True)
+    availability: str = field(compare=False)
+
+
+@dataclass
+class LegacyCampsiteAvailability:
+
+    campsite_id: str
+    _availabilities: list[LegacyCampsiteAvailabilityInfo] = field(
+        default_factory=list, repr=False
+    )
+
+
+def make_payload(num_sites: int, num_days: int) -> dict[str, dict]:
+    start = datetime.date(2024, 6, 1)
+    dates = [
+        f"{start + datetime.timedelta(days=d):%Y-%m-%d}T00:00:00Z"
+        for d in range(num_days)
+    ]
+    return {
+        str(cs_id): {
+            "availabilities": {
+                date: STATUSES[(cs_id + i) % len(STATUSES)]
+                for i, date in enumerate(dates)
+            }
+        }
+        for cs_id in range(num_sites)
+    }
+
+
+def parse_legacy(payload: dict[str, dict]) -> list:
+    availabilities = []
+    for cs_id, cs_data in payload.items():
+        cs_avail = LegacyCampsiteAvailability(cs_id)
+        for date, status in cs_data["availabilities"].items():
+            date = datetime.datetime.strptime(date, "%Y-%m-%dT%H:%M:%SZ").date()
+            cs_avail._availabilities.append(
+                LegacyCampsiteAvailabilityInfo(date=date, availability=status)
+            )
+        availabilities.append(cs_avail)
+    return availabilities
+
+
+def parse_current(payload: dict[str, dict]) -> list:
+    availabilities = []
+    for cs_id, cs_data in payload.items():
+        cs_avail = CampsiteAvailability(cs_id)
+        for date, status in cs_data["availabilities"].items():
+            cs_avail.add_availability(parse_iso_date(date), status)
+        availabilities.append(cs_avail)
+    return availabilities
+
+
+def measure(parse: Callable[[dict], list], payload: dict, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        parse(payload)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = parse(payload)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    del result
+
+    return {
+        "best_seconds": min(timings),
+        "allocated_blocks": sum(s.count_diff for s in stats),
+        "allocated_bytes": sum(s.size_diff for s in stats),
+        "peak_bytes": peak,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=500)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    payload = make_payload(args.sites, args.days)
+    results = {
+        "sites": args.sites,
+        "days": args.days,
+        "legacy": measure(parse_legacy, payload, args.repeat),
+        "current": measure(parse_current, payload, args.repeat),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.sites} sites x {args.days} days")
+    for name in ("legacy", "current"):
+        r = results[name]
+        print(
+            f"{name:>8}: {r['best_seconds'] * 1000:8.1f} ms, "
+            f"{r['allocated_blocks']:>8} blocks, {r['allocated_bytes'] / 1024:8.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""CLI startup cost: what importing the CLI (and resolving a command) loads.
+
+Runs each scenario in a fresh interpreter under `python -X importtime` and reports
+its import time and slowest modules. A scenario fails if it imports a module it's
+meant to leave alone (e.g. the interactive prompt libraries while running a daemon),
+or, given `--max-ms`, if importing the CLI takes longer than that.
+
+    python benchmarks/import_time.py --max-ms 300
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# only needed by a few commands, so resolving any other must not import them
+HEAVY = ["questionary", "prompt_toolkit", "tqdm", "http.server", "recyoself.ridb"]
+
+# (name, code run in a fresh interpreter, modules it must not import)
+SCENARIOS: list[tuple[str, str, list[str]]] = [
+    (
+        "import recyoself.cli",
+        "import recyoself.cli",
+        HEAVY + ["sqlalchemy", "sqlmodel", "requests", "recyoself.commands"],
+    ),
+    *(
+        (
+            command,
+            f"from recyoself.cli import cli; cli.get_command(None, {command!r})",
+            HEAVY + extra,
+        )
+        for command, extra in (
+            ("find-itinerary-dates", []),
+            ("find-campsite-dates", []),
+            ("list-facilities", ["requests"]),
+        )
+    ),
+]
+
+
+def import_times(code: str) -> list[tuple[str, int, int]]:
+    """(module, nesting depth, cumulative microseconds) for each module `code`
+    imports, in the order `-X importtime` reports them."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("package"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), depth, int(cumulative)))
+    return modules
+
+
+def measure(code: str, forbidden: list[str], repeat: int, top: int) -> dict:
+    # the fastest run is the one least disturbed by whatever else the machine does
+    runs = [import_times(code) for _ in range(repeat)]
+    best = min(runs, key=_total)
+    names = [name for name, _, _ in best]
+    # the imports made by `code` itself (nested ones are already in their times)
+    outermost = sorted(
+        ((name, us) for name, depth, us in best if depth == 0),
+        key=lambda m: m[1],
+        reverse=True,
+    )
+    return {
+        "total_ms": _total(best) / 1000,
+        "modules": len(best),
+        "slowest_ms": {name: us / 1000 for name, us in outermost[:top]},
+        "forbidden_imported": [
+            m for m in forbidden if any(n == m or n.startswith(f"{m}.") for n in names)
+        ],
+    }
+
+
+def _total(modules: list[tuple[str, int, int]]) -> int:
+    return sum(us for _, depth, us in modules if depth == 0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to show")
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="fail if importing the CLI takes longer than this",
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = {
+        name: measure(code, forbidden, args.repeat, args.top)
+        for name, code, forbidden in SCENARIOS
+    }
+    failures = [
+        f"{name} imported {', '.join(r['forbidden_imported'])}"
+        for name, r in results.items()
+        if r["forbidden_imported"]
+    ]
+    cli_ms = results[SCENARIOS[0][0]]["total_ms"]
+    if args.max_ms is not None and cli_ms > args.max_ms:
+        failures.append(f"importing the CLI took {cli_ms:.0f} ms (max {args.max_ms})")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            print(f"{name}: {r['total_ms']:.1f} ms, {r['modules']} modules")
+            for module, ms in r["slowest_ms"].items():
+                print(f"  {module:>30}: {ms:7.1f} ms")
+    if failures:
+        sys.exit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
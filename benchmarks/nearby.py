@@ -0,0 +1,106 @@
+"""Nearby facility lookups: full scan vs the (latitude, longitude) index vs R*Tree.
+
+Loads a synthetic database of facilities scattered over the US into a temporary
+directory and times finding those within a radius of a point, each way.
+
+    python benchmarks/nearby.py --facilities 100000 --radius 50
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable
+
+DATA_HOME = tempfile.mkdtemp(prefix="recyoself-bench-")
+os.environ["XDG_DATA_HOME"] = DATA_HOME
+
+from sqlmodel import insert, select
+
+from recyoself import db, geo
+from recyoself.models import Facility, Organization
+
+if DATA_HOME not in db.DATABASE_URL:
+    # platformdirs ignores XDG_DATA_HOME on macOS, don't touch the real database
+    sys.exit(f"Refusing to run against {db.DATABASE_URL}")
+
+# Glacier National Park
+CENTER = (48.7, -113.8)
+
+
+def populate(num_facilities: int) -> None:
+    db.init_db()
+    rng = random.Random(1)
+    with db.Session.begin() as session:
+        org = Organization(name="National Park Service", abbr="NPS", org_id=1)
+        session.add(org)
+        session.flush()
+        rows = [
+            {
+                "name": f"Facility {i}",
+                "facility_id": str(i),
+                "type": "campground",
+                "org_id": org.id,
+                "latitude": rng.uniform(25, 49),
+                "longitude": rng.uniform(-125, -67),
+            }
+            for i in range(num_facilities)
+        ]
+        session.execute(insert(Facility), rows)
+
+
+def full_scan(radius: float) -> Callable[[], int]:
+    def find() -> int:
+        with db.ReadSession.begin() as session:
+            return len(geo.nearest(session.scalars(select(Facility)), *CENTER, radius))
+
+    return find
+
+
+def bounding_box(radius: float, rtree: bool) -> Callable[[], int]:
+    stmt = geo.within_box(select(Facility), geo.bounding_box(*CENTER, radius), rtree)
+
+    def find() -> int:
+        with db.ReadSession.begin() as session:
+            return len(geo.nearest(session.scalars(stmt), *CENTER, radius))
+
+    return find
+
+
+def measure(func: Callable[[], int], repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = func()
+        timings.append(time.perf_counter() - start)
+    return {"best_seconds": min(timings), "found": found}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--facilities", type=int, default=100_000)
+    parser.add_argument("--radius", type=float, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    populate(args.facilities)
+    results = {
+        "full_scan": measure(full_scan(args.radius), args.repeat),
+        "lat_lon_index": measure(bounding_box(args.radius, False), args.repeat),
+        "rtree": measure(bounding_box(args.radius, True), args.repeat),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.facilities} facilities within {args.radius} mi")
+    for name, r in results.items():
+        print(f"{name:>13}: {r['best_seconds'] * 1000:8.1f} ms ({r['found']} found)")
+
+
+if __name__ == "__main__":
+    main()
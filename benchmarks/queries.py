@@ -0,0 +1,215 @@
+"""Query counts (and time) for the list commands and campsite lookups.
+
+Loads a synthetic database into a temporary directory, then runs each command both
+the way it used to (lazy loading each related row, one lookup per campsite) and
+through the CLI as it is now. The CLI runs fail if they take more queries than their
+budget, which must not grow with the number of rows.
+
+    python benchmarks/queries.py --facilities 2000 --campsites 400
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable
+
+DATA_HOME = tempfile.mkdtemp(prefix="recyoself-bench-")
+os.environ["XDG_DATA_HOME"] = DATA_HOME
+
+from click.testing import CliRunner
+from sqlmodel import select
+
+from recyoself import db
+from recyoself.cli import cli
+from recyoself.commands.common import campsites_by_id
+from recyoself.db import count_queries
+from recyoself.models import (
+    Campsite,
+    Division,
+    Facility,
+    Itinerary,
+    Lottery,
+    Organization,
+    RecreationArea,
+)
+
+if DATA_HOME not in db.DATABASE_URL:
+    # platformdirs ignores XDG_DATA_HOME on macOS, don't touch the real database
+    sys.exit(f"Refusing to run against {db.DATABASE_URL}")
+
+
+def populate(num_facilities: int, num_campsites: int, num_itineraries: int) -> None:
+    db.init_db()
+    moment = datetime.datetime(2024, 1, 1)
+    with db.Session.begin() as session:
+        orgs = [
+            Organization(name=f"Org {i}", abbr=f"O{i}", org_id=i) for i in range(20)
+        ]
+        rec_areas = [
+            RecreationArea(name=f"Area {i}", rec_area_id=str(i), org=orgs[i % 20])
+            for i in range(200)
+        ]
+        facilities = [
+            Facility(
+                name=f"Facility {i}",
+                facility_id=str(10000 + i),
+                type=i % 2 and "Campground" or "Permit",
+                org=orgs[i % 20],
+                rec_area=i % 3 and rec_areas[i % 200] or None,
+            )
+            for i in range(num_facilities)
+        ]
+        session.add_all(facilities)
+        campground, permit = facilities[1], facilities[0]
+        for i in range(num_campsites):
+            session.add(
+                Campsite(
+                    name=f"{i:03}",
+                    loop="A",
+                    campsite_id=i,
+                    type="STANDARD",
+                    electric=False,
+                    group_site=False,
+                    use="Overnight",
+                    facility=campground,
+                )
+            )
+        divisions = [
+            Division(
+                name=f"Camp {i}",
+                type="Camp",
+                division_id=i,
+                district="D",
+                is_hidden=False,
+                is_active=True,
+                permit=permit,
+            )
+            for i in range(50)
+        ]
+        session.add_all(divisions)
+        for i in range(num_itineraries):
+            itinerary = Itinerary(name=f"Itinerary {i}", permit=permit)
+            for division in divisions[i % 45 : i % 45 + 5]:
+                itinerary.add_division(division)
+            session.add(itinerary)
+        for i, facility in enumerate(facilities[: num_facilities // 4]):
+            session.add(
+                Lottery(
+                    lottery_id=f"lottery-{i}",
+                    name=f"Lottery {i}",
+                    desc="",
+                    summary="",
+                    status="LotteryStatusActive",
+                    type="permit",
+                    facility=facility,
+                    display_at=moment,
+                    open_at=moment,
+                    close_at=moment,
+                    scheduled_run_at=moment,
+                    ran_at=moment,
+                    announced_at=moment,
+                    access_start_at=moment,
+                    access_end_at=moment,
+                )
+            )
+
+
+def lazy_facilities() -> None:
+    with db.ReadSession.begin() as session:
+        for f in session.scalars(select(Facility)):
+            f.rec_area and f.rec_area.name, f.org.name
+
+
+def lazy_lotteries() -> None:
+    with db.ReadSession.begin() as session:
+        for l in session.scalars(select(Lottery)):
+            l.facility.name
+
+
+def lazy_itineraries() -> None:
+    with db.ReadSession.begin() as session:
+        for i in session.scalars(select(Itinerary)):
+            i.permit.name, i.ordered_divisions_str
+
+
+def lazy_campsites(campground_id: str, campsite_ids: list[str]) -> None:
+    with db.ReadSession.begin() as session:
+        for campsite_id in campsite_ids:
+            session.scalars(
+                select(Campsite).where(Campsite.campsite_id == campsite_id)
+            ).first()
+
+
+def batched_campsites(campground_id: str, campsite_ids: list[str]) -> None:
+    with db.ReadSession.begin() as session:
+        campground = session.scalars(
+            select(Facility).where(Facility.facility_id == campground_id)
+        ).one()
+        campsites_by_id(session, campground, campsite_ids)
+
+
+def run_cli(*args: str) -> Callable[[], None]:
+    def invoke() -> None:
+        result = CliRunner().invoke(cli, list(args), catch_exceptions=False)
+        assert result.exit_code == 0, result.output
+
+    return invoke
+
+
+def measure(func: Callable[[], None], limit: int | None = None) -> dict:
+    start = time.perf_counter()
+    with count_queries(limit) as counter:
+        func()
+    return {"seconds": time.perf_counter() - start, "queries": counter.count}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--facilities", type=int, default=2000)
+    parser.add_argument("--campsites", type=int, default=400)
+    parser.add_argument("--itineraries", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    populate(args.facilities, args.campsites, args.itineraries)
+    campground_id = "10001"
+    campsite_ids = [str(i) for i in range(args.campsites)]
+    # (name, before, now, query budget for now)
+    scenarios = [
+        ("list-facilities", lazy_facilities, run_cli("list-facilities"), 1),
+        ("list-lotteries", lazy_lotteries, run_cli("list-lotteries"), 1),
+        ("list-itineraries", lazy_itineraries, run_cli("list-itineraries"), 2),
+        (
+            "campsite lookup",
+            lambda: lazy_campsites(campground_id, campsite_ids),
+            lambda: batched_campsites(campground_id, campsite_ids),
+            # the campground, then one query per chunk of IDs
+            1 + -(-args.campsites // 500),
+        ),
+    ]
+    results = {
+        name: {"before": measure(before), "now": measure(now, limit)}
+        for name, before, now, limit in scenarios
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{args.facilities} facilities, {args.campsites} campsites, "
+        f"{args.itineraries} itineraries"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:>17}: {r['before']['queries']:>6} queries "
+            f"{r['before']['seconds'] * 1000:8.1f} ms => "
+            f"{r['now']['queries']:>3} queries {r['now']['seconds'] * 1000:8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
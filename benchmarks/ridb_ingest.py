@@ -0,0 +1,491 @@
+"""RIDB ingestion (what `init` does) against synthetic exports at several scales.
+
+Generates an export with the columns `RIDB.make_*` read, at multiples of (roughly) the
+real export's row counts, zips it and serves it locally. For each scale it then times
+`fetch_entities` (download and extract) and, per entity, the CSV checksum, parsing
+(the `make_*` generators, including their parent lookups) and inserting into a fresh
+database, the way `init` does. A second pass under tracemalloc measures peak and
+retained memory per step (`--no-memory` skips it). Results can be saved as JSON and
+compared with an earlier run (`init`'s progress bars, which are timed too, go to
+stderr):
+
+    python benchmarks/ridb_ingest.py --scale 1 --scale 5 --output before.json
+    python benchmarks/ridb_ingest.py --scale 1 --scale 5 --baseline before.json
+"""
+
+import argparse
+import csv
+import functools
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+DATA_HOME = tempfile.mkdtemp(prefix="recyoself-bench-")
+os.environ["XDG_DATA_HOME"] = DATA_HOME
+
+from sqlmodel import insert
+
+from recyoself import db
+from recyoself.models import CampsiteAttribute, FacilityType, PermittedEquipment
+from recyoself.ridb import RIDB
+
+if DATA_HOME not in db.DATABASE_URL:
+    # platformdirs ignores XDG_DATA_HOME on macOS, don't touch the real database
+    sys.exit(f"Refusing to run against {db.DATABASE_URL}")
+
+# roughly the row counts of the real export (early 2025), i.e. scale 1
+BASE_ROWS: dict[str, int] = {
+    "Organizations": 40,
+    "RecAreas": 3_700,
+    "Facilities": 15_000,
+    "Campsites": 110_000,
+    "CampsiteAttributes": 2_400_000,
+    "PermittedEquipment": 450_000,
+}
+
+# the columns `RIDB.make_*` read, in the export's order
+COLUMNS: dict[str, list[str]] = {
+    "Organizations": ["OrgID", "OrgName", "OrgAbbrevName"],
+    "RecAreas": [
+        "RecAreaID",
+        "OrgRecAreaID",
+        "ParentOrgID",
+        "RecAreaName",
+        "RecAreaLatitude",
+        "RecAreaLongitude",
+    ],
+    "Facilities": [
+        "FacilityID",
+        "OrgFacilityID",
+        "ParentRecAreaID",
+        "FacilityName",
+        "FacilityTypeDescription",
+        "FacilityLatitude",
+        "FacilityLongitude",
+    ],
+    "Campsites": [
+        "CampsiteID",
+        "FacilityID",
+        "CampsiteName",
+        "CampsiteType",
+        "TypeOfUse",
+        "Loop",
+    ],
+    "CampsiteAttributes": ["EntityID", "EntityType", "AttributeName", "AttributeValue"],
+    "PermittedEquipment": ["EntityID", "EntityType", "EquipmentName", "MaxLength"],
+}
+
+CAMPSITE_TYPES = [
+    "STANDARD NONELECTRIC",
+    "STANDARD ELECTRIC",
+    "RV NONELECTRIC",
+    "RV ELECTRIC",
+    "TENT ONLY NONELECTRIC",
+    "GROUP STANDARD NONELECTRIC",
+    "GROUP STANDARD AREA NONELECTRIC",
+    "WALK TO",
+    "CABIN NONELECTRIC",
+]
+ATTRIBUTES: dict[str, list[str]] = {
+    "Max Vehicle Length": ["0", "20", "30", "35", "40", "45"],
+    "Max Num of People": ["4", "6", "8", "12", "50"],
+    "Max Num of Vehicles": ["1", "2", "3"],
+    "Pets Allowed": ["Yes", "No", "Domestic"],
+    "Campfire Allowed": ["Yes", "No"],
+    "Shade": ["Full", "Partial", "No"],
+    "Driveway Surface": ["Paved", "Gravel", "Dirt"],
+    "Driveway Entry": ["Back-In", "Pull-Through"],
+    "Site Access": ["Drive-In", "Walk-In", "Hike-In"],
+    "Picnic Table": ["Y", "N"],
+    "Fire Pit": ["Y", "N"],
+}
+EQUIPMENT = ["Tent", "RV", "Trailer", "Pickup Camper", "Caravan/Camper Van", "Boat"]
+# share of facilities that are campgrounds, and of those that are permits
+CAMPGROUND_SHARE = 0.25
+PERMIT_SHARE = 0.05
+
+ZIP_NAME = RIDB().entities_csv_zip_url.rsplit("/", 1)[-1]
+
+# entity => (RIDB method, model bulk inserted from its row batches), in `init`'s order
+LOADERS: dict[str, tuple[str, Optional[type]]] = {
+    "Organizations": ("make_organizations", None),
+    "RecAreas": ("make_rec_areas", None),
+    "Facilities": ("make_facilities", None),
+    "Campsites": ("make_campsites", None),
+    "CampsiteAttributes": ("make_campsite_attributes", CampsiteAttribute),
+    "PermittedEquipment": ("make_permitted_equipment", PermittedEquipment),
+}
+
+
+def row_counts(scale: float) -> dict[str, int]:
+    return {entity: max(1, round(n * scale)) for entity, n in BASE_ROWS.items()}
+
+
+def generate_export(directory: str, scale: float, seed: int = 0) -> dict[str, int]:
+    """Write the entity CSVs and their zip into `directory`, returning the row counts.
+    The same scale and seed always give the same export."""
+    rng = random.Random(seed)
+    counts = row_counts(scale)
+    facility_types = [t.value for t in FacilityType]
+    org_ids = [str(i + 1) for i in range(counts["Organizations"])]
+    rec_area_ids = [str(1000 + i) for i in range(counts["RecAreas"])]
+    num_campgrounds = max(1, round(counts["Facilities"] * CAMPGROUND_SHARE))
+    campground_ids = [str(200000 + i) for i in range(num_campgrounds)]
+    campsite_ids = [str(i + 1) for i in range(counts["Campsites"])]
+
+    def coordinate(low: float, high: float) -> str:
+        # some facilities and rec areas have none
+        return "" if rng.random() < 0.1 else f"{rng.uniform(low, high):.6f}"
+
+    def rows(entity: str):
+        n = counts[entity]
+        if entity == "Organizations":
+            for org_id in org_ids:
+                yield [org_id, f"Organization {org_id}", f"ORG{org_id}"]
+        elif entity == "RecAreas":
+            for rec_area_id in rec_area_ids:
+                yield [
+                    rec_area_id,
+                    rng.random() < 0.5 and f"K{rec_area_id}" or "",
+                    rng.choice(org_ids),
+                    f"Recreation Area {rec_area_id}",
+                    coordinate(25, 49),
+                    coordinate(-124, -67),
+                ]
+        elif entity == "Facilities":
+            for i in range(n):
+                if i < num_campgrounds:
+                    facility_id, ftype = campground_ids[i], "Campground"
+                else:
+                    facility_id = str(300000 + i)
+                    is_permit = rng.random() < PERMIT_SHARE / (1 - CAMPGROUND_SHARE)
+                    ftype = is_permit and "Permit" or rng.choice(facility_types)
+                yield [
+                    facility_id,
+                    rng.choice(org_ids),
+                    rng.random() < 0.8 and rng.choice(rec_area_ids) or "",
+                    # a few unnamed ones, which are skipped
+                    "" if rng.random() < 0.01 else f"{ftype} {facility_id}",
+                    ftype,
+                    coordinate(25, 49),
+                    coordinate(-124, -67),
+                ]
+        elif entity == "Campsites":
+            for campsite_id in campsite_ids:
+                yield [
+                    campsite_id,
+                    rng.choice(campground_ids),
+                    f"{rng.randint(1, 300):03}",
+                    rng.choice(CAMPSITE_TYPES),
+                    rng.random() < 0.9 and "Overnight" or "Day",
+                    f"Loop {rng.choice('ABCDEF')}",
+                ]
+        elif entity == "CampsiteAttributes":
+            names = list(ATTRIBUTES)
+            for i in range(n):
+                name = names[i % len(names)]
+                yield [
+                    rng.choice(campsite_ids),
+                    "Campsite",
+                    name,
+                    rng.choice(ATTRIBUTES[name]),
+                ]
+        else:
+            for i in range(n):
+                yield [
+                    rng.choice(campsite_ids),
+                    "Campsite",
+                    rng.choice(EQUIPMENT),
+                    str(rng.choice([0, 0, 20, 25, 30, 35, 40, 45])),
+                ]
+
+    os.makedirs(directory, exist_ok=True)
+    zip_path = os.path.join(directory, ZIP_NAME)
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zp:
+        for entity in BASE_ROWS:
+            csv_path = os.path.join(directory, f"{entity}_API_v1.csv")
+            with open(csv_path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(COLUMNS[entity])
+                writer.writerows(rows(entity))
+            zp.write(csv_path, os.path.basename(csv_path))
+    return counts
+
+
+def serve_export(directory: str) -> ThreadingHTTPServer:
+    """Serve the export's zip where `RIDB.fetch_entities` looks for it, under the
+    server's address."""
+    downloads = os.path.join(directory, "downloads")
+    os.makedirs(downloads, exist_ok=True)
+    link = os.path.join(downloads, ZIP_NAME)
+    if not os.path.exists(link):
+        os.link(os.path.join(directory, ZIP_NAME), link)
+
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Step:
+    """Time (and, when tracing, memory) for one step, accumulated over its calls."""
+
+    def __init__(self, traced: bool) -> None:
+        self.traced = traced
+        self.seconds = 0.0
+        self._start_bytes = 0
+        self.peak_bytes = 0
+
+    def __enter__(self) -> "Step":
+        if self.traced:
+            tracemalloc.reset_peak()
+            self._start_bytes = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.seconds += time.perf_counter() - self._started
+        if self.traced:
+            peak = tracemalloc.get_traced_memory()[1] - self._start_bytes
+            self.peak_bytes = max(self.peak_bytes, peak)
+
+    def result(self) -> dict:
+        result = {"seconds": self.seconds}
+        if self.traced:
+            result["peak_mb"] = self.peak_bytes / 2**20
+        return result
+
+
+def load_entity(ridb: RIDB, session, entity: str, traced: bool) -> dict:
+    """Load one entity like `init`, timing the generator and the inserts apart."""
+    method, model = LOADERS[entity]
+    parse, insert_step = Step(traced), Step(traced)
+    retained = traced and tracemalloc.get_traced_memory()[0] or 0
+    rows = 0
+    items = iter(getattr(ridb, method)(session))
+    while True:
+        with parse:
+            item = next(items, None)
+        if item is None:
+            break
+        with insert_step:
+            if model is None:
+                session.add(item)
+                rows += 1
+            else:
+                session.execute(insert(model), item)
+                rows += len(item)
+    with insert_step:
+        if entity == "Organizations":
+            session.add(ridb.make_org_157())
+        session.flush()
+    result = {
+        "rows": rows,
+        "parse": parse.result(),
+        "insert": insert_step.result(),
+        "rows_per_second": rows / max(parse.seconds + insert_step.seconds, 1e-9),
+    }
+    if traced:
+        retained = tracemalloc.get_traced_memory()[0] - retained
+        result["retained_mb"] = retained / 2**20
+    return result
+
+
+def ingest(base_url: str, traced: bool) -> dict:
+    """Fetch the served export and load it into a fresh database, step by step."""
+    db.drop_db()
+    db.init_db()
+    ridb = RIDB()
+    ridb.base_url = base_url
+    if traced:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with Step(traced) as fetch:
+            ridb.fetch_entities()
+        checksums = {}
+        for entity in LOADERS:
+            with Step(traced) as checksum:
+                ridb._get_csv_checksum(ridb._csv_filepath_for(entity))
+            checksums[entity] = checksum.result()
+        entities = {}
+        with db.bulk_load_session() as session:
+            for entity in LOADERS:
+                entities[entity] = {
+                    "checksum": checksums[entity],
+                    **load_entity(ridb, session, entity, traced),
+                }
+            with Step(traced) as commit:
+                session.commit()
+    finally:
+        if traced:
+            tracemalloc.stop()
+    return {
+        "fetch": fetch.result(),
+        "entities": entities,
+        "commit": commit.result(),
+        "total_seconds": time.perf_counter() - started,
+    }
+
+
+def run_scale(scale: float, export_root: str, seed: int, memory: bool) -> dict:
+    directory = os.path.join(export_root, f"scale-{scale:g}-seed-{seed}")
+    started = time.perf_counter()
+    if os.path.exists(os.path.join(directory, ZIP_NAME)):
+        counts = row_counts(scale)
+    else:
+        counts = generate_export(directory, scale, seed)
+    generated = time.perf_counter() - started
+    server = serve_export(directory)
+    try:
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        result = {
+            "scale": scale,
+            "csv_rows": counts,
+            "zip_bytes": os.path.getsize(os.path.join(directory, ZIP_NAME)),
+            "generate_seconds": generated,
+            "timed": ingest(base_url, traced=False),
+        }
+        if memory:
+            # tracing slows everything down, so its times aren't the ones reported
+            result["memory"] = ingest(base_url, traced=True)
+    finally:
+        server.shutdown()
+    return result
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def step_seconds(result: dict) -> dict[str, float]:
+    """Every timed step of a scale's run, flattened (e.g. "Campsites.parse")."""
+    timed = result["timed"]
+    steps = {"fetch": timed["fetch"]["seconds"], "commit": timed["commit"]["seconds"]}
+    for entity, r in timed["entities"].items():
+        for step in ("checksum", "parse", "insert"):
+            steps[f"{entity}.{step}"] = r[step]["seconds"]
+    steps["total"] = timed["total_seconds"]
+    return steps
+
+
+def print_results(results: dict, baseline: Optional[dict]) -> None:
+    previous = {r["scale"]: r for r in (baseline or {}).get("scales", [])}
+    for result in results["scales"]:
+        rows = sum(result["csv_rows"].values())
+        print(
+            f"scale {result['scale']:g}: {rows:,} rows, "
+            f"{result['zip_bytes'] / 2**20:.1f} MB zipped"
+        )
+        memory = result.get("memory")
+        before = result["scale"] in previous and step_seconds(previous[result["scale"]])
+        for step, seconds in step_seconds(result).items():
+            line = f"  {step:>30}: {seconds * 1000:10.1f} ms"
+            if before and step in before and before[step]:
+                line += f" ({(seconds / before[step] - 1) * 100:+6.1f}%)"
+            if memory is not None:
+                line += f"  {_peak_mb(memory, step)}"
+            print(line)
+
+
+def _peak_mb(memory: dict, step: str) -> str:
+    entity, _, phase = step.partition(".")
+    if phase:
+        value = memory["entities"][entity][phase].get("peak_mb")
+    elif step in ("fetch", "commit"):
+        value = memory[step].get("peak_mb")
+    else:
+        return ""
+    return f"peak {value:8.1f} MB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scale",
+        type=float,
+        action="append",
+        help="multiple of the real export's row counts, can be repeated (default 1)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--export-dir",
+        default=None,
+        help="keep generated exports here and reuse them (default: a temp directory)",
+    )
+    parser.add_argument(
+        "--generate-only",
+        action="store_true",
+        help="only write the exports (into --export-dir)",
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip the tracemalloc pass"
+    )
+    parser.add_argument("--output", default=None, help="write results as JSON here")
+    parser.add_argument(
+        "--baseline", default=None, help="JSON results of an earlier run to compare"
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    scales = args.scale or [1.0]
+    export_root = args.export_dir or os.path.join(DATA_HOME, "exports")
+    if args.generate_only:
+        for scale in scales:
+            directory = os.path.join(export_root, f"scale-{scale:g}-seed-{args.seed}")
+            counts = generate_export(directory, scale, args.seed)
+            print(f"{directory}: {sum(counts.values()):,} rows")
+        return
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    results = {
+        "environment": environment(),
+        "scales": [
+            run_scale(scale, export_root, args.seed, not args.no_memory)
+            for scale in scales
+        ],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Facility search latency: substring scan vs the full-text index.
+
+Loads a synthetic database of facilities into a temporary directory and times the
+`icontains` filter `list-facilities` used to run against the FTS5 search.
+
+    python benchmarks/search.py --facilities 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable
+
+DATA_HOME = tempfile.mkdtemp(prefix="recyoself-bench-")
+os.environ["XDG_DATA_HOME"] = DATA_HOME
+
+from sqlmodel import col, insert, select
+
+from recyoself import db, search_index
+from recyoself.models import Facility, Organization, RecreationArea
+
+if DATA_HOME not in db.DATABASE_URL:
+    # platformdirs ignores XDG_DATA_HOME on macOS, don't touch the real database
+    sys.exit(f"Refusing to run against {db.DATABASE_URL}")
+
+WORDS = (
+    "lake river creek canyon mesa glacier ridge meadow pine cedar aspen falls "
+    "valley peak basin spring hollow bluff point cove island forest desert"
+).split()
+KINDS = ["Campground", "Group Campground", "Day Use Area", "Cabin", "Lookout"]
+QUERIES = ["glacier", "cedar creek", "pine val", "zzz"]
+
+
+def populate(num_facilities: int) -> None:
+    db.init_db()
+    rng = random.Random(1)
+    with db.Session.begin() as session:
+        org = Organization(name="National Park Service", abbr="NPS", org_id=1)
+        session.add(org)
+        session.add_all(
+            RecreationArea(
+                name=f"{rng.choice(WORDS).title()} National Park",
+                rec_area_id=str(i),
+                org=org,
+            )
+            for i in range(500)
+        )
+        session.flush()
+        rows = [
+            {
+                "name": (
+                    f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} "
+                    f"{rng.choice(KINDS)}"
+                ),
+                "facility_id": str(i),
+                "type": "campground",
+                "org_id": org.id,
+                "rec_area_id": rng.randrange(1, 501),
+            }
+            for i in range(num_facilities)
+        ]
+        session.execute(insert(Facility), rows)
+    db.optimize_search_index()
+
+
+def substring(text: str) -> Callable[[], int]:
+    stmt = select(Facility.id).where(col(Facility.name).icontains(text))
+    return lambda: len(_run(stmt))
+
+
+def full_text(text: str) -> Callable[[], int]:
+    stmt = search_index.apply(select(Facility.id), Facility, "facility", text)
+    return lambda: len(_run(stmt))
+
+
+def _run(stmt) -> list:
+    with db.ReadSession.begin() as session:
+        return session.execute(stmt).all()
+
+
+def measure(func: Callable[[], int], repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = func()
+        timings.append(time.perf_counter() - start)
+    return {"best_seconds": min(timings), "found": found}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--facilities", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    populate(args.facilities)
+    results = {
+        query: {
+            # the substring filter only ever matched a single word
+            "substring": measure(substring(query.split()[0]), args.repeat),
+            "full_text": measure(full_text(query), args.repeat),
+        }
+        for query in QUERIES
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.facilities} facilities")
+    for query, r in results.items():
+        print(
+            f"{query!r:>14}: substring {r['substring']['best_seconds'] * 1000:7.1f} ms "
+            f"({r['substring']['found']:>6} found), full-text "
+            f"{r['full_text']['best_seconds'] * 1000:7.1f} ms "
+            f"({r['full_text']['found']:>6} found)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import os
+from typing import TYPE_CHECKING
 
 from platformdirs import PlatformDirs
-from prompt_toolkit.styles import Style
+
+if TYPE_CHECKING:
+    from prompt_toolkit.styles import Style
 
 if os.environ.get("RECYOSELF_ENV") == "dev":
     USER_DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data"))
@@ -14,17 +17,34 @@ USER_AGENT: str = (
 )
 HEADERS: dict = {"user-agent": USER_AGENT}
 
-# stolen from https://github.com/tmbo/questionary/blob/master/examples/autocomplete_ants.py
-AUTOCOMPLETE_STYLE = Style(
-    [
-        ("separator", "fg:#cc5454"),
-        ("qmark", "fg:#673ab7 bold"),
-        ("question", ""),
-        ("selected", "fg:#cc5454"),
-        ("pointer", "fg:#673ab7 bold"),
-        ("highlighted", "fg:#673ab7 bold"),
-        ("answer", "fg:#f44336 bold"),
-        ("text", "fg:#FBE9E7"),
-        ("disabled", "fg:#858585 italic"),
-    ]
-)
+if TYPE_CHECKING:
+    # made on first use by `__getattr__`
+    AUTOCOMPLETE_STYLE: "Style"
+
+
+def __getattr__(name: str):
+    # prompt_toolkit is slow to import and only the interactive commands need it
+    if name == "AUTOCOMPLETE_STYLE":
+        global AUTOCOMPLETE_STYLE
+        AUTOCOMPLETE_STYLE = _autocomplete_style()
+        return AUTOCOMPLETE_STYLE
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _autocomplete_style() -> "Style":
+    from prompt_toolkit.styles import Style
+
+    # stolen from https://github.com/tmbo/questionary/blob/master/examples/autocomplete_ants.py
+    return Style(
+        [
+            ("separator", "fg:#cc5454"),
+            ("qmark", "fg:#673ab7 bold"),
+            ("question", ""),
+            ("selected", "fg:#cc5454"),
+            ("pointer", "fg:#673ab7 bold"),
+            ("highlighted", "fg:#673ab7 bold"),
+            ("answer", "fg:#f44336 bold"),
+            ("text", "fg:#FBE9E7"),
+            ("disabled", "fg:#858585 italic"),
+        ]
+    )
@@ -0,0 +1,279 @@
+"""An asyncio version of `RecreationDotGov`, for embedding in async services.
+
+Needs aiohttp (`pip install 'recyoself[async]'`). Requests and responses are built and
+parsed by the same functions as the sync client, so both return the same objects.
+"""
+
+import asyncio
+import datetime
+from typing import TYPE_CHECKING, AsyncIterator, Collection, Hashable, Optional
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError(
+        "AsyncRecreationDotGov needs aiohttp, install it with "
+        "`pip install 'recyoself[async]'`"
+    ) from e
+from sqlmodel import select
+
+from recyoself import HEADERS
+
+from .cache import TTLCache
+from .campsite_availability import CampsiteAvailability
+from .division_availability import DivisionAvailability
+from .metrics import REQUEST_SECONDS, REQUESTS, RESPONSE_CACHE, endpoint_label
+from .models import Division, Facility, Lottery
+from .recreationdotgov import (
+    RecreationDotGov,
+    add_campsite_availabilities,
+    add_division_availabilities,
+    campsite_availability_request,
+    division_availability_request,
+    division_fields,
+    lottery_fields,
+    parse_campsite_availabilities,
+    parse_division_availabilities,
+)
+from .scheduling import RequestBudget
+from .utils.dates import months_between
+
+if TYPE_CHECKING:
+    from uuid import UUID
+
+    from sqlalchemy.orm import Session
+
+# requests in flight at once per client, unless told otherwise
+MAX_CONCURRENCY = 16
+
+
+class AsyncRecreationDotGov:
+    """Mirrors `RecreationDotGov`'s `make_*` methods as coroutines and async generators.
+
+    At most `max_concurrency` requests are in flight at once (however many callers
+    there are), each one limited to `timeout` seconds. Responses are cached per client
+    like the sync one, and callers asking for a resource already being fetched wait
+    for that request instead of making their own. Cancelling a caller only cancels its
+    requests no other caller is waiting on; `close` (or leaving `async with`) cancels
+    them all.
+
+    Failed requests raise `aiohttp.ClientError` (or `TimeoutError`).
+    """
+
+    base_url: str = RecreationDotGov.base_url
+
+    timeout: float = RecreationDotGov.timeout
+
+    def __init__(
+        self,
+        cache: Optional[TTLCache] = None,
+        budget: Optional[RequestBudget] = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ) -> None:
+        self.cache = cache if cache is not None else TTLCache()
+        # every request that isn't answered from the cache waits on the budget
+        self.budget = budget
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        # callers waiting for each request in flight
+        self._waiters: dict[Hashable, int] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "AsyncRecreationDotGov":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        for task in list(self._in_flight.values()):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # made on first use, since it has to be made inside the event loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers=HEADERS,
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def make_permit_divisions(self, permit: Facility) -> AsyncIterator[Division]:
+        divisions = await self._get_divisions(permit.facility_id)
+        for division_id, division in divisions.items():
+            yield Division(permit=permit, **division_fields(division_id, division))
+
+    async def make_lotteries(self, session: "Session") -> AsyncIterator[Lottery]:
+        """Lotteries for the facilities in the database (looked up with the given,
+        synchronous, session); those for unknown facilities are skipped."""
+        for lottery_data in await self._get_lotteries():
+            facility = session.scalars(
+                select(Facility).where(
+                    Facility.facility_id == lottery_data["inventory_id"]
+                )
+            ).first()
+            if facility:
+                yield Lottery(facility=facility, **lottery_fields(lottery_data))
+
+    async def make_division_availabilities(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        division: Division,
+        lottery: Optional[Lottery] = None,
+    ) -> DivisionAvailability:
+        fac_id = division.permit.facility_id
+        lottery_id = lottery and lottery.lottery_id or None
+        in_eap = lottery and lottery.in_early_access or False
+
+        months = months_between(start_date, end_date)
+        # every month at once, added in order
+        responses = await asyncio.gather(
+            *(
+                self._get_division_availabilities(
+                    fac_id, division.division_id, lottery_id, month, year, in_eap
+                )
+                for year, month in months
+            )
+        )
+        div_avail = DivisionAvailability(division)
+        for availabilities_by_date in responses:
+            add_division_availabilities(
+                div_avail, availabilities_by_date, start_date, end_date
+            )
+        return div_avail
+
+    async def iter_division_availabilities(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        divisions: list[Division],
+        lottery: Optional[Lottery] = None,
+    ) -> AsyncIterator[DivisionAvailability]:
+        """Every division's availability, fetched at once and yielded as each is
+        done. Stopping early cancels the rest."""
+        tasks = [
+            asyncio.ensure_future(
+                self.make_division_availabilities(start_date, end_date, d, lottery)
+            )
+            for d in divisions
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def make_campsite_availabilities(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        campground: Facility,
+        campsite_ids: Optional[Collection[str]] = None,
+    ) -> list[CampsiteAvailability]:
+        fac_id = campground.facility_id
+        months = months_between(start_date, end_date)
+        responses = await asyncio.gather(
+            *(
+                self._get_campsite_availabilities(fac_id, month, year)
+                for year, month in months
+            )
+        )
+        availabilities: dict[str, CampsiteAvailability] = {}
+        for campsites in responses:
+            add_campsite_availabilities(
+                availabilities, campsites, start_date, end_date, campsite_ids
+            )
+        return list(availabilities.values())
+
+    async def _get_divisions(self, permitcontent_id: str) -> dict:
+        response = await self._get(f"permitcontent/{permitcontent_id}/divisions")
+        return response.get("payload", {})
+
+    async def _get_lotteries(self) -> list:
+        return (await self._get("lottery/available")).get("lotteries", [])
+
+    async def _get_division_availabilities(
+        self,
+        facility_id: str,
+        division_id: int,
+        lottery_id: Optional["UUID"],
+        month: int,
+        year: int,
+        in_eap: bool = True,
+    ) -> dict:
+        url, params = division_availability_request(
+            facility_id, division_id, lottery_id, month, year, in_eap
+        )
+        return parse_division_availabilities(await self._get(url, params=params))
+
+    async def _get_campsite_availabilities(
+        self, facility_id: str, month: int, year: int
+    ) -> dict[str, dict]:
+        url, params = campsite_availability_request(facility_id, month, year)
+        return parse_campsite_availabilities(await self._get(url, params=params))
+
+    async def _get(self, endpoint: str, params: Optional[dict] = None) -> dict:
+        cache_key = (endpoint, tuple(sorted((params or {}).items())))
+        sentinel = object()
+        response = self.cache.get(cache_key, sentinel)
+        if response is not sentinel:
+            RESPONSE_CACHE.inc(result="hit")
+            return response
+
+        task = self._in_flight.get(cache_key)
+        RESPONSE_CACHE.inc(result=task is None and "miss" or "hit")
+        if task is None:
+            task = asyncio.ensure_future(
+                self._fetch_into_cache(cache_key, endpoint, params)
+            )
+            self._in_flight[cache_key] = task
+            self._waiters[cache_key] = 0
+            task.add_done_callback(lambda _: self._forget(cache_key))
+        self._waiters[cache_key] += 1
+        try:
+            # shared with other callers, so cancelling this one mustn't cancel it...
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # ...unless nobody else is waiting for it either
+            if self._waiters.get(cache_key) == 1:
+                task.cancel()
+            raise
+        finally:
+            if cache_key in self._waiters:
+                self._waiters[cache_key] -= 1
+
+    def _forget(self, cache_key: Hashable) -> None:
+        self._in_flight.pop(cache_key, None)
+        self._waiters.pop(cache_key, None)
+
+    async def _fetch_into_cache(
+        self, cache_key: Hashable, endpoint: str, params: Optional[dict]
+    ) -> dict:
+        response = await self._fetch(endpoint, params)
+        self.cache.set(cache_key, response)
+        return response
+
+    async def _fetch(self, endpoint: str, params: Optional[dict] = None) -> dict:
+        url = f"{self.base_url}/{endpoint}"
+        label = endpoint_label(endpoint)
+        status = "error"
+        async with self._semaphore:
+            if self.budget is not None:
+                while not self.budget.try_acquire():
+                    await asyncio.sleep(60 / self.budget.rate)
+            try:
+                with REQUEST_SECONDS.time(endpoint=label):
+                    async with self.session.get(url, params=params) as r:
+                        status = str(r.status)
+                        r.raise_for_status()
+                        return await r.json(content_type=None)
+            finally:
+                REQUESTS.inc(endpoint=label, status=status)
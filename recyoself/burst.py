@@ -0,0 +1,356 @@
+import datetime
+import heapq
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional, Sequence, TypeVar
+
+import requests
+
+from .campsite_availability import CampsiteAvailability, ReservableBlock
+from .division_availability import DivisionAvailability
+from .matching import DivisionMatch, iter_division_availability_date_matches
+from .recreationdotgov import (
+    add_campsite_availabilities,
+    add_division_availabilities,
+    campsite_availability_request,
+    division_availability_request,
+    parse_campsite_availabilities,
+    parse_division_availabilities,
+)
+from .search import DivisionMatcher, month_windows
+from .utils.dates import months_between
+
+if TYPE_CHECKING:
+    from .models import Division, Facility, Lottery
+    from .recreationdotgov import RecreationDotGov
+
+PERCENTILES = (50, 90, 99)
+
+P = TypeVar("P", bound="BurstPlan")
+
+
+@dataclass(frozen=True)
+class PlannedRequest:
+    """One request to make over and over: an endpoint and its params."""
+
+    endpoint: str
+    params: tuple[tuple[str, Any], ...]
+
+    @classmethod
+    def of(cls, endpoint: str, params: dict) -> "PlannedRequest":
+        return cls(endpoint, tuple(sorted(params.items())))
+
+
+@dataclass(frozen=True)
+class DivisionRef:
+    """What matching needs of a `Division`, so plans don't hold ORM objects."""
+
+    division_id: int
+    name: str
+
+
+@dataclass
+class Window:
+    """A month of start dates (`start` to `end`), needing the responses for each of
+    `requests` (by stop, for itineraries) to be searched."""
+
+    start: datetime.date
+    end: datetime.date
+    fetch_end: datetime.date
+    requests: list[list[PlannedRequest]]
+
+
+class BurstPlan(ABC):
+    """The requests for one search, and how to find matches in their responses.
+
+    Responses arrive one at a time in any order. Each only re-searches the windows it
+    belongs to (once all their responses are in, and only if it changed), and
+    `observe` returns the matches that weren't found before.
+    """
+
+    label: str
+    windows: list[Window]
+
+    def __init__(self) -> None:
+        self._responses: dict[PlannedRequest, dict] = {}
+        self._seen: set = set()
+
+    @property
+    def requests(self) -> list[PlannedRequest]:
+        planned = (r for w in self.windows for rs in w.requests for r in rs)
+        return list(dict.fromkeys(planned))
+
+    def observe(self, request: PlannedRequest, response: dict) -> list:
+        parsed = self.parse(response)
+        if self._responses.get(request) == parsed:
+            return []
+        self._responses[request] = parsed
+        found = []
+        for window in self.windows:
+            needed = [r for rs in window.requests for r in rs]
+            if request not in needed or any(r not in self._responses for r in needed):
+                continue
+            for key, match in self.search(window):
+                if key not in self._seen:
+                    self._seen.add(key)
+                    found.append(match)
+        return found
+
+    @abstractmethod
+    def parse(self, response: dict) -> dict:
+        """What `search` needs of one of the plan's responses."""
+
+    @abstractmethod
+    def search(self, window: Window) -> Iterable[tuple[Any, Any]]:
+        """(key, match) for every match in the window."""
+
+
+class ItineraryPlan(BurstPlan):
+    """Find `stops` on consecutive nights (and reversed, if `reversable`), from the
+    early access endpoint if the lottery is in early access when it's compiled."""
+
+    def __init__(
+        self,
+        name: str,
+        divisions: list["Division"],
+        start_date: datetime.date,
+        end_date: datetime.date,
+        lottery: Optional["Lottery"] = None,
+        reversable: bool = False,
+        find_matches: DivisionMatcher = iter_division_availability_date_matches,
+    ) -> None:
+        super().__init__()
+        self.label = name
+        self.stops = [DivisionRef(d.division_id, d.name) for d in divisions]
+        self.reversable = reversable
+        self.find_matches = find_matches
+        lottery_id = lottery and lottery.lottery_id or None
+        in_eap = lottery and lottery.in_early_access or False
+        nights = len(divisions)
+        self.windows = []
+        for window_start, window_end in month_windows(start_date, end_date):
+            fetch_end = min(end_date, window_end + timedelta(days=nights - 1))
+            months = months_between(window_start, fetch_end)
+            stop_requests = [
+                [
+                    PlannedRequest.of(
+                        *division_availability_request(
+                            d.permit.facility_id,
+                            d.division_id,
+                            lottery_id,
+                            month,
+                            year,
+                            in_eap,
+                        )
+                    )
+                    for year, month in months
+                ]
+                for d in divisions
+            ]
+            self.windows.append(
+                Window(window_start, window_end, fetch_end, stop_requests)
+            )
+
+    def parse(self, response: dict) -> dict:
+        return parse_division_availabilities(response)
+
+    def search(
+        self, window: Window
+    ) -> Iterable[tuple[Any, tuple[bool, DivisionMatch]]]:
+        availabilities = []
+        for stop, stop_requests in zip(self.stops, window.requests):
+            availability = DivisionAvailability(stop)  # type: ignore
+            for request in stop_requests:
+                add_division_availabilities(
+                    availability,
+                    self._responses[request],
+                    window.start,
+                    window.fetch_end,
+                )
+            availabilities.append(availability)
+        directions = [(False, availabilities)]
+        if self.reversable:
+            directions.append((True, availabilities[::-1]))
+        for is_reversed, ordered in directions:
+            for match in self.find_matches(ordered):
+                if match[0][1] <= window.end:
+                    key = (
+                        is_reversed,
+                        *((a.division.division_id, d) for a, d in match),
+                    )
+                    yield key, (is_reversed, match)
+
+
+class CampgroundPlan(BurstPlan):
+    """Find `num_days` blocks at a campground's campsites (only `campsite_ids`, when
+    given). Campsite names and loops are kept by ID for reporting."""
+
+    def __init__(
+        self,
+        campground: "Facility",
+        start_date: datetime.date,
+        end_date: datetime.date,
+        num_days: int,
+        include_nyr: bool = False,
+        campsite_ids: Optional[Iterable[str]] = None,
+    ) -> None:
+        super().__init__()
+        self.label = campground.name
+        self.facility_id = campground.facility_id
+        self.num_days = num_days
+        self.include_nyr = include_nyr
+        self.campsite_ids = None if campsite_ids is None else frozenset(campsite_ids)
+        self.sites = {
+            str(c.campsite_id): (c.name, c.loop) for c in campground.campsites
+        }
+        end_of_trip_date = end_date + timedelta(days=num_days)
+        self.windows = []
+        for window_start, window_end in month_windows(start_date, end_date):
+            fetch_end = min(end_of_trip_date, window_end + timedelta(days=num_days))
+            month_requests = [
+                PlannedRequest.of(
+                    *campsite_availability_request(self.facility_id, month, year)
+                )
+                for year, month in months_between(window_start, fetch_end)
+            ]
+            self.windows.append(
+                Window(window_start, window_end, fetch_end, [month_requests])
+            )
+
+    def parse(self, response: dict) -> dict:
+        return parse_campsite_availabilities(response)
+
+    def search(self, window: Window) -> Iterable[tuple[Any, ReservableBlock]]:
+        availabilities: dict[str, CampsiteAvailability] = {}
+        for request in window.requests[0]:
+            add_campsite_availabilities(
+                availabilities,
+                self._responses[request],
+                window.start,
+                window.fetch_end,
+                self.campsite_ids,
+            )
+        for availability in availabilities.values():
+            for block in availability.iter_reservable_blocks(
+                self.num_days, self.include_nyr
+            ):
+                if block.start <= window.end:
+                    yield (block.campsite_id, block.start), block
+
+
+@dataclass
+class BurstStats:
+    """How a burst went, in seconds since it started (or since the release)."""
+
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    found: int = 0
+    first_found: Optional[float] = None
+    elapsed: float = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + self.errors
+
+    def percentiles(self) -> dict[int, float]:
+        return percentiles(self.latencies, PERCENTILES)
+
+
+def percentiles(values: list[float], ps: Iterable[int]) -> dict[int, float]:
+    """Nearest-rank percentiles (empty if there are no values)."""
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    return {p: ordered[max(0, -(-p * len(ordered) // 100) - 1)] for p in ps}
+
+
+def run_burst(
+    rdg: "RecreationDotGov",
+    plans: Sequence[P],
+    duration: float,
+    interval: float = 0.5,
+    workers: int = 8,
+    on_found: Optional[Callable[[P, Any, float], Any]] = None,
+    limit: Optional[int] = None,
+    started: Optional[float] = None,
+) -> BurstStats:
+    """Make every plan's requests concurrently, each again `interval` seconds after
+    it was last sent (or as soon as it's back, if slower), for `duration` seconds.
+
+    Requests shared by several plans are only made once. Responses skip the client's
+    cache and budget, and `on_found(plan, match, seconds)` is called as soon as a
+    response turns up a new match. `started` (a `time.monotonic()` moment, e.g. the
+    release) is what times are measured from; it's when the burst starts otherwise.
+    Each plan reports at most `limit` matches, and the burst ends early once every
+    plan has.
+    """
+    started = started if started is not None else time.monotonic()
+    deadline = time.monotonic() + duration
+    plans_by_request: dict[PlannedRequest, list[P]] = {}
+    for plan in plans:
+        for request in plan.requests:
+            plans_by_request.setdefault(request, []).append(plan)
+    found_by_plan = {id(plan): 0 for plan in plans}
+    stats = BurstStats()
+    lock = threading.Lock()
+
+    def fetch(request: PlannedRequest) -> Optional[dict]:
+        sent = time.monotonic()
+        try:
+            response = rdg._fetch(request.endpoint, dict(request.params))
+        except requests.RequestException:
+            # counted, and the request is simply made again
+            with lock:
+                stats.errors += 1
+            return None
+        with lock:
+            stats.latencies.append(time.monotonic() - sent)
+        return response
+
+    def done() -> bool:
+        return limit is not None and all(n >= limit for n in found_by_plan.values())
+
+    # (when it's due, its order, request)
+    queue = [(time.monotonic(), i, r) for i, r in enumerate(plans_by_request)]
+    in_flight: dict[Future, tuple[int, PlannedRequest, float]] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while (queue or in_flight) and not done():
+            now = time.monotonic()
+            while queue and queue[0][0] <= now and len(in_flight) < workers:
+                _, i, request = heapq.heappop(queue)
+                in_flight[pool.submit(fetch, request)] = (i, request, now)
+            timeout = None
+            if queue and len(in_flight) < workers:
+                timeout = max(0, queue[0][0] - now)
+            if not in_flight:
+                time.sleep(timeout or 0)
+                continue
+            finished, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i, request, sent = in_flight.pop(future)
+                next_due = max(sent + interval, time.monotonic())
+                if next_due < deadline:
+                    heapq.heappush(queue, (next_due, i, request))
+                response = future.result()
+                if response is None:
+                    continue
+                for plan in plans_by_request[request]:
+                    matches = plan.observe(request, response)
+                    if limit is not None:
+                        matches = matches[: limit - found_by_plan[id(plan)]]
+                    for match in matches:
+                        seconds = time.monotonic() - started
+                        stats.found += 1
+                        if stats.first_found is None:
+                            stats.first_found = seconds
+                        found_by_plan[id(plan)] += 1
+                        if on_found is not None:
+                            on_found(plan, match, seconds)
+        for future in in_flight:
+            future.cancel()
+    stats.elapsed = time.monotonic() - started
+    return stats
@@ -0,0 +1,153 @@
+import os
+import pickle
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional
+
+from recyoself import USER_DATA_DIR
+
+from .metrics import MATCH_CACHE
+
+# match results carried between daemon-mode runs
+MATCH_CACHE_PATH = f"{USER_DATA_DIR}/match_cache.pickle"
+
+
+class TTLCache:
+    """Small thread-safe cache with optional expiry and size bound.
+
+    With no `ttl` entries live as long as the cache does, which is what a single CLI
+    run wants: every rec.gov resource is fetched at most once. Threads asking
+    `get_or_set` for the same missing key at once share one call of its factory.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, maxsize: Optional[int] = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+        # keys whose factory is running, for other threads to wait on
+        self._pending: dict[Hashable, Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._get(key, default)
+
+    def _get(self, key: Hashable, default: Any) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        stored_at, value = entry
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """The value for `key`, set to `factory()` if missing. If another thread is
+        already calling the factory for it, waits for (and shares) its result, or the
+        exception it raised."""
+        sentinel = object()
+        with self._lock:
+            value = self._get(key, sentinel)
+            if value is not sentinel:
+                return value
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = Future()
+                running = True
+            else:
+                running = False
+        if not running:
+            return pending.result()
+        try:
+            value = factory()
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            self.set(key, value)
+            pending.set_result(value)
+        finally:
+            with self._lock:
+                del self._pending[key]
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class MatchCache:
+    """Bounded LRU of match results keyed by query parameters plus the digests of the
+    availability they were computed from.
+
+    Values must be free of ORM objects so the cache can be saved between daemon runs;
+    callers store dates/indices and rebuild matches against the current availability.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                MATCH_CACHE.inc(result="hit")
+                self._results.move_to_end(key)
+                return self._results[key]
+            self.misses += 1
+        MATCH_CACHE.inc(result="miss")
+        value = compute()
+        with self._lock:
+            self._results[key] = value
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return value
+
+    @classmethod
+    def load(cls, path: str, maxsize: int = 1024) -> "MatchCache":
+        cache = cls(maxsize)
+        try:
+            with open(path, "rb") as f:
+                cache._results.update(pickle.load(f))
+        except Exception:
+            # missing or unreadable (e.g. from an older version), start fresh
+            cache._results.clear()
+        while len(cache._results) > maxsize:
+            cache._results.popitem(last=False)
+        return cache
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            items = list(self._results.items())
+        # several daemons may share the file, so never leave it half-written
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(items, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -1,11 +1,53 @@
 import datetime
+import hashlib
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING
+from enum import IntEnum
+from typing import TYPE_CHECKING, Iterator, Optional
 
 if TYPE_CHECKING:
     pass
 
 
+class CampsiteStatus(IntEnum):
+    available = 0
+    reserved = 1
+    not_yet_reservable = 2
+    management = 3
+    not_available = 4
+    not_reservable = 5
+    not_reservable_management = 6
+    open = 7
+    closed = 8
+    lottery = 9
+    walk_up = 10
+    unknown = 99
+
+    @classmethod
+    def from_str(cls, availability: str) -> "CampsiteStatus":
+        return _STATUS_BY_NAME.get(availability, cls.unknown)
+
+    @property
+    def label(self) -> str:
+        return _NAME_BY_STATUS.get(self, "Unknown")
+
+
+# the availability strings rec.gov returns for campsites
+_STATUS_BY_NAME: dict[str, CampsiteStatus] = {
+    "Available": CampsiteStatus.available,
+    "Reserved": CampsiteStatus.reserved,
+    "NYR": CampsiteStatus.not_yet_reservable,
+    "Management": CampsiteStatus.management,
+    "Not Available": CampsiteStatus.not_available,
+    "Not Reservable": CampsiteStatus.not_reservable,
+    "Not Reservable Management": CampsiteStatus.not_reservable_management,
+    "Open": CampsiteStatus.open,
+    "Closed": CampsiteStatus.closed,
+    "Lottery": CampsiteStatus.lottery,
+    "Walk-up": CampsiteStatus.walk_up,
+}
+_NAME_BY_STATUS: dict[CampsiteStatus, str] = {v: k for k, v in _STATUS_BY_NAME.items()}
+
+
 @dataclass
 class CampsiteAvailability:
 
@@ -18,55 +60,126 @@ class CampsiteAvailability:
     def availabilities(self) -> list["CampsiteAvailabilityInfo"]:
         return sorted(self._availabilities)
 
-    def add_availability(self, date: datetime.date, availability: str) -> None:
+    def add_availability(
+        self, date: datetime.date, availability: "str | CampsiteStatus"
+    ) -> None:
+        raw: Optional[str] = None
+        if not isinstance(availability, CampsiteStatus):
+            raw, availability = availability, CampsiteStatus.from_str(availability)
         self._availabilities.append(
-            CampsiteAvailabilityInfo(date=date, availability=availability)
+            CampsiteAvailabilityInfo(
+                date=date,
+                status=availability,
+                # only kept when it doesn't map to a status, so it isn't lost
+                raw=raw if availability is CampsiteStatus.unknown else None,
+            )
         )
 
+    def digest(self) -> str:
+        """Fingerprint of the normalized availability, for reusing match results."""
+        normalized = ";".join(
+            f"{a.date:%Y%m%d}:{a.status:d}" for a in self.availabilities
+        )
+        return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
     def find_reservable_blocks(
         self, days: int, include_nyr: bool = False
     ) -> list[tuple[datetime.date, bool]]:
+        return [
+            (block.start, block.available)
+            for block in self.iter_reservable_blocks(days, include_nyr)
+        ]
+
+    def iter_reservable_blocks(
+        self, days: int, include_nyr: bool = False
+    ) -> Iterator["ReservableBlock"]:
+        """Yield every run of `days` consecutive reservable dates, by start date."""
         dates = [
             a
             for a in self.availabilities
             if a.available or (include_nyr and a.not_yet_reservable)
         ]
         date_ords = [d.date.toordinal() for d in dates]
-        num_avail_dates = len(dates)
-        leftp = 0
-        rightp = days
-        starting_dates = []
-        while rightp < num_avail_dates:
-            ords = date_ords[leftp:rightp]
-            all_consecutive = ords == list(range(ords[0], ords[-1] + 1))
-            if all_consecutive:
-                starting_dates.append((dates[leftp].date, dates[leftp].available))
-            leftp += 1
-            rightp += 1
-        return starting_dates
-
-
-@dataclass(order=True)
+        # nyr_before[i] => NYR dates among the first i reservable dates
+        nyr_before = [0]
+        # bit i of nyr_bits => the i-th reservable date is NYR
+        nyr_bits = 0
+        for i, d in enumerate(dates):
+            nyr_before.append(nyr_before[-1] + (not d.available))
+            if not d.available:
+                nyr_bits |= 1 << i
+        block_bits = (1 << days) - 1
+        for leftp in range(len(dates) - days + 1):
+            rightp = leftp + days - 1
+            if date_ords[rightp] - date_ords[leftp] == days - 1:
+                nyr_nights = nyr_before[rightp + 1] - nyr_before[leftp]
+                yield ReservableBlock(
+                    campsite_id=self.campsite_id,
+                    start=dates[leftp].date,
+                    nights=days,
+                    nyr_nights=nyr_nights,
+                    nyr_mask=nyr_nights and (nyr_bits >> leftp) & block_bits,
+                )
+
+
+@dataclass(frozen=True, slots=True)
+class ReservableBlock:
+
+    campsite_id: str
+    start: datetime.date
+    nights: int
+    nyr_nights: int
+    # bit i set => night i is Not Yet Reservable
+    nyr_mask: int = 0
+
+    @property
+    def available(self) -> bool:
+        # every night can be booked right now
+        return self.nyr_nights == 0
+
+    @property
+    def end(self) -> datetime.date:
+        return self.start + datetime.timedelta(days=self.nights - 1)
+
+    def night_statuses(self) -> list[tuple[datetime.date, CampsiteStatus]]:
+        return [
+            (
+                self.start + datetime.timedelta(days=i),
+                self.nyr_mask >> i & 1
+                and CampsiteStatus.not_yet_reservable
+                or CampsiteStatus.available,
+            )
+            for i in range(self.nights)
+        ]
+
+
+@dataclass(order=True, slots=True)
 class CampsiteAvailabilityInfo:
 
     date: datetime.date = field(compare=True)
-    availability: str = field(compare=False)
+    status: CampsiteStatus = field(compare=False)
+    # what rec.gov returned, for statuses that aren't a CampsiteStatus
+    raw: Optional[str] = field(default=None, compare=False)
 
     def __repr__(self) -> str:
         return f"CampsiteAvailabilityInfo({self.date:%b %d, %Y}: {self.availability})"
 
+    @property
+    def availability(self) -> str:
+        return self.raw if self.raw is not None else self.status.label
+
     @property
     def available(self) -> bool:
-        return self.availability == "Available"
+        return self.status is CampsiteStatus.available
 
     @property
     def reserved(self):
-        return self.availability == "Reserved"
+        return self.status is CampsiteStatus.reserved
 
     @property
     def not_yet_reservable(self):
-        return self.availability == "NYR"
+        return self.status is CampsiteStatus.not_yet_reservable
 
     @property
     def for_management(self):
-        return self.availability == "Management"
+        return self.status is CampsiteStatus.management
@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.sql import Select
+from sqlmodel import col, select
+
+from .history import CHUNK_SIZE
+from .models import Campsite, CampsiteAttribute, PermittedEquipment
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+    from .models import Facility
+
+# the RIDB attribute holding a campsite's longest allowed vehicle, in feet
+VEHICLE_LENGTH_ATTRIBUTE = "Max Vehicle Length"
+
+
+@dataclass(frozen=True)
+class CampsiteFilter:
+    """What a campsite must offer, checked against the loaded RIDB attributes and
+    permitted equipment before any availability is fetched.
+
+    A campsite fits `min_vehicle_length` if its "Max Vehicle Length", or the max length
+    of one of its `equipment` (any equipment, if none is asked for) is long enough.
+    Campsites whose length isn't known don't fit. Names and values are matched
+    case-insensitively.
+    """
+
+    min_vehicle_length: Optional[float] = None
+    # any one of these is enough
+    equipment: tuple[str, ...] = ()
+    # (name, value) pairs that must all hold
+    attributes: tuple[tuple[str, str], ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.min_vehicle_length is not None or self.equipment or self.attributes
+        )
+
+    def key(self) -> str:
+        """A stable description, for telling filtered queries apart."""
+        parts = [f"{name}={value}".lower() for name, value in sorted(self.attributes)]
+        if self.equipment:
+            parts.append(
+                "equipment=" + ",".join(sorted(e.lower() for e in self.equipment))
+            )
+        if self.min_vehicle_length is not None:
+            parts.append(f"length>={self.min_vehicle_length:g}")
+        return ";".join(parts)
+
+    def conditions(self) -> list[sa.ColumnElement[bool]]:
+        """Conditions on `Campsite` rows (as EXISTS subqueries) for this filter."""
+        conditions: list[sa.ColumnElement[bool]] = [
+            _has_attribute(
+                col(CampsiteAttribute.name) == name,
+                col(CampsiteAttribute.value) == value,
+            )
+            for name, value in self.attributes
+        ]
+        equipment: list[sa.ColumnElement[bool]] = []
+        if self.equipment:
+            equipment.append(col(PermittedEquipment.name).in_(self.equipment))
+        if self.min_vehicle_length is not None:
+            long_enough = col(PermittedEquipment.max_length) >= self.min_vehicle_length
+            conditions.append(
+                sa.or_(
+                    _has_attribute(
+                        col(CampsiteAttribute.name) == VEHICLE_LENGTH_ATTRIBUTE,
+                        col(CampsiteAttribute.number) >= self.min_vehicle_length,
+                    ),
+                    _has_equipment(*equipment, long_enough),
+                )
+            )
+        if equipment:
+            conditions.append(_has_equipment(*equipment))
+        return conditions
+
+    def apply(self, stmt: Select) -> Select:
+        """Filter a select involving `Campsite` to the campsites that fit."""
+        return stmt.where(*self.conditions())
+
+    def campsite_ids_by_campground(
+        self, session: "Session", campgrounds: Iterable["Facility"]
+    ) -> dict[int, set[str]]:
+        """The rec.gov IDs of the campsites that fit, by their campground's `id`.
+        Campgrounds without any are left out."""
+        ids = [c.id for c in campgrounds]
+        found: dict[int, set[str]] = {}
+        for i in range(0, len(ids), CHUNK_SIZE):
+            stmt = self.apply(
+                select(Campsite.facility_id, Campsite.campsite_id).where(
+                    col(Campsite.facility_id).in_(ids[i : i + CHUNK_SIZE])
+                )
+            )
+            for facility_id, campsite_id in session.execute(stmt):
+                found.setdefault(facility_id, set()).add(str(campsite_id))
+        return found
+
+
+def attributes_loaded(session: "Session") -> bool:
+    return (
+        session.execute(select(CampsiteAttribute.id).limit(1)).first() is not None
+        or session.execute(select(PermittedEquipment.id).limit(1)).first() is not None
+    )
+
+
+def _has_attribute(*conditions: sa.ColumnElement[bool]) -> sa.Exists:
+    return sa.exists().where(
+        col(CampsiteAttribute.campsite_id) == Campsite.id, *conditions
+    )
+
+
+def _has_equipment(*conditions: sa.ColumnElement[bool]) -> sa.Exists:
+    return sa.exists().where(
+        col(PermittedEquipment.campsite_id) == Campsite.id, *conditions
+    )
@@ -0,0 +1,513 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Optional, TextIO
+
+import click
+import requests
+from rich_click import RichCommand
+from sqlmodel import col, select
+
+from .. import geo
+from ..burst import CampgroundPlan
+from ..cache import MATCH_CACHE_PATH, MatchCache
+from ..campsite_filter import CampsiteFilter, attributes_loaded
+from ..db import Session, ensure_location_index, ensure_tables
+from ..history import CHUNK_SIZE, HistoryRecorder
+from ..matching import Ranking, block_score, rank_matches
+from ..models import (
+    AvailabilityHistory,
+    Campsite,
+    CampsiteAttribute,
+    Facility,
+    FacilityType,
+    PermittedEquipment,
+    RecreationArea,
+)
+from ..profiling import span
+from ..records import block_record
+from ..recreationdotgov import RecreationDotGov
+from ..scheduling import RequestBudget
+from ..search import iter_campsite_blocks
+from ..snapshots import AvailabilitySnapshot, SnapshotStore, snapshot_key
+from .common import (
+    RecordWriter,
+    burst_options,
+    burst_search,
+    campsites_by_id,
+    echo,
+    format_option,
+    open_records,
+    parse_attributes,
+    parse_coordinates,
+    set_daemon_mode,
+)
+
+if TYPE_CHECKING:
+    from ..campsite_availability import ReservableBlock
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "--start-date",
+    "-s",
+    "start",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    required=True,
+    metavar="<YYYY-MM-DD>",
+)
+@click.option(
+    "--end-date",
+    "-e",
+    "end",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    metavar="<YYYY-MM-DD>",
+)
+@click.option(
+    "--include-nyr",
+    "nyr",
+    type=bool,
+    is_flag=True,
+    help="Include sites and dates that are Not Yet Reservable",
+)
+@click.option(
+    "--daemon-mode",
+    type=bool,
+    is_flag=True,
+    help="Output only if availabilities are found (for daemonizing purposes)",
+)
+@click.option(
+    "--limit",
+    "-k",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only show the best K blocks (stops searching once they are found).",
+)
+@click.option(
+    "--first",
+    type=bool,
+    is_flag=True,
+    help="Only show the best block (same as --limit 1).",
+)
+@click.option(
+    "--rank",
+    type=click.Choice(
+        [r.value for r in (Ranking.earliest, Ranking.weekend, Ranking.fewest_nyr)],
+        case_sensitive=False,
+    ),
+    default=Ranking.earliest.value,
+    show_default=True,
+    help="How to order blocks: earliest start, Fri/Sat starts or fewest NYR nights.",
+)
+@click.option(
+    "--only-new",
+    type=bool,
+    is_flag=True,
+    help="Only show matches with nights that opened since the last --only-new run.",
+)
+@click.option(
+    "--record-history",
+    type=bool,
+    is_flag=True,
+    help="Append the fetched availability to the history table.",
+)
+@click.option(
+    "--rec-area",
+    "rec_area_ids",
+    multiple=True,
+    help="Search every campground in this rec area (RIDB ID or code, e.g. GLAC).",
+)
+@click.option(
+    "--near",
+    type=str,
+    callback=parse_coordinates,
+    default=None,
+    help="Search every campground near LAT,LON.",
+)
+@click.option(
+    "--radius",
+    type=click.FloatRange(min=0),
+    default=50,
+    show_default=True,
+    help="How many miles from --near to look.",
+)
+@click.option(
+    "--facility-file",
+    type=click.File(),
+    default=None,
+    help="Search the campgrounds listed in this file (one Facility ID per line).",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Number of campgrounds searched at the same time.",
+)
+@click.option(
+    "--budget",
+    type=click.FloatRange(min=0),
+    default=60,
+    show_default=True,
+    help="Most requests per minute to Rec.gov (0 for no limit).",
+)
+@click.option(
+    "--min-vehicle-length",
+    type=click.FloatRange(min=0),
+    default=None,
+    metavar="FEET",
+    help="Only campsites fitting a vehicle (or --equipment) this long.",
+)
+@click.option(
+    "--equipment",
+    multiple=True,
+    help="Only campsites permitting this equipment, e.g. Trailer (any of several).",
+)
+@click.option(
+    "--attribute",
+    "attributes",
+    multiple=True,
+    callback=parse_attributes,
+    metavar="NAME=VALUE",
+    help="Only campsites with this RIDB attribute, e.g. Shade=Yes (all of several).",
+)
+@burst_options
+@format_option
+@click.argument("campground_ids", nargs=-1, type=str)
+@click.argument("num_days", type=int)
+@click.pass_context
+def find_campsite_dates(
+    ctx,
+    start: datetime.datetime,
+    end: Optional[datetime.datetime],
+    nyr: bool,
+    daemon_mode: bool,
+    limit: Optional[int],
+    first: bool,
+    rank: str,
+    only_new: bool,
+    record_history: bool,
+    rec_area_ids: tuple[str],
+    near: Optional[tuple[float, float]],
+    radius: float,
+    facility_file: Optional[TextIO],
+    workers: int,
+    budget: float,
+    min_vehicle_length: Optional[float],
+    equipment: tuple[str, ...],
+    attributes: tuple[tuple[str, str], ...],
+    burst_seconds: Optional[float],
+    burst_interval: float,
+    burst_workers: int,
+    release_at: Optional[datetime.datetime],
+    output_format: str,
+    campground_ids: tuple[str],
+    num_days: int,
+) -> None:
+    """Find available reservation dates at one or more campgrounds.
+
+    Provide CAMPGROUND_IDS, and/or "--rec-area", "--near" or "--facility-file" to
+    sweep every campground they cover. Campgrounds are searched concurrently (sharing
+    one request budget) and each one's blocks are printed as soon as it's done, or
+    with "--format ndjson" or "json", written as one record per block.
+    "--limit" and "--first" apply per campground.
+
+    "--min-vehicle-length", "--equipment" and "--attribute" narrow the campsites
+    (and campgrounds) searched using the attributes loaded by
+    "load-campsite-attributes", before any availability is fetched.
+
+    With "--burst" the requests the search needs are made over and over (ignoring
+    "--budget") and each new block is reported as soon as a response turns it up.
+    """
+    set_daemon_mode(daemon_mode)
+    start_date = start.date()
+    end_date = end and end.date() or start.date()
+    if not (campground_ids or rec_area_ids or near or facility_file):
+        raise click.UsageError(
+            "Provide CAMPGROUND_IDS, --rec-area, --near or --facility-file."
+        )
+    if burst_seconds is not None and (only_new or record_history):
+        raise click.UsageError(
+            "--burst can't be used with --only-new or --record-history."
+        )
+    if release_at is not None and burst_seconds is None:
+        raise click.UsageError("--release-at only works with --burst.")
+    file_ids = facility_file and read_facility_file(facility_file) or []
+    records = open_records(ctx, output_format)
+    rtree = near is not None and ensure_location_index()
+    campsite_filter = CampsiteFilter(min_vehicle_length, equipment, attributes)
+    if campsite_filter:
+        ensure_tables(CampsiteAttribute, PermittedEquipment)
+
+    with Session.begin() as session:
+        campgrounds = resolve_campgrounds(
+            session, [*campground_ids, *file_ids], rec_area_ids, near, radius, rtree
+        )
+        if not campgrounds:
+            echo("No campgrounds found.", fg="red", bold=True)
+            return
+        # rec.gov IDs of the campsites worth fetching, by campground
+        allowed: dict[int, set[str]] = {}
+        if campsite_filter:
+            if not attributes_loaded(session):
+                raise click.UsageError(
+                    "No campsite attributes loaded, run `recyoself "
+                    "load-campsite-attributes` first."
+                )
+            allowed = campsite_filter.campsite_ids_by_campground(session, campgrounds)
+            matching = [c for c in campgrounds if c.id in allowed]
+            if not matching:
+                echo("No campsites match the filters.", fg="red", bold=True)
+                return
+            if len(matching) < len(campgrounds):
+                skipped = len(campgrounds) - len(matching)
+                echo(f"Skipping {skipped} campground(s) without matching sites.")
+            campgrounds = matching
+
+        def allowed_campsite_ids(campground: Facility) -> Optional[set[str]]:
+            # None (no filters) fetches every campsite
+            if campground.id is None:
+                return None
+            return allowed.get(campground.id)
+
+        rdg = RecreationDotGov(budget=budget and RequestBudget(budget) or None)
+        if burst_seconds is not None:
+            plans = [
+                CampgroundPlan(
+                    c, start_date, end_date, num_days, nyr, allowed_campsite_ids(c)
+                )
+                for c in campgrounds
+            ]
+
+            def report_block(
+                plan: CampgroundPlan, block: "ReservableBlock", seconds: float
+            ) -> None:
+                name, loop = plan.sites.get(block.campsite_id, (block.campsite_id, ""))
+                if records is not None:
+                    records.write(
+                        block_record(
+                            block,
+                            plan.facility_id,
+                            plan.label,
+                            name,
+                            loop,
+                            found_after=round(seconds, 3),
+                        )
+                    )
+                    return
+                nyr = not block.available and " (NYR)" or ""
+                echo(
+                    f"{plan.label}: Site {name} ({loop}): "
+                    f"{block.start:%a, %b %-d}{nyr} (+{seconds:.2f}s)",
+                    override=True,
+                    fg=nyr and "yellow" or "green",
+                )
+
+            stats = burst_search(
+                rdg,
+                plans,
+                burst_seconds,
+                burst_interval,
+                burst_workers,
+                release_at,
+                first and 1 or limit,
+                report_block,
+                records,
+            )
+            if not stats.found:
+                echo("No open campsites found. :(", fg="red", bold=True)
+            return
+        # daemon runs usually see unchanged availability, so reuse previous results
+        match_cache = MatchCache.load(MATCH_CACHE_PATH) if daemon_mode else None
+        history = record_history and HistoryRecorder() or None
+        if history is not None:
+            ensure_tables(AvailabilityHistory)
+        score, best_score = block_score(Ranking(rank))
+        max_blocks = first and 1 or limit
+
+        def search_campground(
+            campground: Facility,
+        ) -> tuple[list["ReservableBlock"], Optional[AvailabilitySnapshot]]:
+            snapshot = AvailabilitySnapshot() if only_new else None
+            blocks = iter_campsite_blocks(
+                rdg,
+                campground,
+                start_date,
+                end_date,
+                num_days,
+                include_nyr=nyr,
+                match_cache=match_cache,
+                snapshot=snapshot,
+                history=history,
+                campsite_ids=allowed_campsite_ids(campground),
+            )
+            # with --only-new the limit waits until the new blocks are known, which
+            # takes every date being fetched (and saved to the snapshot)
+            fetch_limit = snapshot is None and max_blocks or None
+            ranked = rank_matches(blocks, score, best_score, fetch_limit)
+            return list(ranked), snapshot
+
+        found_any = False
+        with ThreadPoolExecutor(max_workers=min(workers, len(campgrounds))) as pool:
+            futures = {pool.submit(search_campground, c): c for c in campgrounds}
+            for future in as_completed(futures):
+                campground = futures[future]
+                try:
+                    ranked_blocks, snapshot = future.result()
+                except requests.RequestException as e:
+                    echo(f"{campground.name}: {e}", override=True, fg="red", err=True)
+                    continue
+                if snapshot is not None:
+                    target = campground.facility_id
+                    if campsite_filter:
+                        target = f"{target}[{campsite_filter.key()}]"
+                    key = snapshot_key(
+                        "cli",
+                        "campground",
+                        target,
+                        start_date,
+                        end_date,
+                        num_days,
+                        nyr,
+                    )
+                    delta = SnapshotStore().update(key, snapshot)
+                    ranked_blocks = [b for b in ranked_blocks if delta.is_new_block(b)][
+                        :max_blocks
+                    ]
+                if records is not None:
+                    found_any |= write_campground_blocks(
+                        records, session, campground, ranked_blocks
+                    )
+                    continue
+                found_any |= print_campground_blocks(
+                    session, campground, ranked_blocks, num_days, start_date, end_date
+                )
+
+        if match_cache is not None:
+            match_cache.save(MATCH_CACHE_PATH)
+        if history is not None:
+            history.flush(session)
+        if not found_any:
+            echo("No open campsites found. :(", fg="red", bold=True)
+
+
+def read_facility_file(facility_file: TextIO) -> list[str]:
+    """Facility IDs from a file, one per line (blank lines and # comments ignored)."""
+    ids = (line.split("#", 1)[0].strip() for line in facility_file)
+    return [i for i in ids if i]
+
+
+def resolve_campgrounds(
+    session,
+    facility_ids: list[str],
+    rec_area_ids: tuple[str, ...],
+    near: Optional[tuple[float, float]],
+    radius: float,
+    rtree: bool,
+) -> list[Facility]:
+    """The facilities to search: those listed by ID (which must all exist), then the
+    campgrounds in the rec areas, then those near a point (closest first)."""
+    campgrounds: dict[str, Facility] = {}
+    if facility_ids:
+        found: dict[str, Facility] = {}
+        unique_ids = list(dict.fromkeys(facility_ids))
+        for i in range(0, len(unique_ids), CHUNK_SIZE):
+            stmt = select(Facility).where(
+                col(Facility.facility_id).in_(unique_ids[i : i + CHUNK_SIZE])
+            )
+            found.update((f.facility_id, f) for f in session.scalars(stmt))
+        missing = [i for i in unique_ids if i not in found]
+        if missing:
+            raise ValueError(
+                f"Could not find Campground (Facility) with ID {', '.join(missing)}"
+            )
+        campgrounds.update((i, found[i]) for i in unique_ids)
+    if rec_area_ids:
+        stmt = (
+            select(Facility)
+            .join(RecreationArea)
+            .where(
+                Facility.type == FacilityType.campground,
+                col(RecreationArea.rec_area_id).in_(rec_area_ids)
+                | col(RecreationArea.org_rec_area_id).in_(rec_area_ids),
+            )
+            .order_by(Facility.name)
+        )
+        for facility in session.scalars(stmt):
+            campgrounds.setdefault(facility.facility_id, facility)
+    if near is not None:
+        stmt = select(Facility).where(Facility.type == FacilityType.campground)
+        stmt = geo.within_box(stmt, geo.bounding_box(*near, radius), rtree)
+        for facility, _ in geo.nearest(session.scalars(stmt), *near, radius):
+            campgrounds.setdefault(facility.facility_id, facility)
+    return list(campgrounds.values())
+
+
+def print_campground_blocks(
+    session,
+    campground: Facility,
+    ranked_blocks: list["ReservableBlock"],
+    num_days: int,
+    start_date: datetime.date,
+    end_date: datetime.date,
+) -> bool:
+    """Print a campground's blocks grouped by campsite, returning whether any were."""
+    # keep ranked order, grouped by the campsite's best block
+    blocks_by_campsite: dict[str, list[ReservableBlock]] = {}
+    for block in ranked_blocks:
+        blocks_by_campsite.setdefault(block.campsite_id, []).append(block)
+
+    campsites = campsites_by_id(session, campground, blocks_by_campsite)
+    reservable_block_list: list[tuple[Campsite, list[ReservableBlock]]] = []
+    for campsite_id, campsite_blocks in blocks_by_campsite.items():
+        cs = campsites.get(str(campsite_id))
+        if cs:
+            reservable_block_list.append((cs, campsite_blocks))
+    if not reservable_block_list:
+        return False
+
+    with span("render"):
+        echo(
+            f"{campground.name}: {num_days}-day availabilities from {start_date:%b %-d} to {end_date:%b %-d}",
+            override=True,
+            bold=True,
+            underline=True,
+        )
+        for cs, campsite_blocks in reservable_block_list:
+            echo(
+                f"Site {cs.name} ({cs.loop}): {cs.combined_type}, starting on:",
+                override=True,
+                bold=True,
+            )
+            for block in campsite_blocks:
+                s = f"{block.start:%a, %b %-d}"
+                color = "green"
+                if not block.available:
+                    s += " (NYR)"
+                    color = "yellow"
+                echo(s, override=True, fg=color)
+    return True
+
+
+def write_campground_blocks(
+    records: RecordWriter,
+    session,
+    campground: Facility,
+    ranked_blocks: list["ReservableBlock"],
+) -> bool:
+    """Write a record per block in ranked order, returning whether any were."""
+    campsites = campsites_by_id(
+        session, campground, {b.campsite_id for b in ranked_blocks}
+    )
+    found = False
+    with span("render"):
+        for block in ranked_blocks:
+            cs = campsites.get(str(block.campsite_id))
+            if not cs:
+                continue
+            records.write(
+                block_record(
+                    block, campground.facility_id, campground.name, cs.name, cs.loop
+                )
+            )
+            found = True
+    return found
@@ -0,0 +1,237 @@
+import datetime
+import json
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional, Sequence, TypeVar
+
+import click
+from sqlmodel import col, select
+
+from ..history import CHUNK_SIZE
+from ..models import Campsite, Facility
+
+if TYPE_CHECKING:
+    from ..burst import BurstPlan, BurstStats
+    from ..recreationdotgov import RecreationDotGov
+
+P = TypeVar("P", bound="BurstPlan")
+
+DAEMON_MODE: bool = False
+# while records are written to stdout, messages for people go to stderr
+MESSAGES_TO_STDERR: bool = False
+
+OUTPUT_FORMATS = ["text", "ndjson", "json"]
+
+format_option = click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(OUTPUT_FORMATS, case_sensitive=False),
+    default="text",
+    show_default=True,
+    help="text for people, or a JSON record per result: one per line (ndjson) or "
+    "in one array (json), written as soon as each is found.",
+)
+
+
+def set_daemon_mode(enabled: bool) -> None:
+    # daemon runs only print what's found (see `echo`)
+    global DAEMON_MODE
+    DAEMON_MODE = enabled
+
+
+def parse_coordinates(
+    ctx, param, value: Optional[str]
+) -> Optional[tuple[float, float]]:
+    if value is None:
+        return None
+    try:
+        lat, lon = (float(part) for part in value.split(","))
+    except ValueError:
+        raise click.BadParameter("expected LAT,LON, e.g. 48.7,-113.8")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise click.BadParameter("latitude must be within ±90, longitude within ±180")
+    return lat, lon
+
+
+def parse_moment(ctx, param, value: Optional[str]) -> Optional[datetime.datetime]:
+    if value is None:
+        return None
+    try:
+        moment = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise click.BadParameter("expected YYYY-MM-DDTHH:MM[:SS][+HH:MM]")
+    # without an offset it's local time
+    return moment.astimezone()
+
+
+# burst mode for the find-* commands, see `burst_search`
+BURST_OPTIONS = [
+    click.option(
+        "--burst",
+        "burst_seconds",
+        type=click.FloatRange(min=0, min_open=True),
+        default=None,
+        metavar="SECONDS",
+        help="Make the searched for requests over and over for this long, reporting "
+        "matches as soon as they appear (e.g. right as availability is released).",
+    ),
+    click.option(
+        "--burst-interval",
+        type=click.FloatRange(min=0.05),
+        default=0.5,
+        show_default=True,
+        help="Seconds between repeats of each request in --burst mode.",
+    ),
+    click.option(
+        "--burst-workers",
+        type=click.IntRange(min=1),
+        default=8,
+        show_default=True,
+        help="Most requests in flight at once in --burst mode.",
+    ),
+    click.option(
+        "--release-at",
+        type=str,
+        callback=parse_moment,
+        default=None,
+        metavar="<YYYY-MM-DDTHH:MM>",
+        help="With --burst, open connections ahead of time, start at this moment and "
+        "time matches from it (local time, unless an offset is given).",
+    ),
+]
+
+
+def burst_options(func):
+    for option in reversed(BURST_OPTIONS):
+        func = option(func)
+    return func
+
+
+def parse_attributes(
+    ctx, param, values: tuple[str, ...]
+) -> tuple[tuple[str, str], ...]:
+    pairs = []
+    for value in values:
+        name, sep, attr_value = value.partition("=")
+        if not (sep and name.strip() and attr_value.strip()):
+            raise click.BadParameter(
+                f"expected NAME=VALUE, e.g. Shade=Yes, not {value}"
+            )
+        pairs.append((name.strip(), attr_value.strip()))
+    return tuple(pairs)
+
+
+def echo(message: str = "", override: bool = False, **kwargs):
+    if not DAEMON_MODE or override:
+        if MESSAGES_TO_STDERR:
+            kwargs["err"] = True
+        click.secho(message, **kwargs)
+
+
+class RecordWriter:
+    """Writes results to stdout as JSON, each one as soon as it's given: one object
+    per line (ndjson), or the elements of a single array (json)."""
+
+    def __init__(self, array: bool = False) -> None:
+        self.array = array
+        self.count = 0
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record)
+        if self.array:
+            line = ("[\n" if self.count == 0 else ",\n") + line
+        # click.echo flushes, so consumers see every record right away
+        click.echo(line, nl=not self.array)
+        self.count += 1
+
+    def close(self) -> None:
+        if self.array:
+            click.echo(self.count and "\n]" or "[]")
+
+
+def open_records(ctx: click.Context, output_format: str) -> Optional[RecordWriter]:
+    """A writer for `output_format` (None for text) that's closed along with the
+    command. Until then, messages from `echo` go to stderr to keep stdout parseable.
+    """
+    global MESSAGES_TO_STDERR
+    if output_format == "text":
+        return None
+    writer = RecordWriter(array=output_format == "json")
+    MESSAGES_TO_STDERR = True
+
+    def close() -> None:
+        global MESSAGES_TO_STDERR
+        writer.close()
+        MESSAGES_TO_STDERR = False
+
+    ctx.call_on_close(close)
+    return writer
+
+
+def campsites_by_id(
+    session, campground: Facility, campsite_ids: Iterable[str]
+) -> dict[str, Campsite]:
+    """The campground's campsites with the given IDs, looked up in batches."""
+    ids = sorted({int(i) for i in campsite_ids})
+    campsites: dict[str, Campsite] = {}
+    for i in range(0, len(ids), CHUNK_SIZE):
+        stmt = select(Campsite).where(
+            Campsite.facility_id == campground.id,
+            col(Campsite.campsite_id).in_(ids[i : i + CHUNK_SIZE]),
+        )
+        campsites.update((str(c.campsite_id), c) for c in session.scalars(stmt))
+    return campsites
+
+
+def burst_search(
+    rdg: "RecreationDotGov",
+    plans: Sequence[P],
+    seconds: float,
+    interval: float,
+    workers: int,
+    release_at: Optional[datetime.datetime],
+    limit: Optional[int],
+    on_found: Callable[[P, Any, float], Any],
+    records: Optional[RecordWriter] = None,
+) -> "BurstStats":
+    """Run the plans in burst mode (see `burst.run_burst`), waiting for `release_at`
+    with warm connections first if given, then report how it went."""
+    from ..burst import run_burst
+    from ..scheduling import hold_until
+
+    started = None
+    if release_at is not None:
+        echo(f"Waiting for {release_at:%Y-%m-%d %H:%M:%S %Z}...", bold=True)
+        rdg.warm_up(workers)
+        hold_until(release_at, lambda: rdg.warm_up(workers))
+        started = time.monotonic()
+    stats = run_burst(
+        rdg, plans, seconds, interval, workers, on_found, limit, started=started
+    )
+    since = release_at is not None and "the release" or "starting"
+    latencies = ", ".join(
+        f"p{p} {s * 1000:.0f} ms" for p, s in stats.percentiles().items()
+    )
+    echo(
+        f"Burst: {stats.requests} requests ({stats.errors} failed) in "
+        f"{stats.elapsed:.1f}s, latency {latencies or 'n/a'}",
+        bold=True,
+    )
+    if stats.first_found is not None:
+        echo(f"First match {stats.first_found:.2f}s after {since}", bold=True)
+    if records is not None:
+        records.write(
+            {
+                "type": "burst_stats",
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "matches": stats.found,
+                "seconds": round(stats.elapsed, 3),
+                "first_match_seconds": (
+                    None if stats.first_found is None else round(stats.first_found, 3)
+                ),
+                "latency_ms": {
+                    f"p{p}": round(s * 1000, 1) for p, s in stats.percentiles().items()
+                },
+            }
+        )
+    return stats
@@ -0,0 +1,134 @@
+from typing import TYPE_CHECKING
+
+import click
+from rich_click import RichCommand
+from sqlmodel import delete, insert, select
+
+from ..db import (
+    ReadSession,
+    Session,
+    bulk_load_session,
+    drop_db,
+    ensure_tables,
+    init_db,
+    optimize_search_index,
+)
+from ..models import CampsiteAttribute, Facility, PermittedEquipment
+from ..recreationdotgov import RecreationDotGov
+from .common import echo
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session as OrmSession
+
+    from ..ridb import RIDB
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "--skip-download",
+    type=bool,
+    is_flag=True,
+    help="Use cached files from a previous run.",
+)
+@click.pass_context
+def init(ctx, skip_download: bool) -> None:
+    """Initialize the database and load initial entities from RIDB/Rec.gov."""
+    from ..ridb import RIDB
+
+    init_db()
+    ridb = RIDB()
+    if not skip_download:
+        echo(f"Fetching RIDB entities full-export CSVs...", bold=True, underline=True)
+        ridb.fetch_entities()
+    with bulk_load_session() as session:
+        echo(f"Loading entities into database...", bold=True, underline=True)
+        for organization in ridb.make_organizations(session):
+            session.add(organization)
+        session.add(ridb.make_org_157())
+        for rec_area in ridb.make_rec_areas(session):
+            session.add(rec_area)
+        for facility in ridb.make_facilities(session):
+            session.add(facility)
+        for campsite in ridb.make_campsites(session):
+            session.add(campsite)
+        session.flush()
+        load_campsite_details(ridb, session)
+    ctx.invoke(load_lotteries)
+    optimize_search_index()
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "--skip-download",
+    type=bool,
+    is_flag=True,
+    help="Use cached files from a previous run.",
+)
+def load_campsite_attributes(skip_download: bool) -> None:
+    """Load campsite attributes and permitted equipment from RIDB (replacing any
+    loaded before), for filtering campsites in find-campsite-dates."""
+    from ..ridb import RIDB
+
+    ensure_tables(CampsiteAttribute, PermittedEquipment)
+    ridb = RIDB()
+    if not skip_download:
+        echo("Fetching RIDB entities full-export CSVs...", bold=True, underline=True)
+        ridb.fetch_entities()
+    with bulk_load_session() as session:
+        session.execute(delete(CampsiteAttribute))
+        session.execute(delete(PermittedEquipment))
+        load_campsite_details(ridb, session)
+
+
+def load_campsite_details(ridb: "RIDB", session: "OrmSession") -> None:
+    # far more rows than campsites, so they're inserted in batches, skipping the ORM
+    for batch in ridb.make_campsite_attributes(session):
+        session.execute(insert(CampsiteAttribute), batch)
+    for batch in ridb.make_permitted_equipment(session):
+        session.execute(insert(PermittedEquipment), batch)
+
+
+@click.command(cls=RichCommand)
+@click.pass_context
+def drop(ctx) -> None:
+    """Drop the database."""
+    if click.confirm("Do you want to drop the database?", abort=True):
+        drop_db()
+
+
+@click.command(cls=RichCommand)
+@click.pass_context
+def check_for_updated_data(ctx) -> None:
+    """Check if RIDB CSVs contain new data compared to checksums on file."""
+    from ..ridb import RIDB
+
+    ridb = RIDB()
+    echo(f"Fetching RIDB entities full-export CSVs...", bold=True, underline=True)
+    ridb.fetch_entities()
+    with ReadSession.begin() as session:
+        for entity in ridb.entities:
+            echo(f"Updates for {entity}: {ridb.is_entity_csv_updated(entity, session)}")
+
+
+@click.command(cls=RichCommand)
+@click.argument("permit_id")
+def load_divisions(permit_id):
+    """Load divisions from rec.gov for a given Permit (Facility) ID"""
+    with Session.begin() as session:
+        permit_stmt = select(Facility).where(Facility.facility_id == permit_id)
+        permit = session.scalars(permit_stmt).first()
+        if not permit:
+            raise ValueError(f"Could not find permit with ID {permit_id}")
+
+        rdg = RecreationDotGov()
+        for division in rdg.make_permit_divisions(permit):
+            session.add(division)
+
+
+@click.command(cls=RichCommand)
+def load_lotteries():
+    """Load all currently available lotteries from rec.gov"""
+    with Session.begin() as session:
+        rdg = RecreationDotGov()
+        for lottery in rdg.make_lotteries(session):
+            session.add(lottery)
@@ -0,0 +1,103 @@
+import datetime
+from typing import Optional
+
+import click
+from rich_click import RichCommand
+
+from ..campsite_availability import CampsiteStatus
+from ..db import ReadSession, Session, ensure_tables, get_engine
+from ..history import compact_history as compact_history_runs
+from ..history import entity_history, openings
+from ..models import AvailabilityHistory, HistoryEntityType
+from .common import echo
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "--start-date",
+    "-s",
+    "start",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    required=True,
+    metavar="<YYYY-MM-DD>",
+)
+@click.option(
+    "--end-date",
+    "-e",
+    "end",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    metavar="<YYYY-MM-DD>",
+)
+@click.option("--division-id", type=str, default=None, help="History of one division.")
+@click.option("--campsite-id", type=str, default=None, help="History of one campsite.")
+@click.option(
+    "--since",
+    type=click.DateTime(formats=["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"]),
+    default=None,
+    help="Only openings first seen from this (UTC) time on.",
+)
+def show_history(
+    start: datetime.datetime,
+    end: Optional[datetime.datetime],
+    division_id: Optional[str],
+    campsite_id: Optional[str],
+    since: Optional[datetime.datetime],
+) -> None:
+    """Show recorded availability history for nights between the dates.
+
+    With --division-id or --campsite-id every change for that division/campsite is
+    listed, otherwise every opening that was seen for any of them.
+    """
+    if division_id and campsite_id:
+        raise click.UsageError("Provide only one of --division-id and --campsite-id.")
+    start_date = start.date()
+    end_date = end and end.date() or start_date
+    ensure_tables(AvailabilityHistory)
+    with ReadSession.begin() as session:
+        if division_id or campsite_id:
+            entity_type = (
+                division_id and HistoryEntityType.division or HistoryEntityType.campsite
+            )
+            entity_id = division_id or campsite_id or ""
+            runs = entity_history(session, entity_type, entity_id, start_date, end_date)
+        else:
+            runs = openings(session, start_date, end_date, since)
+        if not runs:
+            echo("No history recorded.", fg="red", bold=True)
+            return
+        for run in runs:
+            if run.entity_type == HistoryEntityType.division:
+                status = f"{run.status} slots"
+            else:
+                status = CampsiteStatus(run.status).label
+            echo(
+                f"{run.entity_type.value} {run.entity_id} {run.night:%a, %b %-d}: "
+                f"{status} ({run.first_seen_at:%-m/%-d/%y %H:%M} => "
+                f"{run.last_seen_at:%-m/%-d/%y %H:%M})",
+                fg=run.is_open and "green" or None,
+            )
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "--keep-days",
+    type=click.IntRange(min=1),
+    default=90,
+    show_default=True,
+    help="Delete history last seen (or for nights) more than this many days ago.",
+)
+@click.option(
+    "--vacuum",
+    type=bool,
+    is_flag=True,
+    help="Give the freed space back to the filesystem afterwards.",
+)
+def compact_history(keep_days: int, vacuum: bool) -> None:
+    """Keep the availability history bounded: drop old runs and merge repeats."""
+    ensure_tables(AvailabilityHistory)
+    with Session.begin() as session:
+        deleted, merged = compact_history_runs(session, keep_days)
+    echo(f"Deleted {deleted} old runs and merged {merged} repeated runs.")
+    if vacuum:
+        with get_engine().connect() as conn:
+            conn.exec_driver_sql("VACUUM")
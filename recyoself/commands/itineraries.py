@@ -0,0 +1,772 @@
+import datetime
+import sys
+from functools import partial
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+import click
+from rich_click import RichCommand
+from sqlalchemy.orm import joinedload
+from sqlmodel import col, select
+
+from ..burst import ItineraryPlan
+from ..cache import MATCH_CACHE_PATH, MatchCache
+from ..db import Session, ensure_tables
+from ..division_index import DivisionIndex, division_index, normalize
+from ..history import HistoryRecorder
+from ..matching import (
+    DivisionMatch,
+    Ranking,
+    division_match_score,
+    iter_division_availability_date_matches,
+    iter_unordered_itinerary_matches,
+    load_hops,
+    rank_matches,
+)
+from ..models import AvailabilityHistory, Division, Facility, Itinerary, Lottery
+from ..profiling import span
+from ..records import match_record
+from ..recreationdotgov import RecreationDotGov
+from ..search import DivisionMatcher, iter_itinerary_matches
+from ..snapshots import AvailabilitySnapshot, SnapshotStore, snapshot_key
+from ..utils.calendar import AvailabilityCalendar
+from .common import (
+    RecordWriter,
+    burst_options,
+    burst_search,
+    echo,
+    format_option,
+    open_records,
+    set_daemon_mode,
+)
+from .data import load_divisions
+
+if TYPE_CHECKING:
+    from ..division_availability import DivisionAvailability
+
+
+@click.command(cls=RichCommand)
+@click.argument("permit_id")
+@click.argument("new_itinerary_name")
+@click.pass_context
+def create_itinerary(ctx, permit_id, new_itinerary_name) -> None:
+    """Create a new, named itinerary for a given Permit (Facility)."""
+    import questionary as qu
+
+    from .. import AUTOCOMPLETE_STYLE
+
+    with Session.begin() as session:
+        permit = session.scalars(
+            select(Facility).where(Facility.facility_id == permit_id)
+        ).first()
+        if not permit:
+            echo(click.style(f"No Permit found with ID {permit_id}.", fg="red"))
+            return
+
+        if not permit.divisions:
+            if click.confirm(f'No divisions found for permit "{permit.name}". Load?'):
+                ctx.invoke(load_divisions, permit_id=permit_id)
+                session.refresh(permit)
+
+        reservable_divisions = [d for d in permit.divisions if d.is_reservable]
+        if not reservable_divisions:
+            echo("No currently reservable sites found. :(")
+            return
+
+        index = division_index(permit.facility_id, reservable_divisions)
+        divisions_by_name = {d.name: d for d in reservable_divisions}
+        completer = index.completer(
+            {
+                "list": "List available choices.",
+                "save": "Save the constructed itinerary.",
+                "cancel": "Exit without saving itinerary.",
+            }
+        )
+
+        itinerary, user_input = None, None
+        echo(
+            "Begin typing and make a selection to add it to your itinerary.", bold=True
+        )
+        echo('=> "save" to save itinerary as currently constructed')
+        echo('=> "cancel" to exit without saving the current itinerary')
+        echo('=> "list" to list all division autocomplete options')
+        while True:
+            user_input = qu.autocomplete(
+                "Choose a division:",
+                choices=index.names,
+                completer=completer,
+                style=AUTOCOMPLETE_STYLE,
+            ).ask()
+
+            if user_input == "save":
+                break
+            elif user_input in ("cancel", None):
+                ctx.abort()
+            elif user_input == "":
+                echo("Please provide an input.")
+                continue
+            elif user_input == "list":
+                echo(
+                    "".join(
+                        f"{d.name} ({d.type}, {d.district})\n"
+                        for d in reservable_divisions
+                    )
+                )
+                continue
+
+            division = choose_division(index, divisions_by_name, user_input)
+            if division is not None:
+                echo(f"Adding {division.name} to the itinerary.")
+                if not itinerary:
+                    itinerary = Itinerary(name=new_itinerary_name, permit=permit)
+                itinerary.add_division(division)
+                session.add(itinerary)
+                session.flush()
+                echo(f"Current itinerary includes:\n{itinerary.ordered_divisions_str}")
+
+        if itinerary is None:
+            echo("No divisions selected, not saving itinerary.")
+        elif not itinerary.divisions:
+            echo("No divisions added, not creating itinerary.")
+        else:
+            echo(
+                f'Saving itinerary "{itinerary.name}" with stops:\n{itinerary.ordered_divisions_str}'
+            )
+            session.add(itinerary)
+
+
+def choose_division(
+    index: DivisionIndex, divisions_by_name: dict[str, Division], user_input: str
+) -> Optional[Division]:
+    """The division `user_input` names, or the only one it matches. Otherwise says
+    what it matched (or might have meant) and returns None."""
+    matches = index.lookup(user_input)
+    if not matches:
+        echo(f'Could not find a division match for "{user_input}", please try again.')
+        suggestions = index.suggestions(user_input)
+        if suggestions:
+            echo("Did you mean:\n" + "\n".join(f">>> {n}" for n in suggestions))
+        return None
+    if len(matches) > 1 and normalize(matches[0]) != normalize(user_input):
+        matches_str = "\n".join(f">>> {n}" for n in matches)
+        echo(
+            f"Found multiple matches for {user_input}:\n{matches_str}\nPlease be more specific."
+        )
+        return None
+    return divisions_by_name[matches[0]]
+
+
+def print_availability_matches(
+    avail_matches: list[list[tuple["DivisionAvailability", datetime.date]]],
+    pretty_cal: bool = False,
+) -> None:
+    if pretty_cal:
+        echo("Starting dates only colored.\n")
+        # get distinct years for first day of all matches
+        years = {match[0][1].year for match in avail_matches}
+        calendars: dict[int, AvailabilityCalendar] = {
+            y: AvailabilityCalendar(y) for y in years
+        }
+        # mark start dates as available
+        for match in avail_matches:
+            start = match[0][1]
+            calendars[start.year].set_available(start.month, start.day)
+        # print relevant months
+        for cal in calendars.values():
+            for month in cal.styled_months:
+                cal.print_month(month)
+                echo("")
+    else:
+        for match in avail_matches:
+            first_day = f"{match[0][1]:%a, %b %-d}"
+            last_day = f"{match[-1][1]:%a, %b %-d}"
+            echo(f"{first_day} - {last_day}", override=True, bold=True)
+            echo(
+                "\n".join([f"{i[1]:%-m/%-d/%y}: {i[0].division.name}" for i in match]),
+                override=True,
+            )
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "--start-date",
+    "-s",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    required=True,
+    metavar="<YYYY-MM-DD>",
+)
+@click.option(
+    "--end-date",
+    "-e",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    metavar="<YYYY-MM-DD>",
+)
+@click.option(
+    "--pretty-cal",
+    type=bool,
+    is_flag=True,
+    help="Print dates with a pretty calendar UI",
+)
+@click.option(
+    "--limit",
+    "-k",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only show the best K matches (stops searching once they are found).",
+)
+@click.option(
+    "--first",
+    type=bool,
+    is_flag=True,
+    help="Only show the best match (same as --limit 1).",
+)
+@click.option(
+    "--rank",
+    type=click.Choice(
+        [r.value for r in (Ranking.earliest, Ranking.weekend, Ranking.most_slots)],
+        case_sensitive=False,
+    ),
+    default=Ranking.earliest.value,
+    show_default=True,
+    help="How to order matches: earliest start, Fri/Sat starts or most open slots.",
+)
+@format_option
+@click.argument("permit_id")
+@click.pass_context
+def find_division_dates(
+    ctx,
+    start_date: datetime.datetime,
+    end_date: Optional[datetime.datetime],
+    pretty_cal: bool,
+    limit: Optional[int],
+    first: bool,
+    rank: str,
+    output_format: str,
+    permit_id: str,
+) -> None:
+    """Check availability dates for a specific division within a permit."""
+    import questionary as qu
+
+    from .. import AUTOCOMPLETE_STYLE
+
+    if pretty_cal and output_format != "text":
+        raise click.UsageError("--pretty-cal only works with --format text.")
+    records = open_records(ctx, output_format)
+    # the prompts go where other messages do, so records are all that's on stdout
+    prompt_output = None
+    if records is not None:
+        from prompt_toolkit.output import create_output
+
+        prompt_output = create_output(stdout=sys.stderr)
+    # TODO: DRY this all up
+    start = start_date.date()
+    end = end_date and end_date.date() or start
+
+    with Session.begin() as session:
+        permit = session.scalars(
+            select(Facility).where(Facility.facility_id == permit_id)
+        ).first()
+        if not permit:
+            echo(click.style(f"No Permit found with ID {permit_id}.", fg="red"))
+            return
+
+        if not permit.divisions:
+            if click.confirm(
+                f'No divisions found for permit "{permit.name}". Load?',
+                err=records is not None,
+            ):
+                ctx.invoke(load_divisions, permit_id=permit_id)
+                session.refresh(permit)
+
+        reservable_divisions = [d for d in permit.divisions if d.is_reservable]
+        if not reservable_divisions:
+            echo("No currently reservable sites found. :(")
+            return
+
+        lotteries = permit.lotteries
+        relevant_lottery = None
+        if len(lotteries) == 0:
+            pass
+        elif len(lotteries) == 1:
+            relevant_lottery = lotteries[0]
+        else:
+            # TODO: Handle lottery IDs like below
+            pass
+
+        index = division_index(permit.facility_id, reservable_divisions)
+        divisions_by_name = {d.name: d for d in reservable_divisions}
+        completer = index.completer({"exit": "End session"})
+
+        echo("Begin typing and make a selection to see availability.", bold=True)
+        echo('=> "exit" to end session')
+        while True:
+            user_input = qu.autocomplete(
+                "Choose a division:",
+                choices=index.names,
+                completer=completer,
+                style=AUTOCOMPLETE_STYLE,
+                output=prompt_output,
+            ).ask()
+
+            if user_input in ("exit", None):
+                return
+
+            division = choose_division(index, divisions_by_name, user_input)
+            if division is not None:
+                echo(f"Finding available dates for {division.name}...")
+                rdg = RecreationDotGov()
+                score, best_score = division_match_score(Ranking(rank))
+                ranked = rank_matches(
+                    iter_itinerary_matches(
+                        rdg, [division], start, end, relevant_lottery
+                    ),
+                    score,
+                    best_score,
+                    first and 1 or limit,
+                )
+                if records is not None:
+                    write_matches(
+                        records, ranked, type="division_match", permit_id=permit_id
+                    )
+                    continue
+                avail_matches = list(ranked)
+                if not avail_matches:
+                    echo(
+                        "No possible date matches found for itinerary. :(",
+                        fg="red",
+                        bold=True,
+                    )
+                else:
+                    echo(
+                        f"{len(avail_matches)} date matches found:",
+                        override=True,
+                        bold=True,
+                        underline=True,
+                        fg="green",
+                    )
+                with span("render"):
+                    print_availability_matches(avail_matches, pretty_cal)
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "--start-date",
+    "-s",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    required=True,
+    metavar="<YYYY-MM-DD>",
+)
+@click.option(
+    "--end-date",
+    "-e",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    metavar="<YYYY-MM-DD>",
+)
+@click.option(
+    "--reversable",
+    "-r",
+    type=bool,
+    is_flag=True,
+    help="Find availabilty for reversed-itinerary.",
+)
+@click.option(
+    "--unordered",
+    "-u",
+    type=bool,
+    is_flag=True,
+    help="Allow the middle stops to be visited in any order (first and last stay fixed).",
+)
+@click.option(
+    "--free-ends",
+    type=bool,
+    is_flag=True,
+    help="With --unordered, also allow any stop to be the first or last night.",
+)
+@click.option(
+    "--hops",
+    "hops_path",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON file of allowed hops between divisions (used with --unordered).",
+)
+@click.option(
+    "--lottery-id",
+    "-l",
+    "lottery_ids",
+    type=str,
+    multiple=True,
+    help="rec.gov Lottery ID to use (and skips prompt). May be given once per permit.",
+)
+@click.option(
+    "--all",
+    "search_all",
+    type=bool,
+    is_flag=True,
+    help="Search every saved itinerary.",
+)
+@click.option(
+    "--permit-id",
+    type=str,
+    default=None,
+    help="Only search itineraries for this rec.gov Permit (Facility) ID.",
+)
+@click.option(
+    "--daemon-mode",
+    type=bool,
+    is_flag=True,
+    help="Output only if availabilities are found (for daemonizing purposes)",
+)
+@click.option(
+    "--pretty-cal",
+    type=bool,
+    is_flag=True,
+    help="Print dates with a pretty calendar UI",
+)
+@click.option(
+    "--limit",
+    "-k",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only show the best K matches per itinerary (stops searching once found).",
+)
+@click.option(
+    "--first",
+    type=bool,
+    is_flag=True,
+    help="Only show the best match per itinerary (same as --limit 1).",
+)
+@click.option(
+    "--rank",
+    type=click.Choice(
+        [r.value for r in (Ranking.earliest, Ranking.weekend, Ranking.most_slots)],
+        case_sensitive=False,
+    ),
+    default=Ranking.earliest.value,
+    show_default=True,
+    help="How to order matches: earliest start, Fri/Sat starts or most open slots.",
+)
+@click.option(
+    "--only-new",
+    type=bool,
+    is_flag=True,
+    help="Only show matches with nights that opened since the last --only-new run.",
+)
+@click.option(
+    "--record-history",
+    type=bool,
+    is_flag=True,
+    help="Append the fetched availability to the history table.",
+)
+@burst_options
+@format_option
+@click.argument("itinerary_names", nargs=-1)
+@click.pass_context
+def find_itinerary_dates(
+    ctx,
+    start_date: datetime.datetime,
+    end_date: Optional[datetime.datetime],
+    reversable: bool,
+    unordered: bool,
+    free_ends: bool,
+    hops_path: Optional[str],
+    lottery_ids: tuple[str],
+    search_all: bool,
+    permit_id: Optional[str],
+    daemon_mode: bool,
+    pretty_cal: bool,
+    limit: Optional[int],
+    first: bool,
+    rank: str,
+    only_new: bool,
+    record_history: bool,
+    burst_seconds: Optional[float],
+    burst_interval: float,
+    burst_workers: int,
+    release_at: Optional[datetime.datetime],
+    output_format: str,
+    itinerary_names: tuple[str],
+) -> None:
+    """Find available booking dates for one or more named itineraries.
+
+    Provide ITINERARY_NAMES, "--all" or "--permit-id" to choose the itineraries.
+    Divisions shared between itineraries are only fetched once. With "--format
+    ndjson" or "json" each match is written as soon as it's found (with
+    "--only-new", once its itinerary has been searched).
+
+    With "--burst" the requests the search needs are made over and over and each new
+    match is reported as soon as a response turns it up.
+    """
+    set_daemon_mode(daemon_mode)
+    start = start_date.date()
+    end = end_date and end_date.date() or start
+    if not (itinerary_names or search_all or permit_id):
+        raise click.UsageError("Provide ITINERARY_NAMES, --all or --permit-id.")
+    if pretty_cal and output_format != "text":
+        raise click.UsageError("--pretty-cal only works with --format text.")
+    if burst_seconds is not None and (only_new or record_history or pretty_cal):
+        raise click.UsageError(
+            "--burst can't be used with --only-new, --record-history or --pretty-cal."
+        )
+    if release_at is not None and burst_seconds is None:
+        raise click.UsageError("--release-at only works with --burst.")
+    records = open_records(ctx, output_format)
+
+    with Session.begin() as session:
+        stmt = (
+            select(Itinerary)
+            .options(joinedload(Itinerary.permit), Itinerary.with_divisions())  # type: ignore
+            .order_by(Itinerary.name)
+        )
+        if itinerary_names:
+            stmt = stmt.where(col(Itinerary.name).in_(itinerary_names))
+        if permit_id:
+            stmt = stmt.join(Facility).where(Facility.facility_id == permit_id)
+        itineraries = session.scalars(stmt).all()
+        for name in set(itinerary_names) - {i.name for i in itineraries}:
+            echo(f'No itinerary found with name "{name}"')
+        if not itineraries:
+            if not itinerary_names:
+                echo("No itineraries found.")
+            return
+
+        lotteries_by_permit: dict[int, Optional[Lottery]] = {}
+        for itinerary in itineraries:
+            if itinerary.permit_id not in lotteries_by_permit:
+                lotteries_by_permit[itinerary.permit_id] = choose_lottery(
+                    ctx, itinerary.permit, lottery_ids
+                )
+
+        # responses are cached by the client, so divisions shared between itineraries
+        # are only fetched once
+        rdg = RecreationDotGov()
+        # daemon runs usually see unchanged availability, so reuse previous results
+        match_cache = MatchCache.load(MATCH_CACHE_PATH) if daemon_mode else None
+        history = record_history and HistoryRecorder() or None
+        if history is not None:
+            ensure_tables(AvailabilityHistory)
+        score, best_score = division_match_score(Ranking(rank))
+        limit = first and 1 or limit
+
+        def matcher_for(itinerary: Itinerary) -> DivisionMatcher:
+            if not unordered:
+                return iter_division_availability_date_matches
+            hops = hops_path and load_hops(hops_path, itinerary.divisions) or None
+            return partial(
+                iter_unordered_itinerary_matches,
+                fixed_entry=not free_ends,
+                fixed_exit=not free_ends,
+                hops=hops,
+            )
+
+        if burst_seconds is not None:
+            plans = [
+                ItineraryPlan(
+                    itinerary.name,
+                    itinerary.divisions,
+                    start,
+                    end,
+                    lotteries_by_permit[itinerary.permit_id],
+                    reversable,
+                    matcher_for(itinerary),
+                )
+                for itinerary in itineraries
+            ]
+            permit_ids = {i.name: i.permit.facility_id for i in itineraries}
+
+            def report_match(
+                plan: ItineraryPlan,
+                found: tuple[bool, DivisionMatch],
+                seconds: float,
+            ) -> None:
+                is_reversed, match = found
+                if records is not None:
+                    records.write(
+                        match_record(
+                            match,
+                            type="itinerary_match",
+                            itinerary=plan.label,
+                            permit_id=permit_ids[plan.label],
+                            reversed=is_reversed,
+                            found_after=round(seconds, 3),
+                        )
+                    )
+                    return
+                desc = is_reversed and " (reversed)" or ""
+                echo(
+                    f'Itinerary "{plan.label}"{desc}: found after {seconds:.2f}s',
+                    override=True,
+                    bold=True,
+                    fg="green",
+                )
+                print_availability_matches([match])
+
+            stats = burst_search(
+                rdg,
+                plans,
+                burst_seconds,
+                burst_interval,
+                burst_workers,
+                release_at,
+                limit,
+                report_match,
+                records,
+            )
+            if not stats.found:
+                echo("No possible date matches found. :(", fg="red", bold=True)
+            return
+
+        for itinerary in itineraries:
+            relevant_lottery = lotteries_by_permit[itinerary.permit_id]
+            find_matches = matcher_for(itinerary)
+
+            snapshot = AvailabilitySnapshot() if only_new else None
+            # which matches are new is only known once every date has been fetched
+            # (and saved to the snapshot), so with --only-new the limit comes after
+            fetch_limit = snapshot is None and limit or None
+
+            def ranked_matches(divisions: list) -> Iterator[DivisionMatch]:
+                matches = iter_itinerary_matches(
+                    rdg,
+                    divisions,
+                    start,
+                    end,
+                    relevant_lottery,
+                    find_matches,
+                    match_cache,
+                    snapshot,
+                    history,
+                )
+                return rank_matches(matches, score, best_score, fetch_limit)
+
+            directions = [(False, itinerary.divisions)]
+            if reversable:
+                directions.append((True, itinerary.divisions[::-1]))
+            record_fields = {
+                "type": "itinerary_match",
+                "itinerary": itinerary.name,
+                "permit_id": itinerary.permit.facility_id,
+            }
+            if records is not None and snapshot is None:
+                # nothing to hold back, so write each match as it's found
+                for is_reversed, divisions in directions:
+                    write_matches(
+                        records,
+                        ranked_matches(divisions),
+                        **record_fields,
+                        reversed=is_reversed,
+                    )
+                continue
+
+            avail_matches = list(ranked_matches(itinerary.divisions))
+            avail_matches_reversed = []
+            if reversable:
+                avail_matches_reversed = list(ranked_matches(itinerary.divisions[::-1]))
+            if snapshot is not None:
+                key = snapshot_key("cli", "itinerary", itinerary.name, start, end)
+                delta = SnapshotStore().update(key, snapshot)
+                new_matches = [m for m in avail_matches if delta.is_new_match(m)]
+                avail_matches = new_matches[:limit]
+                new_matches = [
+                    m for m in avail_matches_reversed if delta.is_new_match(m)
+                ]
+                avail_matches_reversed = new_matches[:limit]
+            if records is not None:
+                for is_reversed, matches in (
+                    (False, avail_matches),
+                    (True, avail_matches_reversed),
+                ):
+                    write_matches(
+                        records, matches, **record_fields, reversed=is_reversed
+                    )
+                continue
+            with span("render"):
+                print_itinerary_matches(
+                    itinerary,
+                    avail_matches,
+                    avail_matches_reversed,
+                    reversable,
+                    pretty_cal,
+                )
+        if match_cache is not None:
+            match_cache.save(MATCH_CACHE_PATH)
+        if history is not None:
+            history.flush(session)
+
+
+def write_matches(
+    records: RecordWriter, matches: Iterable[DivisionMatch], **fields
+) -> None:
+    for match in matches:
+        with span("render"):
+            records.write(match_record(match, **fields))
+
+
+def choose_lottery(
+    ctx, permit: Facility, lottery_ids: tuple[str, ...] = ()
+) -> Optional[Lottery]:
+    """Pick the lottery relevant to a permit, by provided ID or by asking."""
+    import questionary as qu
+
+    lotteries = permit.lotteries
+    if len(lotteries) == 0:
+        return None
+    elif len(lotteries) == 1:
+        return lotteries[0]
+
+    if lottery_ids:
+        wanted = {lottery_id.lower() for lottery_id in lottery_ids}
+        for l in lotteries:
+            if str(l.lottery_id).lower() in wanted:
+                return l
+        raise ValueError(
+            f"Could not find lottery with id: {', '.join(lottery_ids)} for {permit.name}"
+        )
+
+    choices: list[qu.Choice] = []
+    question = f'Select a lottery for "{permit.name}":'
+    for l in lotteries:
+        title = f"{l.name}"
+        choices.append(qu.Choice(title, value=l))
+    relevant_lottery = qu.select(question, choices=choices).ask()
+    if relevant_lottery is None:
+        ctx.abort()
+    return relevant_lottery
+
+
+def print_itinerary_matches(
+    itinerary: Itinerary,
+    avail_matches: list[list[tuple["DivisionAvailability", datetime.date]]],
+    avail_matches_reversed: list[list[tuple["DivisionAvailability", datetime.date]]],
+    reversable: bool = False,
+    pretty_cal: bool = False,
+) -> None:
+    found = bool(avail_matches or avail_matches_reversed)
+    # in daemon mode the header is only useful (and only shown) alongside results
+    echo(
+        f'Itinerary "{itinerary.name}": {len(itinerary.divisions)} nights',
+        override=found,
+        bold=True,
+        underline=True,
+    )
+    if not found:
+        echo("No possible date matches found for itinerary. :(", fg="red", bold=True)
+    else:
+        echo(
+            f"{len(avail_matches)} date matches found:",
+            override=True,
+            bold=True,
+            underline=True,
+            fg="green",
+        )
+        print_availability_matches(avail_matches, pretty_cal)
+        if reversable:
+            echo(
+                f"{len(avail_matches_reversed)} reversed-itinerary date matches found:",
+                override=True,
+                bold=True,
+                underline=True,
+                fg="green",
+            )
+            print_availability_matches(avail_matches_reversed, pretty_cal)
+    echo()
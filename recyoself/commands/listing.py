@@ -0,0 +1,269 @@
+from typing import Any, Optional
+
+import click
+from rich_click import RichCommand
+from sqlalchemy.orm import joinedload
+from sqlmodel import col, or_, select
+
+from .. import geo, search_index
+from ..db import ReadSession, ensure_location_index, ensure_search_index
+from ..models import (
+    Campsite,
+    Division,
+    Facility,
+    FacilityType,
+    Itinerary,
+    Lottery,
+    LotteryStatus,
+    LotteryType,
+)
+from .common import echo, parse_coordinates
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "-f",
+    "--facility-id",
+    type=str,
+    help="filter lotteries by rec.gov Facility ID",
+    default=None,
+)
+@click.option(
+    "-t",
+    "--type",
+    "ltypes",
+    multiple=True,
+    type=click.Choice([t.name for t in LotteryType], case_sensitive=False),
+)
+@click.option(
+    "-s",
+    "--status",
+    "statuses",
+    multiple=True,
+    type=click.Choice([s.name for s in LotteryStatus], case_sensitive=False),
+)
+@click.option(
+    "--order",
+    "order_by",
+    type=click.Choice(["open"], case_sensitive=False),
+    default="open",
+)
+@click.argument("search_substring", type=str, default="")
+def list_lotteries(
+    facility_id: str | None,
+    ltypes: tuple[str],
+    statuses: tuple[str],
+    order_by: str | None,
+    search_substring: str,
+) -> None:
+    """List all Lotteries saved in the database.
+
+    Optionally provide SEARCH_SUBSTRING to filter based on a full-text search of the
+    lottery's name, description and summary.
+    """
+    full_text = search_index.has_words(search_substring) and ensure_search_index()
+    with ReadSession.begin() as session:
+        facility = None
+        if facility_id:
+            facility_stmt = select(Facility).where(Facility.facility_id == facility_id)
+            facility = session.scalars(facility_stmt).first()
+            if not facility:
+                raise ValueError(f"Could not find Facility with ID {facility_id}")
+
+        stmt = select(Lottery).options(joinedload(Lottery.facility))  # type: ignore
+        if facility:
+            stmt = stmt.where(Lottery.facility == facility)
+        if ltypes:
+            stmt = stmt.where(or_(Lottery.type == LotteryType[t] for t in ltypes))  # type: ignore
+        if statuses:
+            stmt = stmt.where(or_(Lottery.status == LotteryStatus[s] for s in statuses))  # type: ignore
+        if full_text:
+            stmt = search_index.apply(stmt, Lottery, "lottery", search_substring)
+        elif search_substring:
+            stmt = stmt.where(
+                (col(Lottery.name).icontains(search_substring))
+                | (col(Lottery.desc).icontains(search_substring))
+            )
+        # after the search's ranking, when there is one
+        if order_by == "open":
+            stmt = stmt.order_by(col(Lottery.open_at).asc())
+        lotteries = session.scalars(stmt).all()
+        for l in lotteries:
+            open_at = f"{l.open_at.date():%-m/%-d/%y}"
+            close_at = f"{l.close_at.date():%-m/%-d/%y}"
+            access_start = f"{l.access_start_at.date():%-m/%-d/%y}"
+            access_end = f"{l.access_end_at.date():%-m/%-d/%y}"
+            echo(f"{l.name}: {l.desc}", bold=True, underline=True)
+            echo(f"Type: {l.type.name.title()}")
+            echo(f"UUID: {l.lottery_id}")
+            echo(f"Facility: {l.facility.name} ({l.facility.facility_id})")
+            echo(f"Status: {l.status.name.title()}")
+            echo(f"Open From: {open_at} => {close_at}")
+            echo(f"Winners Access From: {access_start} => {access_end}")
+            echo()
+
+
+@click.command(cls=RichCommand)
+@click.argument("facility_id")
+@click.pass_context
+def list_campsites(ctx, facility_id: str) -> None:
+    """List all campsites associated with a given RIDB Facility ID"""
+    with ReadSession.begin() as session:
+        facility_stmt = select(Facility).where(Facility.facility_id == facility_id)
+        facility = session.scalars(facility_stmt).first()
+        if not facility:
+            raise ValueError(f"Could not find Facility with ID {facility_id}")
+
+        cs_stmt = (
+            select(Campsite)
+            .where(Campsite.facility == facility)
+            .order_by(Campsite.loop)
+        )
+        cs_results = session.scalars(cs_stmt)
+        echo(
+            f"Campsites at {facility.name} ({facility.facility_id}):",
+            bold=True,
+            underline=True,
+        )
+        for c in cs_results.all():
+            group = c.group_site and "Group " or ""
+            electric = c.electric and "Electric" or "Non-Electric"
+            echo(
+                f"{c.campsite_id}: {c.name} ({c.loop}), {c.combined_type}, {c.use.pretty_name}"
+            )
+
+
+@click.command(cls=RichCommand)
+def list_itineraries() -> None:
+    """List all Itineraries, with related permit name and all stops."""
+    with ReadSession.begin() as session:
+        stmt = select(Itinerary).options(
+            joinedload(Itinerary.permit), Itinerary.with_divisions()  # type: ignore
+        )
+        itineraries = session.scalars(stmt).all()
+        for i in itineraries:
+            echo(f"{i.name} ({i.permit.name})", bold=True, underline=True)
+            echo(f"{i.ordered_divisions_str}")
+            echo()
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "-t",
+    "--type",
+    "ftypes",
+    multiple=True,
+    type=click.Choice([f.name for f in FacilityType], case_sensitive=False),
+)
+@click.option(
+    "--near",
+    type=str,
+    callback=parse_coordinates,
+    default=None,
+    help="Only list facilities near LAT,LON (closest first).",
+)
+@click.option(
+    "--radius",
+    type=click.FloatRange(min=0),
+    default=50,
+    show_default=True,
+    help="How many miles from --near to look.",
+)
+@click.argument("search_substring", type=str, default="")
+def list_facilities(
+    ftypes: tuple[str],
+    near: Optional[tuple[float, float]],
+    radius: float,
+    search_substring: str,
+) -> None:
+    """List all Facilities and relevant information, listed alphabetically by type and name.
+
+    Optionally provide "--type" one or more times to filter by FacilityType(s).
+
+    Optionally provide SEARCH_SUBSTRING to filter based on a full-text search of the
+    facility's name and its rec area/org names. Every word must match (the start of a
+    word is enough), and the best matches are listed first.
+
+    Optionally provide "--near LAT,LON" to only list facilities within "--radius" miles
+    of there, closest first.
+    """
+    full_text = search_index.has_words(search_substring) and ensure_search_index()
+    rtree = near is not None and ensure_location_index()
+    with ReadSession.begin() as session:
+        stmt = select(Facility).options(
+            joinedload(Facility.rec_area), joinedload(Facility.org)  # type: ignore
+        )
+        if ftypes:
+            stmt = stmt.where(or_(Facility.type == FacilityType[t] for t in ftypes))  # type: ignore
+        if full_text:
+            stmt = search_index.apply(stmt, Facility, "facility", search_substring)
+        elif search_substring:
+            stmt = stmt.where(col(Facility.name).icontains(search_substring))
+        if near is not None:
+            stmt = geo.within_box(stmt, geo.bounding_box(*near, radius), rtree)
+        stmt = stmt.order_by(Facility.type, Facility.name)
+        permits = session.scalars(stmt).all()
+        distances: list[tuple[Facility, Optional[float]]] = [(p, None) for p in permits]
+        if near is not None:
+            distances = geo.nearest(permits, *near, radius)  # type: ignore
+        for p, distance in distances:
+            echo(
+                f"{p.type.pretty_name}: {p.name} ({p.facility_id})",
+                bold=True,
+                underline=True,
+            )
+            if distance is not None:
+                echo(f"Distance: {distance:.1f} mi")
+            if p.rec_area:
+                echo(f"Rec Area: {p.rec_area.name} ({p.rec_area.org_rec_area_id})")
+            echo(f"Org: {p.org.name} ({p.org.abbr})")
+            echo()
+
+
+@click.command("search", cls=RichCommand)
+@click.option(
+    "-t",
+    "--type",
+    "entities",
+    multiple=True,
+    type=click.Choice(list(search_index.ENTITY_CODES), case_sensitive=False),
+    help="Only search these kinds of entity (facility, lottery or division).",
+)
+@click.option("--limit", "-k", type=int, default=20, help="Number of results.")
+@click.argument("query")
+def search_entities(entities: tuple[str], limit: int, query: str) -> None:
+    """Full-text search of facilities, lotteries and divisions, best matches first.
+
+    Every word of QUERY must match the name (or rec area/org, description or
+    district) of a result; the start of a word is enough, e.g. "glac nat".
+    """
+    if not ensure_search_index():
+        raise click.ClickException("Searching needs SQLite built with FTS5.")
+    if search_index.match_query(query) is None:
+        raise click.UsageError("QUERY needs at least one word.")
+    models = {"facility": Facility, "lottery": Lottery, "division": Division}
+    results: list[tuple[float, str, Any]] = []
+    with ReadSession.begin() as session:
+        for entity in entities or models:
+            model = models[entity]
+            matches = search_index.ranked(entity, query)
+            stmt = (
+                select(model, matches.c.rank)
+                .join(matches, col(model.id) == matches.c.entity_id)
+                .order_by(matches.c.rank)
+                .limit(limit)
+            )
+            results.extend((rank, entity, row) for row, rank in session.execute(stmt))
+
+        results.sort(key=lambda r: r[0])
+        if not results:
+            echo("Nothing found.", fg="red", bold=True)
+        for _, entity, row in results[:limit]:
+            if entity == "facility":
+                echo(
+                    f"Facility: {row.name} ({row.type.pretty_name}, {row.facility_id})"
+                )
+            elif entity == "lottery":
+                echo(f"Lottery: {row.name} ({row.lottery_id})")
+            else:
+                echo(f"Division: {row.name} ({row.division_id}) in {row.permit.name}")
@@ -0,0 +1,64 @@
+import click
+from rich_click import RichCommand
+
+from ..scheduling import RequestBudget
+from ..server import AvailabilityServer
+from ..watch import FETCH_TTL
+from .common import echo
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "--host",
+    type=str,
+    default="127.0.0.1",
+    show_default=True,
+    help="Address to listen on.",
+)
+@click.option(
+    "--port",
+    type=click.IntRange(min=1, max=65535),
+    default=8750,
+    show_default=True,
+    help="Port to listen on.",
+)
+@click.option(
+    "--ttl",
+    type=click.FloatRange(min=0),
+    default=FETCH_TTL,
+    show_default=True,
+    help="Seconds Rec.gov responses are shared between queries before fetching again.",
+)
+@click.option(
+    "--budget",
+    type=click.FloatRange(min=0),
+    default=60,
+    show_default=True,
+    help="Most requests per minute to Rec.gov across all clients (0 for no limit).",
+)
+def serve(host: str, port: int, ttl: float, budget: float) -> None:
+    """Answer facility, itinerary and campground queries over HTTP with JSON.
+
+    Every client shares the loaded itineraries/campgrounds and Rec.gov responses, so
+    many clients running the same queries cost about one request per resource per
+    "--ttl" seconds. Endpoints (GET):
+
+    /facilities?q=&type=&near=LAT,LON&radius=&limit=
+
+    /itineraries/NAME/matches?start=&end=&reversable=&lottery=&limit=
+
+    /campgrounds/FACILITY_ID/blocks?start=&end=&num_days=&include_nyr=&limit=
+
+    /metrics
+    """
+    queries = AvailabilityServer(
+        ttl=ttl, budget=budget and RequestBudget(budget) or None
+    )
+    server = queries.serve(port, host)
+    echo(f"Serving on http://{host}:{port}", bold=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
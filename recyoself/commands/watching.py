@@ -0,0 +1,200 @@
+import datetime
+from typing import Optional
+
+import click
+from rich_click import RichCommand
+
+from ..metrics import REGISTRY
+from ..scheduling import RequestBudget
+from ..snapshots import SnapshotStore
+from ..watch import Watcher, load_watches
+from .common import echo, parse_moment
+
+# the options `watch` and `prefetch` share, passed on to `make_watcher`
+WATCHER_OPTIONS = [
+    click.option(
+        "--workers",
+        type=click.IntRange(min=1),
+        default=4,
+        show_default=True,
+        help="Number of checks that can run at the same time.",
+    ),
+    click.option(
+        "--alert-cmd",
+        type=str,
+        default=None,
+        help="Shell command to run with results on stdin whenever a check finds any.",
+    ),
+    click.option(
+        "--report-all",
+        type=bool,
+        is_flag=True,
+        help="Report every match on every check, not just newly opened ones.",
+    ),
+    click.option(
+        "--budget",
+        type=click.FloatRange(min=0),
+        default=60,
+        show_default=True,
+        help="Most requests per minute to Rec.gov across all watches (0 for no limit).",
+    ),
+    click.option(
+        "--record-history",
+        type=bool,
+        is_flag=True,
+        help="Append the fetched availability to the history table.",
+    ),
+]
+
+
+def watcher_options(func):
+    for option in reversed(WATCHER_OPTIONS):
+        func = option(func)
+    return func
+
+
+def make_watcher(
+    ctx,
+    watch_file: str,
+    workers: int,
+    alert_cmd: Optional[str],
+    report_all: bool,
+    budget: float,
+    record_history: bool,
+    releases: tuple[datetime.datetime, ...] = (),
+) -> Watcher:
+    """A Watcher for WATCH_FILE with everything its checks need already loaded."""
+    try:
+        watches = load_watches(watch_file)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="WATCH_FILE")
+    for watch in watches:
+        watch.releases.extend(releases)
+    watcher = Watcher(
+        watches,
+        workers=workers,
+        alert_cmd=alert_cmd,
+        output=lambda text: echo(f"{text}\n", override=True),
+        snapshots=None if report_all else SnapshotStore(),
+        budget=budget and RequestBudget(budget) or None,
+        record_history=record_history,
+        metrics_file=ctx.obj.get("metrics_file"),
+    )
+    watcher.load()
+    return watcher
+
+
+@click.command(cls=RichCommand)
+@watcher_options
+@click.option(
+    "--once",
+    type=bool,
+    is_flag=True,
+    help="Check every watch once and exit.",
+)
+@click.option(
+    "--metrics-port",
+    type=click.IntRange(min=1, max=65535),
+    default=None,
+    help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while watching.",
+)
+@click.argument("watch_file", type=click.Path(exists=True, dir_okay=False))
+@click.pass_context
+def watch(
+    ctx,
+    workers: int,
+    alert_cmd: Optional[str],
+    report_all: bool,
+    budget: float,
+    record_history: bool,
+    once: bool,
+    metrics_port: Optional[int],
+    watch_file: str,
+) -> None:
+    """Keep running and check every watch in WATCH_FILE on its own interval.
+
+    WATCH_FILE is a TOML file of [[itinerary]] and [[campground]] entries.
+    """
+    watcher = make_watcher(
+        ctx, watch_file, workers, alert_cmd, report_all, budget, record_history
+    )
+    if metrics_port:
+        REGISTRY.serve(metrics_port)
+    echo(f"Watching {len(watcher.watches)} itineraries/campgrounds...", bold=True)
+    try:
+        watcher.run(once=once)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+@click.command(cls=RichCommand)
+@click.option(
+    "--at",
+    "release_at",
+    type=str,
+    callback=parse_moment,
+    required=True,
+    metavar="<YYYY-MM-DDTHH:MM>",
+    help="When availability is released (local time, unless an offset is given).",
+)
+@click.option(
+    "--lead",
+    type=click.FloatRange(min=0),
+    default=60,
+    show_default=True,
+    help="Seconds before the release to open connections to Rec.gov.",
+)
+@click.option(
+    "--keep-watching",
+    type=bool,
+    is_flag=True,
+    help="Keep watching after the release instead of checking every watch once.",
+)
+@watcher_options
+@click.argument("watch_file", type=click.Path(exists=True, dir_okay=False))
+@click.pass_context
+def prefetch(
+    ctx,
+    release_at: datetime.datetime,
+    lead: float,
+    keep_watching: bool,
+    workers: int,
+    alert_cmd: Optional[str],
+    report_all: bool,
+    budget: float,
+    record_history: bool,
+    watch_file: str,
+) -> None:
+    """Get ready ahead of a release, then check every watch in WATCH_FILE right on it.
+
+    Itineraries, divisions, lotteries and campsites are loaded straight away. "--lead"
+    seconds before the release a connection to Rec.gov is opened per worker, and kept
+    alive until the release, so when it comes only the availability requests are
+    left to make. With "--keep-watching" the watches are then checked as in "watch",
+    polling at their "min_interval" for a while after the release.
+    """
+    watcher = make_watcher(
+        ctx,
+        watch_file,
+        workers,
+        alert_cmd,
+        report_all,
+        budget,
+        record_history,
+        releases=(release_at,),
+    )
+    echo(
+        f"Loaded {len(watcher.watches)} itineraries/campgrounds, checking at "
+        f"{release_at:%Y-%m-%d %H:%M:%S %Z}",
+        bold=True,
+    )
+    try:
+        watcher.hold_until(
+            release_at - datetime.timedelta(seconds=lead), keep_alive=False
+        )
+        connected = watcher.warm_up()
+        echo(f"Opened {connected} of {workers} connections to Rec.gov")
+        watcher.hold_until(release_at)
+        watcher.run(once=not keep_watching)
+    except KeyboardInterrupt:
+        watcher.stop()
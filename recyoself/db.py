@@ -1,20 +1,364 @@
-from typing import Optional
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, TypeVar
 
 from platformdirs import PlatformDirs
+from sqlalchemy import Engine, event, inspect
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session as OrmSession
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel, create_engine
 
 from recyoself import USER_DATA_DIR, models
 
+from . import geo, profiling, search_index
+from .metrics import DB_QUERY_SECONDS, DB_TRANSACTIONS
+
+T = TypeVar("T")
+
 DATABASE_URL = f"sqlite:///{USER_DATA_DIR}/database.db"
 echo = False
-engine = engine = create_engine(DATABASE_URL, echo=echo)
-Session = sessionmaker(engine)
+
+# bumped whenever `_upgrade` has something new to add to existing databases
+SCHEMA_VERSION = 1
+
+# how long a connection waits for another process' write lock before giving up
+BUSY_TIMEOUT: float = 30
+
+# applied to every connection: WAL lets readers carry on while one process writes
+# (e.g. a watcher recording history during `init`), and NORMAL sync is safe with WAL
+PRAGMAS: dict[str, str | int] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64 * 1024,  # KiB
+    "mmap_size": 256 * 2**20,
+    "temp_store": "MEMORY",
+    "busy_timeout": int(BUSY_TIMEOUT * 1000),
+}
+# swapped in by `bulk_load_session` while loading lots of rows at once
+BULK_LOAD_PRAGMAS: dict[str, str | int] = {
+    "synchronous": "OFF",
+    "cache_size": -512 * 1024,
+}
+
+_engines: dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+# whether this process has compared the database with SCHEMA_VERSION yet
+_schema_checked = False
+_schema_lock = threading.RLock()
+
+
+def get_engine() -> Engine:
+    """The engine every write goes through, created (with its listeners) on first
+    use so that commands which never touch the database don't pay for it."""
+    return _get_engine("write")
+
+
+def get_read_engine() -> Engine:
+    """The engine for commands that only query: SQLite refuses any write made
+    through it."""
+    return _get_engine("read")
+
+
+def _get_engine(kind: str) -> Engine:
+    with _engines_lock:
+        if kind not in _engines:
+            engine = create_engine(
+                DATABASE_URL, echo=echo, connect_args={"timeout": BUSY_TIMEOUT}
+            )
+            configure = (
+                _configure_connection if kind == "write" else _configure_read_connection
+            )
+            event.listen(engine, "connect", configure)
+            event.listen(engine, "connect", _upgrade_on_first_connect)
+            event.listen(engine, "before_cursor_execute", _start_query_timer)
+            event.listen(engine, "before_cursor_execute", _count_query)
+            event.listen(engine, "after_cursor_execute", _observe_query_time)
+            event.listen(engine, "handle_error", _drop_query_timer)
+            _engines[kind] = engine
+        return _engines[kind]
+
+
+def __getattr__(name: str):
+    # `engine` and `read_engine` as module attributes, without creating them at import
+    if name == "engine":
+        return get_engine()
+    if name == "read_engine":
+        return get_read_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _LazySessionmaker(sessionmaker):
+    """A sessionmaker bound to its engine the first time a session is made."""
+
+    def __init__(self, get_bind: Callable[[], Engine]) -> None:
+        super().__init__()
+        self._get_bind = get_bind
+
+    def __call__(self, **local_kw) -> OrmSession:
+        if self.kw.get("bind") is None:
+            self.configure(bind=self._get_bind())
+        return super().__call__(**local_kw)
+
+
+Session = _LazySessionmaker(get_engine)
+ReadSession = _LazySessionmaker(get_read_engine)
+
+
+def _set_pragmas(dbapi_connection, pragmas: dict[str, str | int]) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def _configure_connection(dbapi_connection, connection_record):
+    _set_pragmas(dbapi_connection, PRAGMAS)
+
+
+def _configure_read_connection(dbapi_connection, connection_record):
+    # journal_mode is stored in the database file, so the writer's WAL setting holds
+    _set_pragmas(
+        dbapi_connection,
+        {**{k: v for k, v in PRAGMAS.items() if k != "journal_mode"}, "query_only": 1},
+    )
+
+
+@contextmanager
+def bulk_load_session() -> Iterator[OrmSession]:
+    """A session in one transaction, on a connection tuned for loading many rows.
+
+    Durability is traded for speed until the transaction commits: a crash mid-load
+    can lose the load, but not corrupt the database. The connection's usual settings
+    are restored before it goes back to the pool.
+    """
+    with get_engine().connect() as connection:
+        _set_pragmas(connection.connection.dbapi_connection, BULK_LOAD_PRAGMAS)
+        try:
+            with OrmSession(bind=connection) as session, session.begin():
+                yield session
+        finally:
+            connection.rollback()
+            _set_pragmas(
+                connection.connection.dbapi_connection,
+                {k: PRAGMAS[k] for k in BULK_LOAD_PRAGMAS},
+            )
+
+
+def is_locked_error(error: OperationalError) -> bool:
+    message = str(error.orig).lower()
+    return "locked" in message or "busy" in message
+
+
+def retry_if_locked(func: Callable[[], T], attempts: int = 5, delay: float = 0.5) -> T:
+    """Call `func` (a whole unit of work), retrying with backoff while the database
+    stays locked past the busy timeout."""
+    for attempt in range(attempts):
+        try:
+            return func()
+        except OperationalError as e:
+            if not is_locked_error(e) or attempt == attempts - 1:
+                raise
+            time.sleep(delay * 2**attempt)
+    raise AssertionError("unreachable")
+
+
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _observe_query_time(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    words = statement.split(None, 1)
+    kind = words and words[0].lower() or "other"
+    if kind not in ("select", "insert", "update", "delete"):
+        kind = "other"
+    DB_QUERY_SECONDS.observe(elapsed, statement=kind)
+    profiling.record("db", elapsed)
+
+
+class QueryCounter:
+    """The statements run while a `count_queries` block is active."""
+
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __repr__(self) -> str:
+        return f"QueryCounter({self.count})"
+
+
+_counters: list[QueryCounter] = []
+_counters_lock = threading.Lock()
+
+
+@contextmanager
+def count_queries(limit: Optional[int] = None) -> Iterator[QueryCounter]:
+    """Count the statements run on either engine inside the block.
+
+    With a `limit`, more statements than that raise an AssertionError listing them,
+    which is how the benchmarks keep lookups from regressing into one query per row.
+    """
+    counter = QueryCounter()
+    with _counters_lock:
+        _counters.append(counter)
+    try:
+        yield counter
+    finally:
+        with _counters_lock:
+            _counters.remove(counter)
+    if limit is not None and counter.count > limit:
+        raise AssertionError(
+            f"{counter.count} queries run, expected at most {limit}:\n"
+            + "\n".join(counter.statements)
+        )
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if _counters:
+        with _counters_lock:
+            for counter in _counters:
+                counter.statements.append(statement)
+
+
+def _drop_query_timer(context):
+    started = context.connection is not None and context.connection.info.get(
+        "query_started_at"
+    )
+    if started:
+        started.pop()
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(ReadSession, "after_commit")
+def _count_commit(session):
+    DB_TRANSACTIONS.inc(outcome="commit")
+
+
+@event.listens_for(Session, "after_rollback")
+@event.listens_for(ReadSession, "after_rollback")
+def _count_rollback(session):
+    DB_TRANSACTIONS.inc(outcome="rollback")
 
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    SQLModel.metadata.create_all(get_engine())
+    _upgrade()
+
+
+def _upgrade_on_first_connect(dbapi_connection, connection_record):
+    """Bring a database made by an older version up to date the first time this
+    process connects to it: missing columns, indexes and search indexes are added.
+    Once it's current this is one PRAGMA."""
+    global _schema_checked
+    # reentrant, `_upgrade` connects again from the same thread
+    with _schema_lock:
+        if _schema_checked:
+            return
+        _schema_checked = True
+        cursor = dbapi_connection.cursor()
+        try:
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            # an uninitialized database is left to `init`, which creates everything
+            outdated = (
+                version < SCHEMA_VERSION
+                and cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' LIMIT 1"
+                ).fetchone()
+            )
+        finally:
+            cursor.close()
+        if not outdated:
+            return
+        try:
+            _upgrade()
+        except Exception:
+            _schema_checked = False
+            raise
+
+
+def _upgrade() -> None:
+    ensure_columns()
+    ensure_indexes()
+    ensure_search_index()
+    ensure_location_index()
+    with get_engine().begin() as connection:
+        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def ensure_columns() -> None:
+    """Add columns missing from existing tables (all added columns are nullable)."""
+    with get_engine().begin() as connection:
+        inspector = inspect(connection)
+        tables = set(inspector.get_table_names())
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.exec_driver_sql(
+                    f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'
+                )
+
+
+def ensure_indexes() -> None:
+    """Create any indexes missing from existing tables.
+
+    `create_all` skips tables that already exist, so databases made before an index
+    was added to a model would otherwise never get it.
+    """
+    with get_engine().begin() as connection:
+        inspector = inspect(connection)
+        tables = set(inspector.get_table_names())
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+
+
+def ensure_tables(*models: type[SQLModel]) -> None:
+    # tables added after a database was initialized are created on first use
+    SQLModel.metadata.create_all(
+        get_engine(), tables=[m.__table__ for m in models]  # type: ignore
+    )
+
+
+def ensure_search_index() -> bool:
+    """Create the full-text search index if it's missing, returning whether searches
+    can use it."""
+    with get_engine().begin() as connection:
+        return search_index.create(connection)
+
+
+def ensure_location_index() -> bool:
+    """Create the R*Tree of facility locations if it's missing, returning whether
+    nearby searches can use it."""
+    with get_engine().begin() as connection:
+        return geo.create(connection)
+
+
+def optimize_search_index() -> None:
+    with get_engine().begin() as connection:
+        if search_index.exists(connection):
+            search_index.optimize(connection)
 
 
 def drop_db():
-    SQLModel.metadata.drop_all(engine)
+    global _schema_checked
+    # no point upgrading what's about to be dropped
+    _schema_checked = True
+    with get_engine().begin() as connection:
+        search_index.drop(connection)
+        geo.drop(connection)
+    SQLModel.metadata.drop_all(get_engine())
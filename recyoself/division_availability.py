@@ -1,6 +1,9 @@
 import datetime
+import hashlib
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
+
+from .utils.dates import parse_iso_date
 
 if TYPE_CHECKING:
     from .models import Division
@@ -11,22 +14,44 @@ class DivisionAvailability:
 
     division: "Division"
     _availabilities: list["AvailabilityInfo"] = field(default_factory=list, repr=False)
+    _by_date: dict[datetime.date, "AvailabilityInfo"] = field(
+        default_factory=dict, repr=False
+    )
 
     @property
     def availabilities(self) -> list["AvailabilityInfo"]:
         return sorted(self._availabilities)
 
     def set_availability(
-        self, date: str, total_slots: int, available_slots: int, has_walkup: bool
+        self,
+        date: datetime.date | str,
+        total_slots: int,
+        available_slots: int,
+        has_walkup: bool,
     ) -> None:
-        self._availabilities.append(
-            AvailabilityInfo(
-                date=date,
-                total_slots=total_slots,
-                available_slots=available_slots,
-                has_walkup=has_walkup,
-            )
+        info = AvailabilityInfo(
+            date=date,
+            total_slots=total_slots,
+            available_slots=available_slots,
+            has_walkup=has_walkup,
+        )
+        self._availabilities.append(info)
+        self._by_date[info.date] = info  # type: ignore
+
+    def availability_on(self, date: datetime.date) -> Optional["AvailabilityInfo"]:
+        return self._by_date.get(date)
+
+    def available_slots_on(self, date: datetime.date) -> int:
+        info = self._by_date.get(date)
+        return info and info.available_slots or 0
+
+    def digest(self) -> str:
+        """Fingerprint of the normalized availability, for reusing match results."""
+        normalized = ";".join(
+            f"{ai.date:%Y%m%d}:{ai.total_slots}:{ai.available_slots}:{ai.has_walkup:d}"
+            for ai in self.availabilities
         )
+        return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
 
     def available_dates(self, slots: int = 1) -> list[datetime.date]:
         return [
@@ -36,7 +61,7 @@ class DivisionAvailability:
         ]
 
 
-@dataclass(order=True)
+@dataclass(order=True, slots=True)
 class AvailabilityInfo:
 
     date: datetime.date | str = field(compare=True)
@@ -46,7 +71,7 @@ class AvailabilityInfo:
 
     def __post_init__(self) -> None:
         if self.date and not isinstance(self.date, datetime.date):
-            self.date = datetime.datetime.strptime(self.date, "%Y-%m-%d").date()
+            self.date = parse_iso_date(self.date)
 
     def __repr__(self) -> str:
         return f"AvailabilityInfo({self.date:%b %d, %Y}: {self.available_slots}/{self.total_slots})"
@@ -0,0 +1,191 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from prompt_toolkit.completion import Completer
+
+    from .models import Division
+
+# how much of a name's trigrams a misspelling must share to be suggested (Jaccard)
+FUZZY_THRESHOLD = 0.25
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase words without accents or punctuation, e.g. "Lake Ľuna's" => "lake
+    luna s"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", stripped.casefold()).strip()
+
+
+def trigrams(text: str) -> set[str]:
+    """Trigrams of each word padded like pg_trgm's, so starts of words weigh more."""
+    grams: set[str] = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class PrefixTrie:
+    """Maps every prefix of the words inserted to the items they were inserted for."""
+
+    def __init__(self) -> None:
+        self._children: dict[str, "PrefixTrie"] = {}
+        self._items: set[int] = set()
+
+    def insert(self, word: str, item: int) -> None:
+        node = self
+        for char in word:
+            node = node._children.setdefault(char, PrefixTrie())
+            node._items.add(item)
+
+    def find(self, prefix: str) -> set[int]:
+        node = self
+        for char in prefix:
+            child = node._children.get(char)
+            if child is None:
+                return set()
+            node = child
+        return node._items
+
+
+class DivisionIndex:
+    """Ranked lookup of division names by what someone typed, built once per permit.
+
+    Matches come in tiers: the name itself (ignoring case, accents and punctuation),
+    names with a word starting with each typed word, names containing what was
+    typed (found by trigrams, or a scan for one or two characters), then (as
+    `suggestions`) misspellings sharing enough trigrams. Within a tier names starting
+    with the input, then shorter ones, come first.
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, str]]) -> None:
+        # (name, description shown when completing)
+        self.entries = tuple(entries)
+        self.names = [name for name, _ in self.entries]
+        self.meta = dict(self.entries)
+        self._normalized = [normalize(name) for name in self.names]
+        self._by_normalized: dict[str, int] = {}
+        self._words = PrefixTrie()
+        self._starts = PrefixTrie()
+        # trigrams of the whole normalized name, for finding substrings
+        self._substrings: dict[str, set[int]] = {}
+        # padded per-word trigrams, for scoring misspellings
+        self._trigrams: dict[str, set[int]] = {}
+        self._trigram_counts: list[int] = []
+        # each name's place when ordered shortest first, for ranking within a tier
+        order = sorted(range(len(self.names)), key=lambda i: self._normalized[i])
+        order.sort(key=lambda i: len(self._normalized[i]))
+        self._order = [0] * len(order)
+        for position, i in enumerate(order):
+            self._order[i] = position
+        for i, name in enumerate(self._normalized):
+            self._by_normalized.setdefault(name, i)
+            self._starts.insert(name, i)
+            for word in name.split():
+                self._words.insert(word, i)
+            for j in range(len(name) - 2):
+                self._substrings.setdefault(name[j : j + 3], set()).add(i)
+            grams = trigrams(name)
+            for gram in grams:
+                self._trigrams.setdefault(gram, set()).add(i)
+            self._trigram_counts.append(len(grams))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def lookup(self, query: str, limit: Optional[int] = None) -> list[str]:
+        """Names matching `query` (exactly, by word prefixes or as a substring), best
+        first."""
+        q = normalize(query)
+        if not q:
+            return []
+        tiers: list[list[int]] = [[], [], []]
+        exact = self._by_normalized.get(q)
+        if exact is not None:
+            tiers[0].append(exact)
+        by_words = set.intersection(*(self._words.find(w) for w in q.split()))
+        tiers[1].extend(by_words - {exact})
+        if len(q) >= 3:
+            grams = {q[j : j + 3] for j in range(len(q) - 2)}
+            candidates = set.intersection(
+                *(self._substrings.get(g, set()) for g in grams)
+            )
+        else:
+            # too short for a trigram, but names are few enough to just scan
+            candidates = set(range(len(self._normalized)))
+        tiers[2].extend(
+            i for i in candidates - by_words - {exact} if q in self._normalized[i]
+        )
+        starting = self._starts.find(q)
+        ranked = [self.names[i] for tier in tiers for i in self._ranked(tier, starting)]
+        return ranked[:limit]
+
+    def suggestions(self, query: str, limit: Optional[int] = 5) -> list[str]:
+        """Names sharing enough trigrams with `query` (e.g. misspelled), best first."""
+        grams = trigrams(normalize(query))
+        if not grams:
+            return []
+        shared: Counter[int] = Counter()
+        for gram in grams:
+            shared.update(self._trigrams.get(gram, ()))
+        scored = []
+        for i, count in shared.items():
+            similarity = count / (len(grams) + self._trigram_counts[i] - count)
+            if similarity >= FUZZY_THRESHOLD:
+                scored.append((-similarity, self._order[i], i))
+        return [self.names[i] for *_, i in sorted(scored)[:limit]]
+
+    def _ranked(self, tier: list[int], starting: set[int]) -> list[int]:
+        ordered = sorted(tier, key=self._order.__getitem__)
+        return [i for i in ordered if i in starting] + [
+            i for i in ordered if i not in starting
+        ]
+
+    def completer(self, commands: Optional[dict[str, str]] = None) -> "Completer":
+        """A prompt_toolkit completer offering `commands` (name => description), then
+        the ranked matches (or suggestions) for the text typed so far."""
+        from prompt_toolkit.completion import Completer, Completion
+        from prompt_toolkit.formatted_text import HTML
+
+        index = self
+        offered = commands or {}
+
+        class DivisionCompleter(Completer):
+            def get_completions(self, document, complete_event) -> Iterator[Completion]:
+                text = document.text_before_cursor
+                typed = text.strip().lower()
+                names = index.names
+                if typed:
+                    names = index.lookup(text) or index.suggestions(text)
+                for name, meta in offered.items():
+                    if name.startswith(typed):
+                        yield Completion(name, -len(text), display_meta=_meta(meta))
+                for name in names:
+                    yield Completion(
+                        name, -len(text), display_meta=_meta(index.meta[name])
+                    )
+
+        def _meta(meta: str) -> HTML:
+            # styled like questionary's own completions
+            return HTML("<text>{}</text>").format(meta)
+
+        return DivisionCompleter()
+
+
+_INDEXES: dict[str, DivisionIndex] = {}
+
+
+def division_index(permit_id: str, divisions: Iterable["Division"]) -> DivisionIndex:
+    """The index of a permit's divisions, shared by everything in this process that
+    looks them up (and built again if they've changed)."""
+    entries = tuple((d.name, f"{d.type}, {d.district}") for d in divisions)
+    index = _INDEXES.get(permit_id)
+    if index is None or index.entries != entries:
+        index = _INDEXES[permit_id] = DivisionIndex(entries)
+    return index
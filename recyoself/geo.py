@@ -0,0 +1,169 @@
+import math
+from typing import Iterable, Optional, TypeVar
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import Select
+
+from .models import Facility
+
+S = TypeVar("S", bound=Select)
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_MILES / 180
+
+TABLE = "facility_location"
+
+location_table = sa.Table(
+    TABLE,
+    sa.MetaData(),
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("min_lat", sa.Float),
+    sa.Column("max_lat", sa.Float),
+    sa.Column("min_lon", sa.Float),
+    sa.Column("max_lon", sa.Float),
+)
+
+# (min lat, max lat, ((min lon, max lon), ...)): two longitude ranges when the box
+# crosses the antimeridian
+BoundingBox = tuple[float, float, tuple[tuple[float, float], ...]]
+
+
+def parse_coordinate(value: Optional[str]) -> Optional[float]:
+    """A latitude/longitude from RIDB, where missing ones are blank (or 0)."""
+    try:
+        coordinate = float(value or 0)
+    except ValueError:
+        return None
+    return coordinate or None
+
+
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lon: float, radius: float) -> BoundingBox:
+    """A box holding every point within `radius` miles, to narrow down candidates
+    before measuring their exact distance."""
+    dlat = radius / MILES_PER_DEGREE_LAT
+    min_lat, max_lat = max(-90, lat - dlat), min(90, lat + dlat)
+    if min_lat == -90 or max_lat == 90:
+        # a pole is in range, so every longitude is
+        return min_lat, max_lat, ((-180, 180),)
+    # degrees of longitude shrink towards the poles, so widen for the worst latitude
+    widest = max(abs(min_lat), abs(max_lat))
+    dlon = radius / (MILES_PER_DEGREE_LAT * math.cos(math.radians(widest)))
+    if dlon >= 180:
+        return min_lat, max_lat, ((-180, 180),)
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180:
+        return min_lat, max_lat, ((min_lon + 360, 180), (-180, max_lon))
+    if max_lon > 180:
+        return min_lat, max_lat, ((min_lon, 180), (-180, max_lon - 360))
+    return min_lat, max_lat, ((min_lon, max_lon),)
+
+
+def exists(connection: Connection) -> bool:
+    return (
+        connection.execute(
+            sa.text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ),
+            {"name": TABLE},
+        ).first()
+        is not None
+    )
+
+
+def create(connection: Connection) -> bool:
+    """Create the R*Tree of facility locations (filled from what's already loaded)
+    and the triggers that keep it in sync, returning whether it's usable.
+
+    It is False when SQLite was built without R*Tree support, in which case nearby
+    facilities are found with the (latitude, longitude) index instead.
+    """
+    if exists(connection):
+        return True
+    try:
+        connection.execute(
+            sa.text(
+                f"CREATE VIRTUAL TABLE {TABLE} "
+                "USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+            )
+        )
+    except OperationalError as e:
+        if "rtree" in str(e.orig):
+            return False
+        raise
+
+    table = Facility.__tablename__
+    # a point is stored as a box with no area
+    insert = (
+        f"INSERT INTO {TABLE} "
+        "SELECT {row}.id, {row}.latitude, {row}.latitude, {row}.longitude, "
+        "{row}.longitude {source} "
+        "WHERE {row}.latitude IS NOT NULL AND {row}.longitude IS NOT NULL;"
+    )
+    delete = f"DELETE FROM {TABLE} WHERE id = old.id;"
+    connection.execute(sa.text(insert.format(row=table, source=f"FROM {table}")))
+    new_insert = insert.format(row="new", source="")
+    for sql in (
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_insert AFTER INSERT ON {table} "
+        f"BEGIN {new_insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_update AFTER UPDATE ON {table} "
+        f"BEGIN {delete} {new_insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_delete AFTER DELETE ON {table} "
+        f"BEGIN {delete} END",
+    ):
+        connection.execute(sa.text(sql))
+    return True
+
+
+def drop(connection: Connection) -> None:
+    for action in ("insert", "update", "delete"):
+        connection.execute(sa.text(f"DROP TRIGGER IF EXISTS {TABLE}_{action}"))
+    connection.execute(sa.text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+
+def within_box(stmt: S, box: BoundingBox, rtree: bool = True) -> S:
+    """Filter a select of facilities to those located inside `box`."""
+    min_lat, max_lat, lon_ranges = box
+    if rtree:
+        loc = location_table.c
+        lat_filter = sa.and_(loc.max_lat >= min_lat, loc.min_lat <= max_lat)
+        lon_filter = sa.or_(
+            *(sa.and_(loc.max_lon >= lo, loc.min_lon <= hi) for lo, hi in lon_ranges)
+        )
+        return stmt.join(location_table, loc.id == Facility.id).where(
+            lat_filter, lon_filter
+        )
+    return stmt.where(
+        Facility.latitude.between(min_lat, max_lat),  # type: ignore
+        sa.or_(
+            *(
+                Facility.longitude.between(lo, hi)  # type: ignore
+                for lo, hi in lon_ranges
+            )
+        ),
+    )
+
+
+def nearest(
+    facilities: Iterable[Facility], lat: float, lon: float, radius: float
+) -> list[tuple[Facility, float]]:
+    """The facilities within `radius` miles, with their distance, closest first."""
+    found = []
+    for facility in facilities:
+        if facility.latitude is None or facility.longitude is None:
+            continue
+        distance = haversine_miles(lat, lon, facility.latitude, facility.longitude)
+        if distance <= radius:
+            found.append((facility, distance))
+    found.sort(key=lambda fd: fd[1])
+    return found
@@ -0,0 +1,237 @@
+import datetime
+import threading
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, cast
+
+import sqlalchemy as sa
+from sqlalchemy.engine import CursorResult
+from sqlmodel import col, delete, insert, select, update
+
+from .models import AvailabilityHistory, HistoryEntityType
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+    from .campsite_availability import CampsiteAvailability
+    from .division_availability import DivisionAvailability
+
+# (entity type, entity id, night) => (status, is open, observed at)
+NightObservations = dict[
+    tuple[HistoryEntityType, str, datetime.date], tuple[int, bool, datetime.datetime]
+]
+
+# keeps IN (...) lists under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+
+def _chunks(items: list, size: int = CHUNK_SIZE) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _utcnow() -> datetime.datetime:
+    # stored naive, like the rest of the database's timestamps
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+class HistoryRecorder:
+    """Collects the availability that searches fetch and appends it to the history.
+
+    Observations are buffered in memory (searches call `observe_*` like they do for
+    snapshots) and written by `flush`, which only adds rows for nights whose status
+    changed since their latest run.
+    """
+
+    def __init__(self) -> None:
+        self._pending: NightObservations = {}
+        self._lock = threading.Lock()
+
+    def observe_divisions(self, availabilities: list["DivisionAvailability"]) -> None:
+        observed_at = _utcnow()
+        with self._lock:
+            for avail in availabilities:
+                entity_id = str(avail.division.division_id)
+                for ai in avail.availabilities:
+                    key = (HistoryEntityType.division, entity_id, ai.date)
+                    self._pending[key] = (ai.available_slots, ai.available, observed_at)  # type: ignore
+
+    def observe_campsite(
+        self, availability: "CampsiteAvailability", include_nyr: bool = False
+    ) -> None:
+        # the raw status is kept, so NYR nights aren't counted as open either way
+        observed_at = _utcnow()
+        entity_id = str(availability.campsite_id)
+        with self._lock:
+            for a in availability.availabilities:
+                key = (HistoryEntityType.campsite, entity_id, a.date)
+                self._pending[key] = (int(a.status), a.available, observed_at)
+
+    def flush(self, session: "Session") -> tuple[int, int]:
+        """Write what was observed, returning (runs added, runs extended)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0, 0
+        try:
+            return self._write(session, pending)
+        except Exception:
+            # keep them for the next attempt, behind anything observed since
+            with self._lock:
+                self._pending = {**pending, **self._pending}
+            raise
+
+    def _write(self, session: "Session", pending: NightObservations) -> tuple[int, int]:
+        latest = latest_runs(session, pending.keys())
+        new_rows = []
+        extended: dict[datetime.datetime, list[int]] = {}
+        for key, (status, is_open, observed_at) in pending.items():
+            run = latest.get(key)
+            if run is not None and run.status == status:
+                extended.setdefault(observed_at, []).append(run.id)  # type: ignore
+                continue
+            entity_type, entity_id, night = key
+            new_rows.append(
+                {
+                    "entity_type": entity_type,
+                    "entity_id": entity_id,
+                    "night": night,
+                    "status": status,
+                    "is_open": is_open,
+                    "first_seen_at": observed_at,
+                    "last_seen_at": observed_at,
+                    "created_at": observed_at,
+                    "updated_at": observed_at,
+                }
+            )
+
+        for observed_at, run_ids in extended.items():
+            for chunk in _chunks(run_ids):
+                session.execute(
+                    update(AvailabilityHistory)
+                    .where(col(AvailabilityHistory.id).in_(chunk))
+                    .values(last_seen_at=observed_at, updated_at=observed_at)
+                )
+        if new_rows:
+            session.execute(insert(AvailabilityHistory), new_rows)
+        return len(new_rows), sum(len(ids) for ids in extended.values())
+
+
+class _Run:
+    __slots__ = ("id", "status", "first_seen_at")
+
+    def __init__(self, id: int, status: int, first_seen_at: datetime.datetime):
+        self.id = id
+        self.status = status
+        self.first_seen_at = first_seen_at
+
+
+def latest_runs(
+    session: "Session",
+    keys: Iterable[tuple[HistoryEntityType, str, datetime.date]],
+) -> dict[tuple[HistoryEntityType, str, datetime.date], _Run]:
+    """The most recent run for each (entity type, entity id, night)."""
+    wanted = set(keys)
+    by_type: dict[HistoryEntityType, set[str]] = {}
+    for entity_type, entity_id, _ in wanted:
+        by_type.setdefault(entity_type, set()).add(entity_id)
+    first_night = min(night for _, _, night in wanted)
+    last_night = max(night for _, _, night in wanted)
+
+    H = AvailabilityHistory
+    latest: dict[tuple[HistoryEntityType, str, datetime.date], _Run] = {}
+    for entity_type, entity_ids in by_type.items():
+        for chunk in _chunks(sorted(entity_ids)):
+            # sqlmodel's select only has overloads for up to four columns
+            rows = session.execute(
+                sa.select(
+                    col(H.id),
+                    col(H.entity_id),
+                    col(H.night),
+                    col(H.status),
+                    col(H.first_seen_at),
+                ).where(
+                    col(H.entity_type) == entity_type,
+                    col(H.entity_id).in_(chunk),
+                    col(H.night).between(first_night, last_night),
+                )
+            )
+            for run_id, entity_id, night, status, first_seen_at in rows:
+                key = (entity_type, entity_id, night)
+                if key not in wanted:
+                    continue
+                current = latest.get(key)
+                if current is None or first_seen_at > current.first_seen_at:
+                    latest[key] = _Run(run_id, status, first_seen_at)
+    return latest
+
+
+def entity_history(
+    session: "Session",
+    entity_type: HistoryEntityType,
+    entity_id: str,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+) -> list[AvailabilityHistory]:
+    """Every run recorded for one division/campsite, by night then time."""
+    H = AvailabilityHistory
+    stmt = select(H).where(H.entity_type == entity_type, H.entity_id == entity_id)
+    if start_date:
+        stmt = stmt.where(H.night >= start_date)
+    if end_date:
+        stmt = stmt.where(H.night <= end_date)
+    stmt = stmt.order_by(col(H.night), col(H.first_seen_at))
+    return list(session.scalars(stmt).all())
+
+
+def openings(
+    session: "Session",
+    start_date: datetime.date,
+    end_date: datetime.date,
+    since: Optional[datetime.datetime] = None,
+) -> list[AvailabilityHistory]:
+    """Every run where a night between the dates was open, by when it was seen."""
+    H = AvailabilityHistory
+    stmt = select(H).where(
+        col(H.is_open).is_(True), col(H.night).between(start_date, end_date)
+    )
+    if since:
+        stmt = stmt.where(H.first_seen_at >= since)
+    stmt = stmt.order_by(col(H.first_seen_at), col(H.night))
+    return list(session.scalars(stmt).all())
+
+
+def compact_history(
+    session: "Session", keep_days: int, now: Optional[datetime.datetime] = None
+) -> tuple[int, int]:
+    """Bound the history table, returning (runs deleted, runs merged).
+
+    Runs last seen more than `keep_days` ago, and runs for nights that were that long
+    ago, are deleted. Consecutive runs of a night that ended up with the same status
+    (e.g. after the run between them was deleted) are merged into one.
+    """
+    H = AvailabilityHistory
+    now = now or _utcnow()
+    cutoff = now - datetime.timedelta(days=keep_days)
+    result = session.execute(
+        delete(H).where((col(H.last_seen_at) < cutoff) | (col(H.night) < cutoff.date()))
+    )
+    deleted = cast(CursorResult, result).rowcount
+
+    merged_ids: list[int] = []
+    previous: Optional[AvailabilityHistory] = None
+    stmt = select(H).order_by(
+        col(H.entity_type), col(H.entity_id), col(H.night), col(H.first_seen_at)
+    )
+    for run in session.scalars(stmt.execution_options(yield_per=CHUNK_SIZE)):
+        same_night = previous is not None and (
+            (previous.entity_type, previous.entity_id, previous.night)
+            == (run.entity_type, run.entity_id, run.night)
+        )
+        if same_night and previous.status == run.status:  # type: ignore
+            previous.last_seen_at = max(previous.last_seen_at, run.last_seen_at)  # type: ignore
+            merged_ids.append(run.id)  # type: ignore
+            continue
+        previous = run
+    session.flush()
+    for chunk in _chunks(merged_ids):
+        session.execute(delete(H).where(col(H.id).in_(chunk)))
+    return deleted, len(merged_ids)
@@ -0,0 +1,233 @@
+import datetime
+import heapq
+import json
+from enum import Enum
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, TypeVar
+
+if TYPE_CHECKING:
+    from .campsite_availability import ReservableBlock
+    from .division_availability import DivisionAvailability
+    from .models import Division
+
+DivisionMatch = list[tuple["DivisionAvailability", datetime.date]]
+T = TypeVar("T")
+
+
+class Ranking(str, Enum):
+    earliest = "earliest"
+    weekend = "weekend"
+    fewest_nyr = "fewest-nyr"
+    most_slots = "most-slots"
+
+
+def rank_matches(
+    matches: Iterable[T],
+    score: Callable[[T], int],
+    best_score: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> Iterator[T]:
+    """Lazily yield matches ordered by (score, start date), lowest first.
+
+    `matches` must arrive in start-date order. A match scoring `best_score` can't be
+    beaten by anything after it, so it is yielded straight away; everything else is
+    held back until the input runs out. Once `limit` matches have been yielded the
+    input is no longer consumed, which is what lets callers skip later fetches.
+    """
+    if limit is not None and limit <= 0:
+        return
+    yielded = 0
+    held: list[tuple[int, int, T]] = []
+    for i, match in enumerate(matches):
+        match_score = score(match)
+        if best_score is not None and match_score <= best_score:
+            yield match
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+        else:
+            heapq.heappush(held, (match_score, i, match))
+    while held and (limit is None or yielded < limit):
+        yield heapq.heappop(held)[2]
+        yielded += 1
+
+
+def is_weekend_start(date: datetime.date) -> bool:
+    # Friday or Saturday night starts
+    return date.weekday() in (4, 5)
+
+
+def division_match_score(
+    ranking: Ranking,
+) -> tuple[Callable[[DivisionMatch], int], Optional[int]]:
+    if ranking == Ranking.weekend:
+        return lambda m: 0 if is_weekend_start(m[0][1]) else 1, 0
+    elif ranking == Ranking.most_slots:
+        # fewest remaining slots on the tightest night, negated so lower is better
+        return lambda m: -min(a.available_slots_on(d) for a, d in m), None
+    elif ranking == Ranking.earliest:
+        return lambda m: 0, 0
+    raise ValueError(f"Cannot rank itinerary matches by {ranking.value}")
+
+
+def block_score(
+    ranking: Ranking,
+) -> tuple[Callable[["ReservableBlock"], int], Optional[int]]:
+    if ranking == Ranking.weekend:
+        return lambda b: 0 if is_weekend_start(b.start) else 1, 0
+    elif ranking == Ranking.fewest_nyr:
+        return lambda b: b.nyr_nights, 0
+    elif ranking == Ranking.earliest:
+        return lambda b: 0, 0
+    raise ValueError(f"Cannot rank campsite blocks by {ranking.value}")
+
+
+def iter_division_availability_date_matches(
+    availabilities: list["DivisionAvailability"],
+) -> Iterator[DivisionMatch]:
+    """Yield every start date (in order) where each stop is open on consecutive nights
+    in the itinerary's order."""
+    if not availabilities:
+        return
+    open_dates = [set(a.available_dates()) for a in availabilities]
+    for avail_date in availabilities[0].available_dates():
+        date_combos = [
+            (avail, avail_date + datetime.timedelta(days=i))
+            for i, avail in enumerate(availabilities)
+        ]
+        if all(date in open_dates[i] for i, (_, date) in enumerate(date_combos)):
+            yield date_combos
+
+
+def find_division_availability_date_matches(
+    availabilities: list["DivisionAvailability"],
+) -> list[DivisionMatch]:
+    return list(iter_division_availability_date_matches(availabilities))
+
+
+def load_hops(path: str, divisions: list["Division"]) -> dict[int, set[int]]:
+    """Load allowed hops between divisions from a JSON file mapping a division name to
+    the names of divisions that can be reached from it in one night. Hops are treated
+    as trails, so they can be walked in either direction."""
+    with open(path, "r") as f:
+        raw_hops: dict[str, list[str]] = json.load(f)
+
+    by_name = {d.name.lower(): d for d in divisions}
+    hops: dict[int, set[int]] = {d.division_id: set() for d in divisions}
+    for from_name, to_names in raw_hops.items():
+        for to_name in to_names:
+            from_div = by_name.get(from_name.lower())
+            to_div = by_name.get(to_name.lower())
+            if not from_div or not to_div:
+                # hops may describe a larger trail network than this itinerary
+                continue
+            hops[from_div.division_id].add(to_div.division_id)
+            hops[to_div.division_id].add(from_div.division_id)
+    return hops
+
+
+def find_unordered_itinerary_matches(
+    availabilities: list["DivisionAvailability"],
+    fixed_entry: bool = True,
+    fixed_exit: bool = True,
+    hops: Optional[dict[int, set[int]]] = None,
+) -> list[DivisionMatch]:
+    return list(
+        iter_unordered_itinerary_matches(availabilities, fixed_entry, fixed_exit, hops)
+    )
+
+
+def iter_unordered_itinerary_matches(
+    availabilities: list["DivisionAvailability"],
+    fixed_entry: bool = True,
+    fixed_exit: bool = True,
+    hops: Optional[dict[int, set[int]]] = None,
+) -> Iterator[DivisionMatch]:
+    """Find one feasible ordering of the itinerary's stops per starting date.
+
+    Only the first (entry) and last (exit) stops are kept in place unless told
+    otherwise, the stops in between may be visited in any order. If `hops` is given
+    (division_id => reachable division_ids) consecutive nights must follow it.
+
+    Stops are tracked as bits so the search is a memoized DFS over
+    (visited-set, last-stop, date), pruned by which stops are open on each date.
+    """
+    num_stops = len(availabilities)
+    if num_stops == 0:
+        return
+    full = (1 << num_stops) - 1
+    entry_bit = 1
+    exit_bit = 1 << (num_stops - 1)
+
+    # date ordinal => bitmask of stops with availability that night
+    open_by_day: dict[int, int] = {}
+    for i, avail in enumerate(availabilities):
+        for date in avail.available_dates():
+            day = date.toordinal()
+            open_by_day[day] = open_by_day.get(day, 0) | (1 << i)
+
+    allowed_next = [full] * num_stops
+    if hops is not None:
+        bit_for_id = {
+            a.division.division_id: 1 << i for i, a in enumerate(availabilities)
+        }
+        for i, avail in enumerate(availabilities):
+            reachable = hops.get(avail.division.division_id, set())
+            allowed_next[i] = sum(bit_for_id[d] for d in reachable if d in bit_for_id)
+
+    # (visited, last, day) => next stop on a feasible path (-1 when done, None if stuck)
+    memo: dict[tuple[int, int, int], Optional[int]] = {}
+
+    def next_stop(visited: int, last: int, day: int) -> Optional[int]:
+        if visited == full:
+            return -1
+        key = (visited, last, day)
+        if key in memo:
+            return memo[key]
+
+        remaining = full & ~visited
+        # every remaining stop must be open on at least one of the remaining nights
+        reachable_open = 0
+        for offset in range(1, remaining.bit_count() + 1):
+            reachable_open |= open_by_day.get(day + offset, 0)
+        if remaining & ~reachable_open:
+            memo[key] = None
+            return None
+
+        candidates = open_by_day.get(day + 1, 0) & remaining & allowed_next[last]
+        if fixed_exit and remaining != exit_bit:
+            candidates &= ~exit_bit
+        result = None
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            stop = bit.bit_length() - 1
+            if next_stop(visited | bit, stop, day + 1) is not None:
+                result = stop
+                break
+        memo[key] = result
+        return result
+
+    for day in sorted(open_by_day):
+        first_stops = open_by_day[day]
+        if fixed_entry:
+            first_stops &= entry_bit
+        elif fixed_exit and num_stops > 1:
+            first_stops &= ~exit_bit
+        while first_stops:
+            bit = first_stops & -first_stops
+            first_stops ^= bit
+            stop = bit.bit_length() - 1
+            following = next_stop(bit, stop, day)
+            if following is None:
+                continue
+            match = [(availabilities[stop], datetime.date.fromordinal(day))]
+            visited, curr_day = bit, day
+            while following is not None and following != -1:
+                visited |= 1 << following
+                curr_day += 1
+                match.append(
+                    (availabilities[following], datetime.date.fromordinal(curr_day))
+                )
+                following = next_stop(visited, following, curr_day)
+            yield match
+            break
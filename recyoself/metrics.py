@@ -0,0 +1,328 @@
+import bisect
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, TypeVar
+
+from . import profiling
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+T = TypeVar("T")
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return pairs and "{" + ",".join(pairs) + "}" or ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(ABC):
+    type: str = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        """(name, formatted labels, value) for every sample to export."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: object) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values => (per-bucket counts, +Inf included; sum)
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._label_values(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[i] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: object) -> int:
+        entry = self._values.get(self._label_values(labels))
+        return entry and sum(entry[0]) or 0
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), total[0]))
+                for key, (counts, total) in self._values.items()
+            )
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames + ("le",), key + (_format_value(bound),)
+                )
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    """Holds every metric and renders them in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"{metric.name} is already a {existing.type}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))  # type: ignore
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))  # type: ignore
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "".join(f"{m.render()}\n" for m in metrics)
+
+    def write_textfile(self, path: str) -> None:
+        """Write all metrics for node_exporter's textfile collector (atomically)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+        """Serve the metrics on http://HOST:PORT/metrics from a background thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def timed_iter(
+    iterable: Iterable[T],
+    histogram: Histogram,
+    phase: Optional[str] = None,
+    **labels: object,
+) -> Iterator[T]:
+    """Yield from `iterable`, observing only the time spent producing its items (also
+    recorded as `phase` when profiling)."""
+    elapsed = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                return
+            elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        histogram.observe(elapsed, **labels)
+        if phase is not None:
+            profiling.record(phase, elapsed)
+
+
+_ID_SEGMENT = re.compile(
+    r"^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$", re.I
+)
+
+
+def endpoint_label(endpoint: str) -> str:
+    """An endpoint with its IDs replaced, so every facility shares one label."""
+    return "/".join(
+        _ID_SEGMENT.match(part) and ":id" or part for part in endpoint.split("/")
+    )
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    "recyoself_requests_total",
+    "Requests made to Rec.gov, by endpoint and HTTP status (or error).",
+    ("endpoint", "status"),
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "recyoself_request_seconds",
+    "Time taken by requests to Rec.gov, by endpoint.",
+    ("endpoint",),
+)
+RESPONSE_CACHE = REGISTRY.counter(
+    "recyoself_response_cache_total",
+    "Rec.gov lookups answered from the response cache (hit) or fetched (miss).",
+    ("result",),
+)
+MATCH_CACHE = REGISTRY.counter(
+    "recyoself_match_cache_total",
+    "Match computations reused from the match cache (hit) or computed (miss).",
+    ("result",),
+)
+MATCH_SECONDS = REGISTRY.histogram(
+    "recyoself_match_seconds",
+    "Time spent finding matches in one window of availability, by matcher.",
+    ("matcher",),
+)
+MATCHES = REGISTRY.counter(
+    "recyoself_matches_total",
+    "Itinerary matches and campsite blocks found, by matcher.",
+    ("matcher",),
+)
+RIDB_SECONDS = REGISTRY.histogram(
+    "recyoself_ridb_seconds",
+    "Time taken by each phase of loading the RIDB export.",
+    ("phase",),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600),
+)
+RIDB_ROWS = REGISTRY.counter(
+    "recyoself_ridb_rows_total",
+    "Rows read from the RIDB export, by entity.",
+    ("entity",),
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "recyoself_db_query_seconds",
+    "Time taken by database statements, by kind (select, insert, ...).",
+    ("statement",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+DB_TRANSACTIONS = REGISTRY.counter(
+    "recyoself_db_transactions_total",
+    "Database session transactions, by outcome (commit or rollback).",
+    ("outcome",),
+)
+WATCH_CHECKS = REGISTRY.counter(
+    "recyoself_watch_checks_total",
+    "Watch checks run, by kind and result (ok or error).",
+    ("kind", "result"),
+)
+WATCH_CHECK_SECONDS = REGISTRY.histogram(
+    "recyoself_watch_check_seconds",
+    "Time taken by one watch check, by kind.",
+    ("kind",),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
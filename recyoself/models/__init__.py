@@ -1,4 +1,6 @@
+from .availability_history import AvailabilityHistory, HistoryEntityType
 from .campsite import Campsite
+from .campsite_attribute import CampsiteAttribute
 from .division import Division
 from .entity_checksum import EntityChecksum
 from .facility import Facility, FacilityType
@@ -6,4 +8,5 @@ from .itinerary import Itinerary
 from .lottery import Lottery, LotteryStatus, LotteryType
 from .ordered_itinerary_division import OrderedItineraryDivision
 from .organization import Organization
+from .permitted_equipment import PermittedEquipment
 from .recreation_area import RecreationArea
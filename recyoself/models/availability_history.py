@@ -0,0 +1,41 @@
+from datetime import date, datetime
+
+import sqlalchemy as sa
+from sqlmodel import Field
+
+from .base import Base, BaseEnum
+
+
+class HistoryEntityType(str, BaseEnum):
+    division = "division"
+    campsite = "campsite"
+
+
+class AvailabilityHistory(Base, table=True):
+    """One run of unchanged availability for a division/campsite on one night.
+
+    Rows are only appended when a night's status changes, an unchanged poll just moves
+    the run's `last_seen_at` forward.
+    """
+
+    __table_args__ = (
+        # the history of one division/campsite
+        sa.Index(
+            "ix_history_entity_night",
+            "entity_type",
+            "entity_id",
+            "night",
+            "first_seen_at",
+        ),
+        # what opened up for a range of nights
+        sa.Index("ix_history_open_night", "is_open", "night", "first_seen_at"),
+    )
+
+    entity_type: HistoryEntityType
+    entity_id: str
+    night: date
+    # remaining slots for divisions, the CampsiteStatus for campsites
+    status: int
+    is_open: bool
+    first_seen_at: datetime
+    last_seen_at: datetime
@@ -6,7 +6,9 @@ from sqlmodel import Field, Relationship
 from .base import Base, BaseEnum
 
 if TYPE_CHECKING:
+    from .campsite_attribute import CampsiteAttribute
     from .facility import Facility
+    from .permitted_equipment import PermittedEquipment
 
 
 class CampsiteType(str, BaseEnum):
@@ -44,15 +46,17 @@ class UseType(str, BaseEnum):
 class Campsite(Base, table=True):
     name: str
     loop: str | None = Field(default=None)
-    campsite_id: int
+    campsite_id: int = Field(index=True)
     type: CampsiteType = Field(
         sa_column=sa.Column(sa.Enum(CampsiteType, create_constraint=True))
     )
     electric: bool
     group_site: bool
     use: UseType = Field(sa_column=sa.Column(sa.Enum(UseType, create_constraint=True)))
-    facility_id: int = Field(foreign_key="facility.id")
+    facility_id: int = Field(foreign_key="facility.id", index=True)
     facility: "Facility" = Relationship(back_populates="campsites")
+    attributes: list["CampsiteAttribute"] = Relationship(back_populates="campsite")
+    equipment: list["PermittedEquipment"] = Relationship(back_populates="campsite")
 
     @property
     def combined_type(self):
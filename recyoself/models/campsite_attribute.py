@@ -0,0 +1,29 @@
+from typing import TYPE_CHECKING
+
+import sqlalchemy as sa
+from sqlmodel import Field, Relationship
+
+from .base import Base
+
+if TYPE_CHECKING:
+    from .campsite import Campsite
+
+
+class CampsiteAttribute(Base, table=True):
+    """One RIDB attribute of a campsite, e.g. "Driveway Entry" => "Pull-Through".
+
+    Names and values compare case-insensitively. Values that are numbers (like "Max
+    Vehicle Length") are also kept in `number`, for range filters.
+    """
+
+    __table_args__ = (
+        # campsites with an attribute value, and those within a numeric range
+        sa.Index("ix_campsite_attribute_value", "name", "value", "campsite_id"),
+        sa.Index("ix_campsite_attribute_number", "name", "number", "campsite_id"),
+    )
+
+    campsite_id: int = Field(foreign_key="campsite.id", index=True)
+    campsite: "Campsite" = Relationship(back_populates="attributes")
+    name: str = Field(sa_type=sa.String(collation="NOCASE"))  # type: ignore
+    value: str = Field(sa_type=sa.String(collation="NOCASE"))  # type: ignore
+    number: float | None = None
@@ -18,7 +18,7 @@ class Division(Base, table=True):
     district: str | None
     is_hidden: bool
     is_active: bool
-    permit_id: int = Field(foreign_key="facility.id")
+    permit_id: int = Field(foreign_key="facility.id", index=True)
     permit: "Facility" = Relationship(back_populates="divisions")
     _itinerary_divisions: list["OrderedItineraryDivision"] = Relationship(
         back_populates="division"
@@ -39,6 +39,9 @@ class FacilityType(str, BaseEnum):
 
 
 class Facility(Base, table=True):
+    # bounding-box lookups when SQLite lacks R*Tree support (see `geo`)
+    __table_args__ = (sa.Index("ix_facility_location", "latitude", "longitude"),)
+
     name: str = Field(index=True)
     facility_id: str = Field(unique=True, index=True)
     type: FacilityType = Field(
@@ -53,4 +56,6 @@ class Facility(Base, table=True):
     itineraries: list["Itinerary"] = Relationship(back_populates="permit")
     divisions: list["Division"] = Relationship(back_populates="permit")
     lotteries: list["Lottery"] = Relationship(back_populates="facility")
+    latitude: float | None = None
+    longitude: float | None = None
     campsites: list["Campsite"] = Relationship(back_populates="facility")
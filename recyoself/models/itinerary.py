@@ -3,19 +3,19 @@ from typing import TYPE_CHECKING, ClassVar, Optional
 from pydantic import ConfigDict
 from sqlalchemy.ext.associationproxy import AssociationProxy, association_proxy
 from sqlalchemy.ext.orderinglist import ordering_list
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import joinedload, relationship, selectinload
 from sqlmodel import Field, Relationship
 
 from .base import Base
+from .division import Division
 from .ordered_itinerary_division import OrderedItineraryDivision
 
 if TYPE_CHECKING:
-    from .division import Division
     from .facility import Facility
 
 
 class Itinerary(Base, table=True):
-    name: str
+    name: str = Field(index=True)
     permit_id: int = Field(foreign_key="facility.id")
     permit: "Facility" = Relationship(back_populates="itineraries")
     _itinerary_divisions: list["OrderedItineraryDivision"] = Relationship(
@@ -27,6 +27,16 @@ class Itinerary(Base, table=True):
     )
     # divisions: ClassVar = association_proxy("_divisions", "division", creator=lambda div: ItineraryDivisionLink(division=div))
 
+    @classmethod
+    def with_divisions(cls):
+        """Loader option for the ordered divisions and their permit, fetched with the
+        itineraries instead of one lazy load per division."""
+        return (
+            selectinload(cls._itinerary_divisions)  # type: ignore
+            .joinedload(OrderedItineraryDivision.division)  # type: ignore
+            .joinedload(Division.permit)  # type: ignore
+        )
+
     @property
     def divisions(self):
         return [it_div.division for it_div in self._itinerary_divisions]
@@ -29,7 +29,7 @@ class Lottery(Base, table=True):
     summary: str | None
     status: LotteryStatus
     type: LotteryType
-    facility_id: int = Field(foreign_key="facility.id")
+    facility_id: int = Field(foreign_key="facility.id", index=True)
     facility: "Facility" = Relationship(back_populates="lotteries")
     display_at: datetime
     open_at: datetime
@@ -12,7 +12,7 @@ if TYPE_CHECKING:
 
 
 class OrderedItineraryDivision(Base, table=True):
-    itinerary_id: int = Field(foreign_key="itinerary.id")
+    itinerary_id: int = Field(foreign_key="itinerary.id", index=True)
     itinerary: "Itinerary" = Relationship(back_populates="_itinerary_divisions")
     division_id: int = Field(foreign_key="division.id")
     division: "Division" = Relationship(back_populates="_itinerary_divisions")
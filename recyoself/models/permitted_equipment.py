@@ -0,0 +1,23 @@
+from typing import TYPE_CHECKING
+
+import sqlalchemy as sa
+from sqlmodel import Field, Relationship
+
+from .base import Base
+
+if TYPE_CHECKING:
+    from .campsite import Campsite
+
+
+class PermittedEquipment(Base, table=True):
+    """Equipment (e.g. "Trailer") a campsite allows, up to `max_length` feet when
+    RIDB gives one. Names compare case-insensitively."""
+
+    __table_args__ = (
+        sa.Index("ix_permitted_equipment_name", "name", "max_length", "campsite_id"),
+    )
+
+    campsite_id: int = Field(foreign_key="campsite.id", index=True)
+    campsite: "Campsite" = Relationship(back_populates="equipment")
+    name: str = Field(sa_type=sa.String(collation="NOCASE"))  # type: ignore
+    max_length: float | None = None
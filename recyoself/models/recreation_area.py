@@ -16,3 +16,5 @@ class RecreationArea(Base, table=True):
     org_id: int | None = Field(default=None, foreign_key="organization.id")
     org: "Organization" = Relationship(back_populates="rec_areas")
     facilities: list["Facility"] = Relationship(back_populates="rec_area")
+    latitude: float | None = None
+    longitude: float | None = None
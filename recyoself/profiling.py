@@ -0,0 +1,194 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, ContextManager, Iterator, Optional
+
+if TYPE_CHECKING:
+    from rich.console import Console
+
+
+@dataclass
+class PhaseStats:
+    calls: int = 0
+    # wall time including nested phases, and without them
+    total: float = 0.0
+    own: float = 0.0
+    # highest traced memory above where the phase started (with --profile-memory)
+    peak_bytes: int = 0
+
+
+class _Frame:
+    __slots__ = ("name", "started", "child_time", "start_bytes", "child_peak")
+
+    def __init__(self, name: str, start_bytes: int) -> None:
+        self.name = name
+        self.started = time.perf_counter()
+        self.child_time = 0.0
+        self.start_bytes = start_bytes
+        self.child_peak = 0
+
+
+class Profiler:
+    """Times named phases of a run (and optionally their memory use).
+
+    Phases are entered with `span`, and can nest: a phase's own time excludes the
+    phases inside it. Timings measured elsewhere (e.g. by DB event hooks) are added
+    with `record`.
+    """
+
+    def __init__(self, memory: bool = False, cprofile: bool = False) -> None:
+        self.memory = memory
+        self.stats: dict[str, PhaseStats] = {}
+        self.started = time.perf_counter()
+        self.wall = 0.0
+        self.peak_bytes = 0
+        self.cprofile = cprofile and cProfile.Profile() or None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self.memory:
+            tracemalloc.start()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        self.started = time.perf_counter()
+
+    def stop(self) -> None:
+        self.wall = time.perf_counter() - self.started
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        if self.memory and tracemalloc.is_tracing():
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    @property
+    def _stack(self) -> list[_Frame]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _traced(self) -> tuple[int, int]:
+        if self.memory and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()
+        return 0, 0
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        stack = self._stack
+        current, peak = self._traced()
+        if stack:
+            # the peak is about to be reset, so remember it for the enclosing phase
+            stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        frame = _Frame(name, current)
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame.started
+            peak = max(self._traced()[1], frame.child_peak)
+            self._add(
+                name, elapsed, elapsed - frame.child_time, peak - frame.start_bytes
+            )
+            if stack:
+                stack[-1].child_time += elapsed
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+
+    def record(self, name: str, elapsed: float, calls: int = 1) -> None:
+        stack = self._stack
+        if stack:
+            stack[-1].child_time += elapsed
+        self._add(name, elapsed, elapsed, 0, calls)
+
+    def _add(
+        self, name: str, total: float, own: float, peak_bytes: int, calls: int = 1
+    ) -> None:
+        with self._lock:
+            stats = self.stats.setdefault(name, PhaseStats())
+            stats.calls += calls
+            stats.total += total
+            stats.own += own
+            stats.peak_bytes = max(stats.peak_bytes, peak_bytes)
+
+    def summary(self) -> dict:
+        return {
+            "wall_seconds": self.wall,
+            "peak_bytes": self.peak_bytes,
+            "phases": {
+                name: asdict(stats)
+                for name, stats in sorted(
+                    self.stats.items(), key=lambda kv: kv[1].own, reverse=True
+                )
+            },
+        }
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def print_summary(self, console: Optional["Console"] = None) -> None:
+        from rich.console import Console
+        from rich.table import Table
+
+        console = console or Console(stderr=True)
+        table = Table(title=f"Profile: {self.wall:.3f}s wall")
+        table.add_column("Phase")
+        table.add_column("Calls", justify="right")
+        table.add_column("Total (s)", justify="right")
+        table.add_column("Own (s)", justify="right")
+        table.add_column("Own %", justify="right")
+        if self.memory:
+            table.add_column("Peak (MiB)", justify="right")
+        phases = self.summary()["phases"]
+        unprofiled = self.wall - sum(stats["own"] for stats in phases.values())
+        if unprofiled > 0:
+            phases["(unprofiled)"] = asdict(
+                PhaseStats(calls=1, total=unprofiled, own=unprofiled)
+            )
+        for name, stats in phases.items():
+            row = [
+                name,
+                str(stats["calls"]),
+                f"{stats['total']:.3f}",
+                f"{stats['own']:.3f}",
+                f"{100 * stats['own'] / (self.wall or 1):.1f}",
+            ]
+            if self.memory:
+                row.append(f"{stats['peak_bytes'] / 2**20:.2f}")
+            table.add_row(*row)
+        console.print(table)
+        if self.memory:
+            console.print(f"Peak traced memory: {self.peak_bytes / 2**20:.1f} MiB")
+
+    def cprofile_stats(self, limit: int = 25) -> str:
+        if self.cprofile is None:
+            return ""
+        out = io.StringIO()
+        stats = pstats.Stats(self.cprofile, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return out.getvalue()
+
+
+# set for the duration of a `--profile` run
+PROFILER: Optional[Profiler] = None
+
+
+def span(name: str) -> ContextManager[None]:
+    """Time a phase of the current run, if it is being profiled."""
+    if PROFILER is None:
+        return nullcontext()
+    return PROFILER.span(name)
+
+
+def record(name: str, elapsed: float, calls: int = 1) -> None:
+    if PROFILER is not None:
+        PROFILER.record(name, elapsed, calls)
@@ -0,0 +1,58 @@
+"""Matches and blocks as JSON-able records, for `--format` and `serve`."""
+
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .campsite_availability import ReservableBlock
+    from .matching import DivisionMatch
+
+
+def match_record(match: "DivisionMatch", **fields) -> dict:
+    """A match as a JSON-able record (with `fields` first): its dates, and each
+    night's division and availability."""
+    nights = []
+    for availability, date in match:
+        info = availability.availability_on(date)
+        nights.append(
+            {
+                "date": date.isoformat(),
+                "division_id": availability.division.division_id,
+                "division": availability.division.name,
+                "status": info and info.available and "available" or "unavailable",
+                "available_slots": info and info.available_slots or 0,
+                "total_slots": info and info.total_slots or 0,
+                "walkup": bool(info and info.has_walkup),
+            }
+        )
+    return {
+        **fields,
+        "first_night": match[0][1].isoformat(),
+        "last_night": match[-1][1].isoformat(),
+        "nights": nights,
+    }
+
+
+def block_record(
+    block: "ReservableBlock",
+    campground_id: str,
+    campground: str,
+    site: str,
+    loop: Optional[str],
+    **fields,
+) -> dict:
+    """A block as a JSON-able record (with `fields` last), with each night's status."""
+    return {
+        "type": "campsite_block",
+        "campground_id": campground_id,
+        "campground": campground,
+        "campsite_id": str(block.campsite_id),
+        "site": site,
+        "loop": loop,
+        "first_night": block.start.isoformat(),
+        "last_night": block.end.isoformat(),
+        "nights": [
+            {"date": date.isoformat(), "status": status.name}
+            for date, status in block.night_statuses()
+        ],
+        **fields,
+    }
@@ -1,16 +1,23 @@
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime as dt
-from typing import TYPE_CHECKING, Iterator, Optional
+from typing import TYPE_CHECKING, Any, Collection, Iterator, Optional
 
 import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 from sqlmodel import select
-from tqdm import tqdm
 
 from recyoself import HEADERS
 
+from . import profiling
+from .cache import TTLCache
 from .campsite_availability import CampsiteAvailability
 from .division_availability import DivisionAvailability
+from .metrics import REQUEST_SECONDS, REQUESTS, RESPONSE_CACHE, endpoint_label
 from .models import Division, Facility, Lottery
+from .scheduling import RequestBudget
+from .utils.dates import months_between, parse_iso_date
 
 if TYPE_CHECKING:
     from uuid import UUID
@@ -20,29 +27,184 @@ if TYPE_CHECKING:
     from .models import Division
 
 
+def division_fields(division_id: str, data: dict) -> dict[str, Any]:
+    """`Division` fields (but its permit) from a permit's divisions response."""
+    return {
+        "name": data["name"],
+        "type": data["type"] or None,
+        "division_id": division_id,
+        "district": data["district"],
+        "is_hidden": data["is_hidden"],
+        "is_active": data["is_active"],
+    }
+
+
+def lottery_fields(data: dict) -> dict[str, Any]:
+    """`Lottery` fields (but its facility) from an available lotteries response."""
+    return {
+        "lottery_id": data["id"],
+        "name": data["name"],
+        "desc": data["description"],
+        "summary": data["summary"],
+        "status": data["status"],
+        "type": data["inventory_type"],
+        "display_at": dt.fromisoformat(data["display_at"]),
+        "open_at": dt.fromisoformat(data["open_at"]),
+        "close_at": dt.fromisoformat(data["close_at"]),
+        "scheduled_run_at": dt.fromisoformat(data["scheduled_at"]),
+        "ran_at": dt.fromisoformat(data["ran_at"]),
+        "announced_at": dt.fromisoformat(data["announced_at"]),
+        "access_start_at": dt.fromisoformat(data["inventory_info"]["dates"]["start"]),
+        "access_end_at": dt.fromisoformat(data["inventory_info"]["dates"]["end"]),
+    }
+
+
+def division_availability_request(
+    facility_id: str,
+    division_id: int,
+    lottery_id: Optional["UUID"],
+    month: int,
+    year: int,
+    in_eap: bool = True,
+) -> tuple[str, dict]:
+    """The (endpoint, params) for a month of a division's availability, from the early
+    access endpoint while the lottery's early access is on."""
+    avail_substr = in_eap and "eapavailability" or "availability"
+    url = f"permititinerary/{facility_id}/division/{division_id}/{avail_substr}/month"
+    if lottery_id and in_eap:
+        url = f"{url}/{lottery_id}"
+    return url, {"month": month, "year": year}
+
+
+def campsite_availability_request(
+    facility_id: str, month: int, year: int
+) -> tuple[str, dict]:
+    """The (endpoint, params) for a month of a campground's availability."""
+    url = f"camps/availability/campground/{facility_id}/month"
+    return url, {"start_date": f"{year}-{str(month).zfill(2)}-01T00:00:00.000Z"}
+
+
+def parse_division_availabilities(response: dict) -> dict[str, dict]:
+    """Availability by (ISO) date from a division availability response."""
+    quotas = response.get("payload", {}).get("quota_type_maps", {})
+    # not entirely clear when it's one map type or the other
+    # QuotaUsageByMemberDaily also exists for tracking total people
+    return quotas.get("QuotaUsageBySiteDaily", {}) or quotas.get(
+        "ConstantQuotaUsageDaily", {}
+    )
+
+
+def parse_campsite_availabilities(response: dict) -> dict[str, dict]:
+    """Availability by campsite ID from a campground availability response."""
+    return response.get("campsites", {})
+
+
+def add_division_availabilities(
+    div_avail: DivisionAvailability,
+    availabilities_by_date: dict[str, dict],
+    start_date: datetime.date,
+    end_date: datetime.date,
+) -> None:
+    """Add a month of parsed availability (between the dates) to `div_avail`."""
+    with profiling.span("parse"):
+        for date, avail_data in availabilities_by_date.items():
+            date = parse_iso_date(date)
+            if start_date <= date <= end_date:
+                div_avail.set_availability(
+                    date=date,
+                    total_slots=avail_data["total"],
+                    available_slots=avail_data["remaining"],
+                    has_walkup=avail_data["show_walkup"],
+                )
+
+
+def add_campsite_availabilities(
+    availabilities: dict[str, CampsiteAvailability],
+    campsites: dict[str, dict],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    campsite_ids: Optional[Collection[str]] = None,
+) -> None:
+    """Add a month of parsed availability (between the dates) to `availabilities`, by
+    campsite ID, skipping campsites not in `campsite_ids` when given."""
+    with profiling.span("parse"):
+        for cs_id, cs_data in campsites.items():
+            if campsite_ids is not None and cs_id not in campsite_ids:
+                continue
+            # a campsite shows up once per month, but blocks can span months
+            cs_avail = availabilities.setdefault(cs_id, CampsiteAvailability(cs_id))
+            for date, status in cs_data["availabilities"].items():
+                date = parse_iso_date(date)
+                if start_date <= date <= end_date:
+                    cs_avail.add_availability(date, status)
+
+
 class RecreationDotGov:
     base_url: str = "https://www.recreation.gov/api"
 
+    timeout: float = 30
+
+    def __init__(
+        self, cache: Optional[TTLCache] = None, budget: Optional[RequestBudget] = None
+    ) -> None:
+        # responses are shared per instance, so searching several itineraries (or
+        # divisions) with one client fetches each (division, year, month) only once
+        self.cache = cache if cache is not None else TTLCache()
+        # every request that isn't answered from the cache waits on the budget
+        self.budget = budget
+        # pooled connections, kept alive between requests (and polls in watch mode)
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.pool_size = DEFAULT_POOLSIZE
+
+    def warm_up(self, connections: int = 1) -> int:
+        """Open `connections` pooled connections to rec.gov ahead of time (so DNS,
+        TCP and TLS are out of the way), returning how many answered.
+
+        They're held open together so each is a separate connection. This skips the
+        cache and the budget: nothing is fetched, and the connections are reused by
+        the requests that are.
+        """
+        if connections > self.pool_size:
+            self.pool_size = connections
+            adapter = HTTPAdapter(pool_maxsize=connections)
+            self.session.mount(self.base_url, adapter)
+        everyone_connected = threading.Barrier(connections)
+
+        def connect() -> bool:
+            try:
+                # streamed, so the connection isn't back in the pool until closed
+                r = self.session.head(self.base_url, timeout=self.timeout, stream=True)
+            except requests.RequestException:
+                everyone_connected.abort()
+                return False
+            try:
+                everyone_connected.wait(self.timeout)
+            except threading.BrokenBarrierError:
+                pass
+            # reading the (empty) body puts the connection back in the pool, where
+            # closing the response would close it
+            r.content
+            return True
+
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            return sum(pool.map(lambda _: connect(), range(connections)))
+
     def make_permit_divisions(self, permit: Facility) -> Iterator[Division]:
+        from tqdm import tqdm
+
         divisions = self._get_divisions(permit.facility_id)
         num_divisions = len(divisions)
         with tqdm(
             total=num_divisions, unit="divs", desc="Loading Divisions"
         ) as progress_bar:
             for division_id, division in divisions.items():
-                kwargs = {
-                    "name": division["name"],
-                    "type": division["type"] or None,
-                    "division_id": division_id,
-                    "district": division["district"],
-                    "permit": permit,
-                    "is_hidden": division["is_hidden"],
-                    "is_active": division["is_active"],
-                }
-                yield Division(**kwargs)
+                yield Division(permit=permit, **division_fields(division_id, division))
                 progress_bar.update()
 
     def make_lotteries(self, session: "Session") -> Iterator[Lottery]:
+        from tqdm import tqdm
+
         lotteries = self._get_lotteries()
         num_lotteries = len(lotteries)
         with tqdm(
@@ -54,26 +216,7 @@ class RecreationDotGov:
                     Facility.facility_id == facility_id
                 )
                 facility = session.scalars(facility_stmt).first()
-                kwargs = {
-                    "lottery_id": lottery_data["id"],
-                    "name": lottery_data["name"],
-                    "desc": lottery_data["description"],
-                    "summary": lottery_data["summary"],
-                    "status": lottery_data["status"],
-                    "type": lottery_data["inventory_type"],
-                    "display_at": dt.fromisoformat(lottery_data["display_at"]),
-                    "open_at": dt.fromisoformat(lottery_data["open_at"]),
-                    "close_at": dt.fromisoformat(lottery_data["close_at"]),
-                    "scheduled_run_at": dt.fromisoformat(lottery_data["scheduled_at"]),
-                    "ran_at": dt.fromisoformat(lottery_data["ran_at"]),
-                    "announced_at": dt.fromisoformat(lottery_data["announced_at"]),
-                    "access_start_at": dt.fromisoformat(
-                        lottery_data["inventory_info"]["dates"]["start"]
-                    ),
-                    "access_end_at": dt.fromisoformat(
-                        lottery_data["inventory_info"]["dates"]["end"]
-                    ),
-                }
+                kwargs = lottery_fields(lottery_data)
                 if not facility:
                     print(
                         f'Cannot process lottery "{kwargs["name"]} ({kwargs["lottery_id"]}): Facility "{facility_id}" not found.'
@@ -94,44 +237,34 @@ class RecreationDotGov:
         div_id = division.division_id
         lottery_id = lottery and lottery.lottery_id or None
         in_eap = lottery and lottery.in_early_access or False
-        months = list(range(start_date.month, end_date.month + 1))
-        year = start_date.year
 
         div_avail = DivisionAvailability(division)
-        for month in months:
+        for year, month in months_between(start_date, end_date):
             availabilities_by_date = self._get_division_availabilities(
                 fac_id, div_id, lottery_id, month, year, in_eap
             )
-            for date, avail_data in availabilities_by_date.items():
-                date = dt.strptime(date, "%Y-%m-%d").date()
-                if start_date <= date <= end_date:
-                    div_avail.set_availability(
-                        date=date,
-                        total_slots=avail_data["total"],
-                        available_slots=avail_data["remaining"],
-                        has_walkup=avail_data["show_walkup"],
-                    )
+            add_division_availabilities(
+                div_avail, availabilities_by_date, start_date, end_date
+            )
         return div_avail
 
     def make_campsite_availabilities(
-        self, start_date: datetime.date, end_date: datetime.date, campground: "Facility"
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        campground: "Facility",
+        campsite_ids: Optional[Collection[str]] = None,
     ):
+        """The availability of the campground's campsites (only those in
+        `campsite_ids`, when given) between the dates."""
         fac_id = campground.facility_id
-        months = list(range(start_date.month, end_date.month + 1))
-        year = start_date.year
-        availabilities: list[CampsiteAvailability] = []
-
-        for month in months:
-            for cs_id, cs_data in self._get_campsite_availabilities(
-                fac_id, month, year
-            ).items():
-                cs_avail = CampsiteAvailability(cs_id)
-                for date, status in cs_data["availabilities"].items():
-                    date = dt.strptime(date, "%Y-%m-%dT%H:%M:%SZ").date()
-                    if start_date <= date <= end_date:
-                        cs_avail.add_availability(date, status)
-                availabilities.append(cs_avail)
-        return availabilities
+        availabilities: dict[str, CampsiteAvailability] = {}
+        for year, month in months_between(start_date, end_date):
+            campsites = self._get_campsite_availabilities(fac_id, month, year)
+            add_campsite_availabilities(
+                availabilities, campsites, start_date, end_date, campsite_ids
+            )
+        return list(availabilities.values())
 
     def _get_divisions(self, permitcontent_id: str) -> dict:
         return self._get(f"permitcontent/{permitcontent_id}/divisions").get(
@@ -150,32 +283,43 @@ class RecreationDotGov:
         year: int,
         in_eap: bool = True,
     ) -> dict:
-
-        avail_substr = in_eap and "eapavailability" or "availability"
-        url = (
-            f"permititinerary/{facility_id}/division/{division_id}/{avail_substr}/month"
-        )
-        if lottery_id and in_eap:
-            url = f"{url}/{lottery_id}"
-        params = {"month": month, "year": year}
-        quotas = (
-            self._get(url, params=params).get("payload", {}).get("quota_type_maps", {})
-        )
-        # not entirely clear when it's one map type or the other
-        # QuotaUsageByMemberDaily also exists for tracking total people
-        return quotas.get("QuotaUsageBySiteDaily", {}) or quotas.get(
-            "ConstantQuotaUsageDaily", {}
+        url, params = division_availability_request(
+            facility_id, division_id, lottery_id, month, year, in_eap
         )
+        return parse_division_availabilities(self._get(url, params=params))
 
     def _get_campsite_availabilities(
         self, facility_id: str, month: int, year: int
     ) -> dict[str, dict]:
-        url = f"camps/availability/campground/{facility_id}/month"
-        params = {"start_date": f"{year}-{str(month).zfill(2)}-01T00:00:00.000Z"}
-        return self._get(url, params=params).get("campsites", {})
+        url, params = campsite_availability_request(facility_id, month, year)
+        return parse_campsite_availabilities(self._get(url, params=params))
 
     def _get(self, endpoint: str, params: Optional[dict] = None) -> dict:
+        cache_key = (endpoint, tuple(sorted((params or {}).items())))
+
+        fetched = False
+
+        def fetch() -> dict:
+            nonlocal fetched
+            fetched = True
+            if self.budget is not None:
+                self.budget.acquire()
+            return self._fetch(endpoint, params)
+
+        response = self.cache.get_or_set(cache_key, fetch)
+        RESPONSE_CACHE.inc(result=fetched and "miss" or "hit")
+        return response
+
+    def _fetch(self, endpoint: str, params: Optional[dict] = None) -> dict:
         url = f"{self.base_url}/{endpoint}"
-        r = requests.get(url, headers=HEADERS, params=params)
-        r.raise_for_status()
-        return r.json()
+        label = endpoint_label(endpoint)
+        status = "error"
+        try:
+            with REQUEST_SECONDS.time(endpoint=label), profiling.span("http"):
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            status = str(r.status_code)
+            r.raise_for_status()
+            with profiling.span("json"):
+                return r.json()
+        finally:
+            REQUESTS.inc(endpoint=label, status=status)
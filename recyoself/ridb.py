@@ -1,8 +1,9 @@
 import csv
+import datetime
 import hashlib
 import os
 from tempfile import NamedTemporaryFile
-from typing import IO, TYPE_CHECKING, Any, Iterator
+from typing import IO, TYPE_CHECKING, Any, Callable, Iterator, Optional
 from zipfile import ZipFile
 
 import requests
@@ -11,15 +12,45 @@ from tqdm import tqdm
 
 from recyoself import USER_DATA_DIR
 
-from .models import Campsite, EntityChecksum, Facility, Organization, RecreationArea
+from .geo import parse_coordinate
+from .metrics import RIDB_ROWS, RIDB_SECONDS
+from .models import (
+    Campsite,
+    CampsiteAttribute,
+    EntityChecksum,
+    Facility,
+    Organization,
+    PermittedEquipment,
+    RecreationArea,
+)
+from .profiling import span
 
 if TYPE_CHECKING:
     from sqlalchemy.orm import Session
 
 
+# rows inserted at once when loading campsite attributes and equipment
+BATCH_SIZE = 5000
+
+
+def parse_number(value: Optional[str]) -> Optional[float]:
+    """A number from RIDB text (e.g. "30" or "30.5 ft"), or None if it isn't one."""
+    try:
+        return float((value or "").split(" ", 1)[0])
+    except ValueError:
+        return None
+
+
 class RIDB:
     base_url: str = "https://ridb.recreation.gov"
-    entities: list[str] = ["Campsites", "Facilities", "Organizations", "RecAreas"]
+    entities: list[str] = [
+        "Campsites",
+        "CampsiteAttributes",
+        "Facilities",
+        "Organizations",
+        "PermittedEquipment",
+        "RecAreas",
+    ]
 
     @property
     def entities_csv_zip_url(self) -> str:
@@ -31,8 +62,10 @@ class RIDB:
 
     def fetch_entities(self) -> None:
         with NamedTemporaryFile(delete_on_close=False) as tempf:
-            self._download_zip(tempf)
-            self._extract_entities(tempf)
+            with RIDB_SECONDS.time(phase="download"), span("ridb_download"):
+                self._download_zip(tempf)
+            with RIDB_SECONDS.time(phase="extract"), span("ridb_extract"):
+                self._extract_entities(tempf)
 
     def is_entity_csv_updated(self, entity: str, session: "Session") -> bool:
         csv_checksum = self._get_csv_checksum(self._csv_filepath_for(entity))
@@ -63,23 +96,26 @@ class RIDB:
     def make_rec_areas(self, session: "Session") -> Iterator[RecreationArea]:
         self._update_entity_checksum("RecAreas", session)
 
+        # one query for every parent, rather than one per row
+        orgs = {str(o.org_id): o for o in session.scalars(select(Organization))}
         for data in self._read_csv("RecAreas"):
             kwargs = {
                 "name": data["RecAreaName"],
                 "org_rec_area_id": data["OrgRecAreaID"],
                 "rec_area_id": data["RecAreaID"],
+                "latitude": parse_coordinate(data.get("RecAreaLatitude")),
+                "longitude": parse_coordinate(data.get("RecAreaLongitude")),
             }
 
-            org_stmt = select(Organization).where(
-                Organization.org_id == data["ParentOrgID"]
-            )
-            org = session.scalars(org_stmt).first()
+            org = orgs.get(data["ParentOrgID"])
 
             yield RecreationArea(org=org, **kwargs)
 
     def make_facilities(self, session: "Session") -> Iterator[Facility]:
         self._update_entity_checksum("Facilities", session)
 
+        orgs = {str(o.org_id): o for o in session.scalars(select(Organization))}
+        rec_areas = {r.rec_area_id: r for r in session.scalars(select(RecreationArea))}
         for data in self._read_csv("Facilities"):
             if not data["FacilityName"]:
                 continue
@@ -88,30 +124,24 @@ class RIDB:
                 "name": data["FacilityName"],
                 "facility_id": data["FacilityID"],
                 "type": data["FacilityTypeDescription"],
+                "latitude": parse_coordinate(data.get("FacilityLatitude")),
+                "longitude": parse_coordinate(data.get("FacilityLongitude")),
             }
             # In JSON, "OrgFacilityID" and "ParentOrgID" are switched lol
-            org_stmt = select(Organization).where(
-                Organization.org_id == data["OrgFacilityID"]
-            )
-            org = session.scalars(org_stmt).first()
+            org = orgs.get(data["OrgFacilityID"])
             if not org:
                 print(
                     f'Cannot process facility "{kwargs["name"]} ({kwargs["facility_id"]}): Org "{data["OrgFacilityID"]}" not found.'
                 )
                 continue
-            rec_area = None
-            rec_area_id = data["ParentRecAreaID"]
-            if rec_area_id:
-                rec_area_stmt = select(RecreationArea).where(
-                    RecreationArea.rec_area_id == rec_area_id
-                )
-                rec_area = session.scalars(rec_area_stmt).first()
+            rec_area = rec_areas.get(data["ParentRecAreaID"])
 
             yield Facility(org=org, rec_area=rec_area, **kwargs)
 
     def make_campsites(self, session: "Session") -> Iterator[Campsite]:
         self._update_entity_checksum("Campsites", session)
 
+        facilities = {f.facility_id: f for f in session.scalars(select(Facility))}
         for data in self._read_csv("Campsites"):
             campsite_type, electric, group_site = self._parse_campsite_type(
                 data["CampsiteType"]
@@ -125,13 +155,79 @@ class RIDB:
                 "group_site": group_site,
                 "use": data["TypeOfUse"],
             }
-            facility_stmt = select(Facility).where(
-                Facility.facility_id == data["FacilityID"]
-            )
-            facility = session.scalars(facility_stmt).first()
+            facility = facilities.get(data["FacilityID"])
 
             yield Campsite(facility=facility, **kwargs)
 
+    def make_campsite_attributes(
+        self, session: "Session"
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Batches of `CampsiteAttribute` rows (for a bulk insert) for the campsites
+        already loaded. Rows are read as they're needed, never all at once."""
+        self._update_entity_checksum("CampsiteAttributes", session)
+
+        def make_row(data: dict[str, str]) -> Optional[dict[str, Any]]:
+            name, value = data["AttributeName"].strip(), data["AttributeValue"].strip()
+            if not name or not value:
+                return None
+            return {"name": name, "value": value, "number": parse_number(value)}
+
+        return self._batch_campsite_rows("CampsiteAttributes", session, make_row)
+
+    def make_permitted_equipment(
+        self, session: "Session"
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Batches of `PermittedEquipment` rows, like `make_campsite_attributes`."""
+        self._update_entity_checksum("PermittedEquipment", session)
+
+        def make_row(data: dict[str, str]) -> Optional[dict[str, Any]]:
+            name = data["EquipmentName"].strip()
+            if not name:
+                return None
+            # 0 is how RIDB says there's no limit given
+            return {"name": name, "max_length": parse_number(data["MaxLength"]) or None}
+
+        return self._batch_campsite_rows("PermittedEquipment", session, make_row)
+
+    def _batch_campsite_rows(
+        self,
+        entity: str,
+        session: "Session",
+        make_row: Callable[[dict[str, str]], Optional[dict[str, Any]]],
+    ) -> Iterator[list[dict[str, Any]]]:
+        campsite_ids = {
+            str(campsite_id): id
+            for campsite_id, id in session.execute(
+                select(Campsite.campsite_id, Campsite.id)
+            )
+        }
+        now = datetime.datetime.utcnow()
+        batch: list[dict[str, Any]] = []
+        for data in self._read_csv(entity):
+            if data.get("EntityType", "Campsite") != "Campsite":
+                continue
+            # the campsite is the row's "EntityID" (or "CampsiteID" in older exports)
+            entity_id = data.get("EntityID") or data.get("CampsiteID")
+            if entity_id is None:
+                continue
+            campsite_id = campsite_ids.get(entity_id)
+            row = campsite_id and make_row(data)
+            if not row:
+                continue
+            batch.append(
+                {
+                    **row,
+                    "campsite_id": campsite_id,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+            if len(batch) >= BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
     def _parse_campsite_type(self, type_str: str) -> tuple[str, bool, bool]:
         electric = False
         group_site = False
@@ -179,13 +275,20 @@ class RIDB:
     def _read_csv(self, entity: str) -> Iterator[dict[str, str]]:
         filepath = self._csv_filepath_for(entity)
         num_lines = self._get_num_records_csv(filepath)
-        with open(filepath, "r") as f:
+        # timed until the last row is consumed, so it covers loading them too
+        phase = f"load_{entity.lower()}"
+        with (
+            open(filepath, "r") as f,
+            RIDB_SECONDS.time(phase=phase),
+            span(f"ridb_{phase}"),
+        ):
             reader = csv.DictReader(f)
             with tqdm(
                 total=num_lines, unit="recs", desc=f"Loading {entity}"
             ) as progress_bar:
                 for row in reader:
                     yield row
+                    RIDB_ROWS.inc(entity=entity)
                     progress_bar.update()
 
     def _get_num_records_csv(self, filepath: str) -> int:
@@ -0,0 +1,207 @@
+import datetime
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional
+
+if TYPE_CHECKING:
+    from .models import Lottery
+
+UTC = datetime.timezone.utc
+
+# poll hard from a little before a hot moment until a while after it
+HOT_LEAD = datetime.timedelta(minutes=2)
+HOT_SPAN = datetime.timedelta(minutes=30)
+# how far back observed changes count towards a watch's change rate
+CHANGE_WINDOW = datetime.timedelta(hours=24)
+# how often warmed up connections are used while waiting for a release, so servers
+# don't close them for being idle
+KEEPALIVE: float = 20
+
+
+class RequestBudget:
+    """Token bucket shared by everything that makes requests to rec.gov.
+
+    `rate` requests per minute are allowed on average, with bursts of up to `burst`.
+    `acquire` blocks until a request is allowed, so callers never need to check.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None) -> None:
+        if rate <= 0:
+            raise ValueError("A request budget needs a positive rate")
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated) * self.rate / 60
+        )
+        self._updated = now
+
+    def try_acquire(self, n: int = 1) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= n:
+                self._tokens -= n
+                return True
+            return False
+
+    def acquire(self, n: int = 1) -> None:
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                wait = (n - self._tokens) * 60 / self.rate
+            time.sleep(wait)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+def hold_until(
+    moment: datetime.datetime,
+    keep_alive: Optional[Callable[[], Any]] = None,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """Wait until `moment` (aware), calling `keep_alive` every `KEEPALIVE` seconds
+    meanwhile, and return right on it (or as soon as `stop` is set).
+
+    The last keep-alive is at least `KEEPALIVE` seconds before, so it's out of the
+    way of whatever is waiting for the moment.
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        remaining = (moment - datetime.datetime.now(moment.tzinfo)).total_seconds()
+        if remaining <= 0:
+            return
+        if keep_alive is None or remaining <= 2 * KEEPALIVE:
+            stop.wait(remaining)
+            continue
+        if not stop.wait(KEEPALIVE):
+            keep_alive()
+
+
+def as_utc(moment: datetime.datetime) -> datetime.datetime:
+    # rec.gov timestamps come back from SQLite without a timezone, but are UTC
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=UTC)
+    return moment.astimezone(UTC)
+
+
+def lottery_moments(lottery: "Lottery") -> list[datetime.datetime]:
+    """When a lottery is likely to shake availability loose (or lock it up)."""
+    return [
+        as_utc(moment)
+        for moment in (
+            lottery.open_at,
+            lottery.close_at,
+            lottery.access_start_at,
+            lottery.access_end_at,
+        )
+        if moment is not None
+    ]
+
+
+def release_moments(
+    releases: Iterable[datetime.time | datetime.datetime | str],
+    now: datetime.datetime,
+) -> list[datetime.datetime]:
+    """Occurrences of each booking-window release around `now`.
+
+    A time (or "HH:MM" string) is a daily release in local time, e.g. campgrounds that
+    open another day of their rolling window every morning, a datetime is a one-off.
+    """
+    moments = []
+    local_today = now.astimezone().date()
+    for release in releases:
+        if isinstance(release, str):
+            release = datetime.time.fromisoformat(release)
+        if isinstance(release, datetime.datetime):
+            moments.append(as_utc(release.astimezone()))
+            continue
+        # yesterday's release can still be inside its hot span just after midnight
+        for offset in (-1, 0, 1):
+            day = local_today + datetime.timedelta(offset)
+            local = datetime.datetime.combine(day, release)
+            moments.append(as_utc(local.astimezone()))
+    return sorted(set(moments))
+
+
+class AdaptiveSchedule:
+    """Decides how long a watch waits before its next check.
+
+    Near a hot moment (lottery dates, booking-window releases) checks run every
+    `min_interval` seconds. Otherwise the wait starts at `interval`, shortens to match
+    how often changes have actually been seen, and doubles after every quiet check up
+    to `max_interval`. A wait never runs past the start of the next hot moment.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        min_interval: float,
+        max_interval: float,
+        hot_moments: Iterable[datetime.datetime] = (),
+        releases: Iterable[datetime.time | datetime.datetime | str] = (),
+        backoff: float = 2,
+    ) -> None:
+        self.interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.hot_moments = sorted(as_utc(m) for m in hot_moments)
+        self.releases = list(releases)
+        self.backoff = backoff
+        self.current = interval
+        self.changes: deque[datetime.datetime] = deque()
+
+    def _moments(self, now: datetime.datetime) -> list[datetime.datetime]:
+        return sorted(self.hot_moments + release_moments(self.releases, now))
+
+    def is_hot(self, now: datetime.datetime) -> bool:
+        return any(m - HOT_LEAD <= now <= m + HOT_SPAN for m in self._moments(now))
+
+    def next_hot_start(self, now: datetime.datetime) -> Optional[datetime.datetime]:
+        upcoming = [m - HOT_LEAD for m in self._moments(now) if m - HOT_LEAD > now]
+        return upcoming and upcoming[0] or None
+
+    def change_gap(self, now: datetime.datetime) -> Optional[float]:
+        """Average seconds between the changes seen recently (None if fewer than 2)."""
+        while self.changes and now - self.changes[0] > CHANGE_WINDOW:
+            self.changes.popleft()
+        if len(self.changes) < 2:
+            return None
+        span = (self.changes[-1] - self.changes[0]).total_seconds()
+        return span / (len(self.changes) - 1)
+
+    def next_delay(
+        self, changed: bool, now: Optional[datetime.datetime] = None
+    ) -> float:
+        """Record the outcome of a check and return the seconds until the next."""
+        now = now and as_utc(now) or datetime.datetime.now(UTC)
+        if changed:
+            self.changes.append(now)
+            self.current = self.interval
+        else:
+            self.current = min(self.max_interval, self.current * self.backoff)
+
+        if self.is_hot(now):
+            return self.min_interval
+
+        delay = self.current
+        gap = self.change_gap(now)
+        if gap is not None:
+            # check about twice per expected change
+            delay = min(delay, gap / 2)
+        delay = max(self.min_interval, delay)
+        hot_start = self.next_hot_start(now)
+        if hot_start is not None:
+            delay = min(delay, (hot_start - now).total_seconds())
+        return max(0, delay)
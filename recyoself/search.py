@@ -0,0 +1,187 @@
+import datetime
+from datetime import timedelta
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Collection,
+    Hashable,
+    Iterator,
+    Optional,
+)
+
+from .matching import DivisionMatch, iter_division_availability_date_matches
+from .metrics import MATCH_SECONDS, MATCHES, timed_iter
+from .utils.dates import months_between
+
+if TYPE_CHECKING:
+    from .cache import MatchCache
+    from .campsite_availability import ReservableBlock
+    from .division_availability import DivisionAvailability
+    from .history import HistoryRecorder
+    from .models import Division, Facility, Lottery
+    from .recreationdotgov import RecreationDotGov
+    from .snapshots import AvailabilitySnapshot
+
+DivisionMatcher = Callable[[list["DivisionAvailability"]], Iterator[DivisionMatch]]
+
+
+def month_windows(
+    start_date: datetime.date, end_date: datetime.date
+) -> list[tuple[datetime.date, datetime.date]]:
+    """Split the inclusive range into per-month (start, end) windows."""
+    windows = []
+    for year, month in months_between(start_date, end_date):
+        first = datetime.date(year, month, 1)
+        next_first = (first + timedelta(days=32)).replace(day=1)
+        windows.append(
+            (max(start_date, first), min(end_date, next_first - timedelta(1)))
+        )
+    return windows
+
+
+def matcher_key(find_matches: Callable) -> Hashable:
+    """A hashable description of a matcher (and its options) for cache keys."""
+    if isinstance(find_matches, partial):
+        keywords = tuple(
+            sorted((k, _freeze(v)) for k, v in find_matches.keywords.items())
+        )
+        return (find_matches.func.__qualname__, find_matches.args, keywords)
+    return find_matches.__qualname__
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(value))
+    return value
+
+
+def _timed_matches(
+    find_matches: DivisionMatcher, availabilities: list["DivisionAvailability"]
+) -> Iterator[DivisionMatch]:
+    func = find_matches.func if isinstance(find_matches, partial) else find_matches
+    name = func.__name__
+    matches = timed_iter(
+        find_matches(availabilities), MATCH_SECONDS, "matching", matcher=name
+    )
+    for match in matches:
+        MATCHES.inc(matcher=name)
+        yield match
+
+
+def iter_itinerary_matches(
+    rdg: "RecreationDotGov",
+    divisions: list["Division"],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    lottery: Optional["Lottery"] = None,
+    find_matches: DivisionMatcher = iter_division_availability_date_matches,
+    match_cache: Optional["MatchCache"] = None,
+    snapshot: Optional["AvailabilitySnapshot"] = None,
+    history: Optional["HistoryRecorder"] = None,
+) -> Iterator[DivisionMatch]:
+    """Yield itinerary matches by start date, fetching one month of starts at a time.
+
+    Later months are only requested once the consumer asks for more matches, so a
+    caller that stops early (e.g. `--first`) never fetches them. With a `match_cache`
+    a month whose availability digests haven't changed reuses the previous results.
+    Everything fetched is recorded into `snapshot` and `history` when given.
+    """
+    nights = len(divisions)
+    for window_start, window_end in month_windows(start_date, end_date):
+        fetch_end = min(end_date, window_end + timedelta(days=nights - 1))
+        availabilities = [
+            rdg.make_division_availabilities(window_start, fetch_end, d, lottery)
+            for d in divisions
+        ]
+        if snapshot is not None:
+            snapshot.observe_divisions(availabilities)
+        if history is not None:
+            history.observe_divisions(availabilities)
+        if match_cache is None:
+            for match in _timed_matches(find_matches, availabilities):
+                if match[0][1] <= window_end:
+                    yield match
+            continue
+
+        def compute() -> tuple:
+            # stored as (stop index, date) pairs so no ORM objects end up cached
+            index_of = {id(a): i for i, a in enumerate(availabilities)}
+            return tuple(
+                tuple((index_of[id(a)], date) for a, date in match)
+                for match in _timed_matches(find_matches, availabilities)
+                if match[0][1] <= window_end
+            )
+
+        key = (
+            "itinerary",
+            matcher_key(find_matches),
+            window_start,
+            window_end,
+            tuple(a.digest() for a in availabilities),
+        )
+        for cached_match in match_cache.get_or_compute(key, compute):
+            yield [(availabilities[i], date) for i, date in cached_match]
+
+
+def iter_campsite_blocks(
+    rdg: "RecreationDotGov",
+    campground: "Facility",
+    start_date: datetime.date,
+    end_date: datetime.date,
+    num_days: int,
+    include_nyr: bool = False,
+    match_cache: Optional["MatchCache"] = None,
+    snapshot: Optional["AvailabilitySnapshot"] = None,
+    history: Optional["HistoryRecorder"] = None,
+    campsite_ids: Optional[Collection[str]] = None,
+) -> Iterator["ReservableBlock"]:
+    """Yield reservable blocks starting between the dates, by start date, fetching
+    one month of starts at a time. With a `match_cache` only campsites whose
+    availability digest changed are searched again, and everything fetched is
+    recorded into `snapshot` and `history` when given. With `campsite_ids`, other
+    campsites are skipped (and not recorded) as soon as they're fetched."""
+    end_of_trip_date = end_date + timedelta(days=num_days)
+    for window_start, window_end in month_windows(start_date, end_date):
+        fetch_end = min(end_of_trip_date, window_end + timedelta(days=num_days))
+        blocks: list["ReservableBlock"] = []
+        for ca in rdg.make_campsite_availabilities(
+            window_start, fetch_end, campground, campsite_ids
+        ):
+            if snapshot is not None:
+                snapshot.observe_campsite(ca, include_nyr)
+            if history is not None:
+                history.observe_campsite(ca)
+
+            def compute() -> tuple["ReservableBlock", ...]:
+                blocks = tuple(
+                    block
+                    for block in timed_iter(
+                        ca.iter_reservable_blocks(num_days, include_nyr),
+                        MATCH_SECONDS,
+                        "matching",
+                        matcher="reservable_blocks",
+                    )
+                    if block.start <= window_end
+                )
+                MATCHES.inc(len(blocks), matcher="reservable_blocks")
+                return blocks
+
+            if match_cache is None:
+                blocks.extend(compute())
+                continue
+            key = (
+                # v2: blocks record which nights are NYR
+                "blocks-v2",
+                ca.campsite_id,
+                num_days,
+                include_nyr,
+                window_start,
+                window_end,
+                ca.digest(),
+            )
+            blocks.extend(match_cache.get_or_compute(key, compute))
+        yield from sorted(blocks, key=lambda b: b.start)
@@ -0,0 +1,177 @@
+import re
+from typing import Any, Optional, TypeVar
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import Select, Subquery
+
+from .models import Division, Facility, Lottery, Organization, RecreationArea
+
+S = TypeVar("S", bound=Select)
+
+TABLE = "search_index"
+
+# rows of every entity share the index, their rowid is `id * STRIDE + code`
+STRIDE = 4
+ENTITY_CODES: dict[str, int] = {"facility": 0, "lottery": 1, "division": 2}
+
+# bm25 weights: a hit in the name counts for far more than one in the extra text
+NAME_WEIGHT = 10.0
+EXTRA_WEIGHT = 1.0
+
+# entity => (table, expression for the name, expression for the extra text), where
+# {row} is the row being indexed
+_SOURCES: dict[str, tuple[str, str, str]] = {
+    "facility": (
+        Facility.__tablename__,  # type: ignore
+        "{row}.name",
+        f"coalesce((SELECT name FROM {RecreationArea.__tablename__} "
+        "WHERE id = {row}.rec_area_id), '') || ' ' || "
+        f"coalesce((SELECT name FROM {Organization.__tablename__} "
+        "WHERE id = {row}.org_id), '')",
+    ),
+    "lottery": (
+        Lottery.__tablename__,  # type: ignore
+        "{row}.name",
+        """coalesce({row}."desc", '') || ' ' || coalesce({row}.summary, '')""",
+    ),
+    "division": (
+        Division.__tablename__,  # type: ignore
+        "{row}.name",
+        "coalesce({row}.district, '')",
+    ),
+}
+
+search_table = sa.Table(
+    TABLE,
+    sa.MetaData(),
+    sa.Column("rowid", sa.Integer, primary_key=True),
+    sa.Column("name", sa.String),
+    sa.Column("extra", sa.String),
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def _index_row(entity: str, row: str) -> tuple[str, str, str]:
+    table, name, extra = _SOURCES[entity]
+    rowid = f"{row}.id * {STRIDE} + {ENTITY_CODES[entity]}"
+    return rowid, name.format(row=row), extra.format(row=row)
+
+
+def _trigger_sql(entity: str) -> list[str]:
+    table = _SOURCES[entity][0]
+    rowid, name, extra = _index_row(entity, "new")
+    old_rowid = _index_row(entity, "old")[0]
+    insert = (
+        f"INSERT INTO {TABLE} (rowid, name, extra) VALUES ({rowid}, {name}, {extra});"
+    )
+    delete = f"DELETE FROM {TABLE} WHERE rowid = {old_rowid};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_{table}_insert AFTER INSERT ON {table} "
+        f"BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_{table}_update AFTER UPDATE ON {table} "
+        f"BEGIN {delete} {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_{table}_delete AFTER DELETE ON {table} "
+        f"BEGIN {delete} END",
+    ]
+
+
+def exists(connection: Connection) -> bool:
+    return (
+        connection.execute(
+            sa.text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ),
+            {"name": TABLE},
+        ).first()
+        is not None
+    )
+
+
+def create(connection: Connection) -> bool:
+    """Create the full-text index (filled from what's already loaded) and the
+    triggers that keep it in sync, returning whether it's usable.
+
+    It is False when SQLite was built without FTS5, in which case searches fall back
+    to substring matching.
+    """
+    if exists(connection):
+        return True
+    try:
+        connection.execute(
+            sa.text(
+                f"CREATE VIRTUAL TABLE {TABLE} USING fts5(name, extra, "
+                "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+            )
+        )
+    except OperationalError as e:
+        if "fts5" in str(e.orig):
+            return False
+        raise
+    for entity, (table, _, _) in _SOURCES.items():
+        rowid, name, extra = _index_row(entity, table)
+        connection.execute(
+            sa.text(
+                f"INSERT INTO {TABLE} (rowid, name, extra) "
+                f"SELECT {rowid}, {name}, {extra} FROM {table}"
+            )
+        )
+        for sql in _trigger_sql(entity):
+            connection.execute(sa.text(sql))
+    return True
+
+
+def drop(connection: Connection) -> None:
+    for table, _, _ in _SOURCES.values():
+        for action in ("insert", "update", "delete"):
+            connection.execute(
+                sa.text(f"DROP TRIGGER IF EXISTS {TABLE}_{table}_{action}")
+            )
+    connection.execute(sa.text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+
+def optimize(connection: Connection) -> None:
+    """Merge the index's segments, e.g. after loading lots of rows."""
+    connection.execute(sa.text(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')"))
+
+
+def match_query(text: str) -> Optional[str]:
+    """An FTS5 query matching every word of `text`, the last letters of each word
+    optional (so "glac nat" finds "Glacier National Park"). None without any words.
+    """
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def has_words(text: Optional[str]) -> bool:
+    """Whether `text` can be searched for, rather than being empty or punctuation."""
+    return text is not None and match_query(text) is not None
+
+
+def ranked(entity: str, text: str) -> Subquery:
+    """The ids of `entity` rows matching `text`, with their bm25 rank (lower is
+    better)."""
+    code = ENTITY_CODES[entity]
+    fts: sa.ColumnClause[Any] = sa.literal_column(TABLE)
+    rowid = search_table.c.rowid
+    return (
+        sa.select(
+            (rowid // STRIDE).label("entity_id"),
+            sa.func.bm25(fts, NAME_WEIGHT, EXTRA_WEIGHT).label("rank"),
+        )
+        .where(fts.match(match_query(text)), rowid % STRIDE == code)
+        .subquery()
+    )
+
+
+def apply(stmt: S, model: Any, entity: str, text: str) -> S:
+    """Filter a select of `model` to rows matching `text`, best matches first (none
+    if it has no words, see `has_words`)."""
+    if match_query(text) is None:
+        return stmt.where(sa.false())
+    matches = ranked(entity, text)
+    return stmt.join(matches, model.id == matches.c.entity_id).order_by(matches.c.rank)
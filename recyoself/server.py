@@ -0,0 +1,391 @@
+import datetime
+import heapq
+import itertools
+import json
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import col, or_, select
+
+from . import geo, search_index
+from .cache import MatchCache, TTLCache
+from .db import ReadSession, ensure_location_index, ensure_search_index
+from .matching import rank_matches
+from .metrics import REGISTRY
+from .models import Campsite, Division, Facility, FacilityType, Itinerary, Lottery
+from .records import block_record, match_record
+from .recreationdotgov import RecreationDotGov
+from .scheduling import RequestBudget
+from .search import iter_campsite_blocks, iter_itinerary_matches
+from .utils.failures import print_failure
+from .watch import FETCH_TTL
+
+# facility searches kept around
+FACILITY_RESULTS = 1024
+
+# seconds loaded itineraries, campgrounds and facility searches are kept before being
+# loaded again, to pick up changes made by other commands
+MODEL_TTL: float = 300
+
+
+class NotFound(LookupError):
+    pass
+
+
+class AvailabilityServer:
+    """Answers availability queries for any number of clients from one process.
+
+    Itineraries and campgrounds are loaded from the database the first time they're
+    asked for and kept (for `MODEL_TTL` seconds), and every query shares one rec.gov
+    client. Its responses are cached for `ttl` seconds, and clients asking for the
+    same resource at the same time wait for one request, so however many there are
+    each resource is fetched about once per `ttl`. Matches are cached by the
+    availability they came from.
+    """
+
+    def __init__(
+        self, ttl: float = FETCH_TTL, budget: Optional[RequestBudget] = None
+    ) -> None:
+        self.rdg = RecreationDotGov(
+            cache=TTLCache(ttl=ttl, maxsize=4096), budget=budget
+        )
+        self.match_cache = MatchCache()
+        self._facility_results = TTLCache(ttl=MODEL_TTL, maxsize=FACILITY_RESULTS)
+        self._itineraries = TTLCache(ttl=MODEL_TTL)
+        self._campgrounds = TTLCache(ttl=MODEL_TTL)
+
+    def search_facilities(
+        self,
+        query: str = "",
+        ftypes: tuple[str, ...] = (),
+        near: Optional[tuple[float, float]] = None,
+        radius: float = 50,
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """Facilities like `list-facilities` finds them (best matches, or closest,
+        first)."""
+        ftypes = tuple(t.lower() for t in ftypes)
+        for t in ftypes:
+            if t not in FacilityType.__members__:
+                raise ValueError(f'Unknown facility type "{t}"')
+        key = (query, ftypes, near, radius)
+        results = self._facility_results.get_or_set(
+            key, lambda: self._search_facilities(query, ftypes, near, radius)
+        )
+        return results[:limit]
+
+    def _search_facilities(
+        self,
+        query: str,
+        ftypes: tuple[str, ...],
+        near: Optional[tuple[float, float]],
+        radius: float,
+    ) -> list[dict]:
+        full_text = search_index.has_words(query) and ensure_search_index()
+        rtree = near is not None and ensure_location_index()
+        with ReadSession.begin() as session:
+            stmt = select(Facility).options(
+                joinedload(Facility.rec_area), joinedload(Facility.org)  # type: ignore
+            )
+            if ftypes:
+                stmt = stmt.where(or_(Facility.type == FacilityType[t] for t in ftypes))  # type: ignore
+            if full_text:
+                stmt = search_index.apply(stmt, Facility, "facility", query)
+            elif query:
+                stmt = stmt.where(col(Facility.name).icontains(query))
+            if near is not None:
+                stmt = geo.within_box(stmt, geo.bounding_box(*near, radius), rtree)
+            elif not full_text:
+                stmt = stmt.order_by(Facility.type, Facility.name)
+            facilities = session.scalars(stmt).all()
+            distances: list[tuple[Facility, Optional[float]]] = [
+                (f, None) for f in facilities
+            ]
+            if near is not None:
+                distances = geo.nearest(facilities, *near, radius)  # type: ignore
+            return [
+                {
+                    "type": "facility",
+                    "facility_id": f.facility_id,
+                    "name": f.name,
+                    "facility_type": f.type.name,
+                    "rec_area": f.rec_area and f.rec_area.name or None,
+                    "org": f.org and f.org.name or None,
+                    "latitude": f.latitude,
+                    "longitude": f.longitude,
+                    "distance": distance,
+                }
+                for f, distance in distances
+            ]
+
+    def itinerary_matches(
+        self,
+        name: str,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        reversable: bool = False,
+        lottery_id: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """Records (as `find-itinerary-dates --format json` writes them) for the
+        itinerary's matches, by start date (in either direction, when reversable)."""
+        itinerary, divisions, lotteries = self._itineraries.get_or_set(
+            name, lambda: self._load_itinerary(name)
+        )
+        lottery = self._choose_lottery(name, lotteries, lottery_id)
+        directions = [(False, divisions)]
+        if reversable:
+            directions.append((True, divisions[::-1]))
+        # (is reversed, match) from both directions, merged by start date so that
+        # one ranking (and `limit`) covers them all
+        tagged = heapq.merge(
+            *(
+                zip(
+                    itertools.repeat(is_reversed),
+                    iter_itinerary_matches(
+                        self.rdg,
+                        ordered,
+                        start_date,
+                        end_date,
+                        lottery,
+                        match_cache=self.match_cache,
+                    ),
+                )
+                for is_reversed, ordered in directions
+            ),
+            key=lambda tm: tm[1][0][1],
+        )
+        return [
+            match_record(
+                match,
+                type="itinerary_match",
+                itinerary=itinerary.name,
+                permit_id=itinerary.permit.facility_id,
+                reversed=is_reversed,
+            )
+            for is_reversed, match in rank_matches(tagged, lambda tm: 0, 0, limit)
+        ]
+
+    def campsite_blocks(
+        self,
+        facility_id: str,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        num_days: int,
+        include_nyr: bool = False,
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """Records (as `find-campsite-dates --format json` writes them) for the
+        campground's blocks, by start date."""
+        campground, campsites = self._campgrounds.get_or_set(
+            facility_id, lambda: self._load_campground(facility_id)
+        )
+        blocks = iter_campsite_blocks(
+            self.rdg,
+            campground,
+            start_date,
+            end_date,
+            num_days,
+            include_nyr,
+            self.match_cache,
+        )
+        records: list[dict] = []
+        for block in rank_matches(blocks, lambda b: 0, 0, limit):
+            cs = campsites.get(str(block.campsite_id))
+            if cs:
+                records.append(
+                    block_record(
+                        block, campground.facility_id, campground.name, cs.name, cs.loop
+                    )
+                )
+        return records
+
+    def _load_itinerary(
+        self, name: str
+    ) -> tuple[Itinerary, list[Division], list[Lottery]]:
+        with ReadSession(expire_on_commit=False) as session:
+            stmt = (
+                select(Itinerary)
+                .options(
+                    joinedload(Itinerary.permit).selectinload(Facility.lotteries),  # type: ignore
+                    Itinerary.with_divisions(),
+                )
+                .where(Itinerary.name == name)
+            )
+            itinerary = session.scalars(stmt).first()
+            if not itinerary:
+                raise NotFound(f'No itinerary found with name "{name}"')
+            # touch everything a query needs so it stays usable without the session
+            divisions = itinerary.divisions
+            for division in divisions:
+                division.permit.facility_id
+            return itinerary, divisions, list(itinerary.permit.lotteries)
+
+    def _choose_lottery(
+        self, name: str, lotteries: list[Lottery], lottery_id: Optional[str]
+    ) -> Optional[Lottery]:
+        if lottery_id is None:
+            if len(lotteries) > 1:
+                raise ValueError(
+                    f'Itinerary "{name}" needs a lottery, one of: '
+                    + ", ".join(str(l.lottery_id) for l in lotteries)
+                )
+            return lotteries and lotteries[0] or None
+        for l in lotteries:
+            if str(l.lottery_id).lower() == lottery_id.lower():
+                return l
+        raise NotFound(f'No lottery with id "{lottery_id}" for itinerary "{name}"')
+
+    def _load_campground(
+        self, facility_id: str
+    ) -> tuple[Facility, dict[str, Campsite]]:
+        with ReadSession(expire_on_commit=False) as session:
+            stmt = (
+                select(Facility)
+                .options(selectinload(Facility.campsites))  # type: ignore
+                .where(
+                    Facility.facility_id == facility_id,
+                    Facility.type == FacilityType.campground,
+                )
+            )
+            campground = session.scalars(stmt).first()
+            if not campground:
+                raise NotFound(
+                    f"Could not find Campground (Facility) with ID {facility_id}"
+                )
+            campsites = {str(c.campsite_id): c for c in campground.campsites}
+            return campground, campsites
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """An HTTP server for the queries on http://HOST:PORT, to run with
+        `serve_forever` (see `QueryHandler` for the endpoints)."""
+        server = ThreadingHTTPServer((host, port), QueryHandler)
+        server.daemon_threads = True
+        server.queries = self  # type: ignore
+        return server
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET endpoints answering with JSON ({"results": [...]}, or {"error": "..."}):
+
+    * /facilities?q=&type=&near=LAT,LON&radius=&limit=
+    * /itineraries/NAME/matches?start=&end=&reversable=&lottery=&limit=
+    * /campgrounds/FACILITY_ID/blocks?start=&end=&num_days=&include_nyr=&limit=
+    * /metrics, in the Prometheus text format
+    """
+
+    server: ThreadingHTTPServer
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if parts == ["metrics"]:
+            self._send(HTTPStatus.OK, REGISTRY.render(), "text/plain; version=0.0.4")
+            return
+        try:
+            route = self._route(parts)
+            results = route(params)
+        except NotFound as e:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": str(e)})
+        except ValueError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except requests.RequestException as e:
+            self._send_json(HTTPStatus.BAD_GATEWAY, {"error": f"Rec.gov: {e}"})
+        except Exception:
+            print_failure(self.path)
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Query failed"})
+        else:
+            self._send_json(HTTPStatus.OK, {"results": results})
+
+    def _route(self, parts: list[str]) -> Callable[[dict[str, str]], list[dict]]:
+        queries: AvailabilityServer = self.server.queries  # type: ignore
+        match parts:
+            case ["facilities"]:
+                return lambda p: queries.search_facilities(
+                    p.get("q", ""),
+                    tuple(t for t in p.get("type", "").split(",") if t),
+                    _coordinates(p.get("near")),
+                    _number(p, "radius", float, 50),
+                    _number(p, "limit", int),
+                )
+            case ["itineraries", name, "matches"]:
+                return lambda p: queries.itinerary_matches(
+                    name,
+                    *_dates(p),
+                    _flag(p, "reversable"),
+                    p.get("lottery"),
+                    _number(p, "limit", int),
+                )
+            case ["campgrounds", facility_id, "blocks"]:
+                return lambda p: queries.campsite_blocks(
+                    facility_id,
+                    *_dates(p),
+                    _number(p, "num_days", int, 1),
+                    _flag(p, "include_nyr"),
+                    _number(p, "limit", int),
+                )
+        raise NotFound(f"No such endpoint: {self.path}")
+
+    def _send_json(self, status: HTTPStatus, body: dict) -> None:
+        self._send(status, json.dumps(body), "application/json")
+
+    def _send(self, status: HTTPStatus, body: str, content_type: str) -> None:
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def _dates(params: dict[str, str]) -> tuple[datetime.date, datetime.date]:
+    if "start" not in params:
+        raise ValueError("start is required")
+    start = _date(params["start"])
+    end = _date(params.get("end", params["start"]))
+    if end < start:
+        raise ValueError("end must not be before start")
+    return start, end
+
+
+def _date(value: str) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'"{value}" is not a date (YYYY-MM-DD)')
+
+
+def _number(params: dict[str, str], name: str, kind: type, default: Any = None) -> Any:
+    if name not in params:
+        return default
+    try:
+        value = kind(params[name])
+    except ValueError:
+        raise ValueError(f'{name} must be a number, not "{params[name]}"')
+    if value < (kind is int and 1 or 0):
+        raise ValueError(f"{name} is too small")
+    return value
+
+
+def _flag(params: dict[str, str], name: str) -> bool:
+    return params.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _coordinates(value: Optional[str]) -> Optional[tuple[float, float]]:
+    if not value:
+        return None
+    try:
+        lat, lon = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError(f'near must be LAT,LON, e.g. 48.7,-113.8, not "{value}"')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("latitude must be within ±90, longitude within ±180")
+    return lat, lon
@@ -0,0 +1,180 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from recyoself import USER_DATA_DIR
+
+if TYPE_CHECKING:
+    from .campsite_availability import CampsiteAvailability, ReservableBlock
+    from .division_availability import DivisionAvailability
+    from .matching import DivisionMatch
+
+# (entity key, date ordinal), e.g. ("division:123", 739000)
+NightKey = tuple[str, int]
+
+
+def division_key(division_id: int) -> str:
+    return f"division:{division_id}"
+
+
+def campsite_key(campsite_id: str | int) -> str:
+    return f"campsite:{campsite_id}"
+
+
+def snapshot_key(
+    scope: str,
+    kind: str,
+    target: str,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    num_days: Optional[int] = None,
+    include_nyr: bool = False,
+) -> str:
+    """Identifies the query a snapshot belongs to, e.g.
+    "watch:itinerary:NAME:START:END". Each update consumes the delta, so `scope`
+    ("cli" or "watch") keeps a manual check from swallowing the watch's alerts."""
+    key = f"{scope}:{kind}:{target}:{start_date}:{end_date}"
+    if num_days is not None:
+        key = f"{key}:{num_days}"
+    # counting not yet reservable nights as open changes what was open
+    return include_nyr and f"{key}:nyr" or key
+
+
+@dataclass
+class SnapshotDelta:
+    opened: set[NightKey] = field(default_factory=set)
+    closed: set[NightKey] = field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        return bool(self.opened or self.closed)
+
+    def is_new_match(self, match: "DivisionMatch") -> bool:
+        return any(
+            (division_key(a.division.division_id), d.toordinal()) in self.opened
+            for a, d in match
+        )
+
+    def is_new_block(self, block: "ReservableBlock") -> bool:
+        entity = campsite_key(block.campsite_id)
+        start = block.start.toordinal()
+        return any((entity, start + i) in self.opened for i in range(block.nights))
+
+
+class AvailabilitySnapshot:
+    """Which nights were open, per division/campsite, as of one check.
+
+    Only the open date ordinals are kept per entity, plus the range of dates that
+    were actually fetched, so a check that stopped early (e.g. with a limit) doesn't
+    make unfetched openings look like they vanished.
+    """
+
+    def __init__(self, openings: Optional[dict[str, set[int]]] = None) -> None:
+        self.openings: dict[str, set[int]] = openings or {}
+        self.observed: dict[str, tuple[int, int]] = {}
+
+    def observe(
+        self, entity: str, nights: Iterable[tuple[datetime.date, bool]]
+    ) -> None:
+        open_nights = self.openings.setdefault(entity, set())
+        first, last = self.observed.get(entity, (None, None))
+        for date, is_open in nights:
+            day = date.toordinal()
+            first = day if first is None else min(first, day)
+            last = day if last is None else max(last, day)
+            if is_open:
+                open_nights.add(day)
+            else:
+                open_nights.discard(day)
+        if first is not None and last is not None:
+            self.observed[entity] = (first, last)
+
+    def observe_divisions(self, availabilities: list["DivisionAvailability"]) -> None:
+        for avail in availabilities:
+            self.observe(
+                division_key(avail.division.division_id),
+                ((ai.date, ai.available) for ai in avail.availabilities),  # type: ignore
+            )
+
+    def observe_campsite(
+        self, availability: "CampsiteAvailability", include_nyr: bool = False
+    ) -> None:
+        self.observe(
+            campsite_key(availability.campsite_id),
+            (
+                (a.date, a.available or (include_nyr and a.not_yet_reservable))
+                for a in availability.availabilities
+            ),
+        )
+
+    def diff(self, previous: Optional["AvailabilitySnapshot"]) -> SnapshotDelta:
+        """Openings gained and lost (within the observed dates) since `previous`."""
+        delta = SnapshotDelta()
+        for entity, (first, last) in self.observed.items():
+            curr = self.openings.get(entity, set())
+            prev = previous and previous.openings.get(entity, set()) or set()
+            prev = {d for d in prev if first <= d <= last}
+            delta.opened.update((entity, d) for d in curr - prev)
+            delta.closed.update((entity, d) for d in prev - curr)
+        return delta
+
+    def merged_into(
+        self, previous: Optional["AvailabilitySnapshot"]
+    ) -> "AvailabilitySnapshot":
+        """This snapshot, carrying over what `previous` knew about unobserved dates."""
+        if previous is None:
+            return self
+        merged = AvailabilitySnapshot()
+        for entity in previous.openings.keys() | self.openings.keys():
+            kept = previous.openings.get(entity, set())
+            if entity in self.observed:
+                first, last = self.observed[entity]
+                kept = {d for d in kept if not first <= d <= last}
+            merged.openings[entity] = kept | self.openings.get(entity, set())
+        return merged
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {e: sorted(days) for e, days in self.openings.items() if days}
+        )
+
+    @classmethod
+    def from_json(cls, data: str) -> "AvailabilitySnapshot":
+        return cls({e: set(days) for e, days in json.loads(data).items()})
+
+
+class SnapshotStore:
+    """Last-seen snapshots persisted as one small JSON file per watch/query."""
+
+    def __init__(self, directory: str = f"{USER_DATA_DIR}/snapshots") -> None:
+        self.directory = directory
+
+    def _path_for(self, key: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", key)[:80]
+        digest = hashlib.sha1(key.encode()).hexdigest()[:10]
+        return os.path.join(self.directory, f"{slug}-{digest}.json")
+
+    def load(self, key: str) -> Optional[AvailabilitySnapshot]:
+        try:
+            with open(self._path_for(key), "r") as f:
+                return AvailabilitySnapshot.from_json(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, snapshot: AvailabilitySnapshot) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(snapshot.to_json())
+        os.replace(tmp_path, path)
+
+    def update(self, key: str, snapshot: AvailabilitySnapshot) -> SnapshotDelta:
+        """Diff `snapshot` against the last one saved for `key`, then save it."""
+        previous = self.load(key)
+        delta = snapshot.diff(previous)
+        self.save(key, snapshot.merged_into(previous))
+        return delta
@@ -0,0 +1,29 @@
+import datetime
+from functools import lru_cache
+
+
+def months_between(
+    start_date: datetime.date, end_date: datetime.date
+) -> list[tuple[int, int]]:
+    """All (year, month) pairs touched by the inclusive range, across year boundaries."""
+    months = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def parse_iso_date(value: str) -> datetime.date:
+    """Parse the date part of an ISO date/datetime string (e.g. "2024-06-01" or
+    "2024-06-01T00:00:00Z").
+
+    Rec.gov repeats the same handful of dates for every campsite/division in a
+    response, so parsed dates are cached by their "YYYY-MM-DD" prefix and shared.
+    """
+    return _parse_iso_date_prefix(value[:10])
+
+
+@lru_cache(maxsize=4096)
+def _parse_iso_date_prefix(prefix: str) -> datetime.date:
+    return datetime.date.fromisoformat(prefix)
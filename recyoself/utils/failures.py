@@ -0,0 +1,13 @@
+import datetime
+import sys
+import traceback
+
+
+def print_failure(what: str) -> None:
+    """Print that `what` failed, with the exception being handled's traceback, to
+    stderr (timestamped, for long-running processes)."""
+    print(
+        f"{datetime.datetime.now():%Y-%m-%dT%H:%M:%S} {what} failed:\n"
+        f"{traceback.format_exc()}",
+        file=sys.stderr,
+    )
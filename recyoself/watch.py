@@ -0,0 +1,518 @@
+import datetime
+import heapq
+import os
+import subprocess
+import threading
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import select
+
+from .cache import MatchCache, TTLCache
+from .db import Session, ensure_tables, retry_if_locked
+from .history import HistoryRecorder
+from .matching import DivisionMatch, rank_matches
+from .metrics import REGISTRY, WATCH_CHECK_SECONDS, WATCH_CHECKS
+from .models import AvailabilityHistory, Campsite, Facility, Itinerary
+from .recreationdotgov import RecreationDotGov
+from .scheduling import AdaptiveSchedule, RequestBudget, hold_until, lottery_moments
+from .search import iter_campsite_blocks, iter_itinerary_matches
+from .snapshots import (
+    AvailabilitySnapshot,
+    SnapshotDelta,
+    SnapshotStore,
+    snapshot_key,
+)
+from .utils.failures import print_failure
+
+if TYPE_CHECKING:
+    from .models import Lottery
+
+# availability responses are shared between watches checked within this many seconds
+FETCH_TTL: float = 30
+
+
+@dataclass
+class Watch:
+    """Something to check on an interval: an itinerary or a campground.
+
+    `interval` is the wait between checks when nothing special is going on. With
+    `adaptive` on it drops to `min_interval` around lottery dates and `releases`
+    (daily times or one-off datetimes) and backs off to `max_interval` when quiet.
+    """
+
+    kind: str
+    target: str
+    start_date: datetime.date
+    end_date: datetime.date
+    interval: int = 900
+    num_days: int = 1
+    lottery_id: Optional[str] = None
+    reversable: bool = False
+    include_nyr: bool = False
+    limit: Optional[int] = None
+    adaptive: bool = True
+    min_interval: int = 60
+    max_interval: Optional[int] = None
+    releases: list[datetime.time | datetime.datetime] = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        num_days = self.kind == "campground" and self.num_days or None
+        key = snapshot_key(
+            "watch",
+            self.kind,
+            self.target,
+            self.start_date,
+            self.end_date,
+            num_days,
+            self.kind == "campground" and self.include_nyr,
+        )
+        if self.kind == "itinerary":
+            # the lottery decides which availability is fetched, and reversing what
+            # counts as a match, so watches differing in them are kept apart
+            if self.lottery_id:
+                key = f"{key}:lottery={self.lottery_id}"
+            if self.reversable:
+                key = f"{key}:reversable"
+        return key
+
+    @property
+    def label(self) -> str:
+        if self.kind == "itinerary":
+            return f'Itinerary "{self.target}"'
+        return f"Campground {self.target} ({self.num_days} days)"
+
+
+# the tables of a watch file, and the key naming each one's itinerary/campground
+WATCH_KINDS = {"itinerary": "name", "campground": "id"}
+# what else a watch file can set, for every watch or each one
+WATCH_OPTIONS = {f.name for f in fields(Watch)} - {
+    "kind",
+    "target",
+    "start_date",
+    "end_date",
+}
+
+
+def load_watches(path: str) -> list[Watch]:
+    """Load watches from a TOML file.
+
+    Top-level keys are defaults for every watch, followed by `[[itinerary]]` tables
+    (with `name`) and `[[campground]]` tables (with `id` and `num_days`). Anything
+    wrong with one raises a `ValueError` saying which it is.
+    """
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+
+    defaults = {k: v for k, v in data.items() if k not in WATCH_KINDS}
+    watches = []
+    for kind, target_key in WATCH_KINDS.items():
+        for i, entry in enumerate(data.get(kind, []), 1):
+            options = {**defaults, **entry}
+            target = options.pop(target_key, None)
+            desc = f'[[{kind}]] "{target}"' if target else f"[[{kind}]] number {i}"
+            if target is None or "start" not in options:
+                raise ValueError(f"{desc} needs both {target_key} and start")
+            unknown = set(options) - WATCH_OPTIONS - {"start", "end"}
+            if unknown:
+                raise ValueError(
+                    f"{desc} has unknown keys: {', '.join(sorted(unknown))}"
+                )
+            start_date = _watch_date(options.pop("start"), desc, "start")
+            end_date = _watch_date(options.pop("end", start_date), desc, "end")
+            if end_date < start_date:
+                raise ValueError(f"{desc} ends before it starts")
+            options["releases"] = _watch_releases(options.get("releases", []), desc)
+            watches.append(
+                Watch(
+                    kind=kind,
+                    target=str(target),
+                    start_date=start_date,
+                    end_date=end_date,
+                    **options,
+                )
+            )
+    return watches
+
+
+def _watch_date(value: Any, desc: str, key: str) -> datetime.date:
+    """A watch's `start`/`end`, which TOML may give as a date, datetime or string."""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            pass
+    raise ValueError(f"{desc} needs {key} as a date (YYYY-MM-DD), not {value!r}")
+
+
+def _watch_releases(value: Any, desc: str) -> list[datetime.time | datetime.datetime]:
+    """A watch's `releases`: daily times and one-off datetimes, which TOML may give
+    as strings, or as one value instead of a list."""
+    # a new list either way, defaults are shared between watches but each one's
+    # releases get added to
+    values = value if isinstance(value, list) else [value]
+    releases: list[datetime.time | datetime.datetime] = []
+    for release in values:
+        if isinstance(release, str):
+            try:
+                release = datetime.time.fromisoformat(release)
+            except ValueError:
+                try:
+                    release = datetime.datetime.fromisoformat(release)
+                except ValueError:
+                    pass
+        if not isinstance(release, (datetime.time, datetime.datetime)):
+            raise ValueError(
+                f"{desc} needs releases as times (HH:MM) or datetimes "
+                f"(YYYY-MM-DDTHH:MM), not {release!r}"
+            )
+        releases.append(release)
+    return releases
+
+
+class Watcher:
+    """Runs every watch on its own interval from one long-lived process.
+
+    ORM data is resolved once up front, and the HTTP connection pool and caches stay
+    warm between checks, so each check only costs its network requests.
+    """
+
+    def __init__(
+        self,
+        watches: list[Watch],
+        workers: int = 4,
+        alert_cmd: Optional[str] = None,
+        output: Callable[[str], Any] = print,
+        snapshots: Optional[SnapshotStore] = None,
+        budget: Optional[RequestBudget] = None,
+        record_history: bool = False,
+        metrics_file: Optional[str] = None,
+    ) -> None:
+        self.watches = watches
+        # rewritten after every check, for a Prometheus textfile collector
+        self.metrics_file = metrics_file
+        # append everything each check fetches to the availability history
+        self.record_history = record_history
+        # with a store only openings that are new since the last check are reported
+        self.snapshots = snapshots
+        self.workers = workers
+        self.alert_cmd = alert_cmd
+        self.output = output
+        self.rdg = RecreationDotGov(
+            cache=TTLCache(ttl=FETCH_TTL, maxsize=4096), budget=budget
+        )
+        self.match_cache = MatchCache()
+        self._targets: dict[str, Any] = {}
+        self._schedules: dict[str, AdaptiveSchedule] = {}
+        # last snapshot per watch when they aren't persisted, and whether it changed
+        self._previous: dict[str, AvailabilitySnapshot] = {}
+        self._changed: dict[str, bool] = {}
+        self._queue: list[tuple[float, int, Watch]] = []
+        self._running: set[str] = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # SQLite takes one writer at a time
+        self._history_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._once = False
+
+    def load(self) -> None:
+        """Resolve every watch's itinerary/campground (and what checking it needs)."""
+        if self.record_history:
+            ensure_tables(AvailabilityHistory)
+        with Session(expire_on_commit=False) as session:
+            for watch in self.watches:
+                lotteries: list["Lottery"]
+                if watch.kind == "itinerary":
+                    itinerary_target = self._load_itinerary(session, watch)
+                    lottery = itinerary_target[2]
+                    lotteries = lottery and [lottery] or []
+                    self._targets[watch.key] = itinerary_target
+                else:
+                    campground_target = self._load_campground(session, watch)
+                    lotteries = campground_target[0].lotteries
+                    self._targets[watch.key] = campground_target
+                self._schedules[watch.key] = AdaptiveSchedule(
+                    interval=watch.interval,
+                    min_interval=watch.min_interval,
+                    max_interval=watch.max_interval or watch.interval * 4,
+                    hot_moments=[m for l in lotteries for m in lottery_moments(l)],
+                    releases=watch.releases,
+                )
+
+    def warm_up(self, connections: Optional[int] = None) -> int:
+        """Open a pooled connection to rec.gov for each worker (or `connections`),
+        returning how many answered."""
+        return self.rdg.warm_up(connections or self.workers)
+
+    def hold_until(
+        self,
+        moment: datetime.datetime,
+        keep_alive: bool = True,
+        connections: Optional[int] = None,
+    ) -> None:
+        """Wait until `moment` (aware), keeping warmed up connections alive (see
+        `scheduling.hold_until`), or until stopped."""
+        hold_until(
+            moment,
+            (lambda: self.warm_up(connections)) if keep_alive else None,
+            self._stop,
+        )
+
+    def _load_itinerary(
+        self, session, watch: Watch
+    ) -> tuple[Itinerary, list, Optional["Lottery"]]:
+        stmt = (
+            select(Itinerary)
+            .options(
+                joinedload(Itinerary.permit).selectinload(Facility.lotteries),  # type: ignore
+                Itinerary.with_divisions(),
+            )
+            .where(Itinerary.name == watch.target)
+        )
+        itinerary = session.scalars(stmt).first()
+        if not itinerary:
+            raise ValueError(f'No itinerary found with name "{watch.target}"')
+        # touch everything a check needs so it stays usable without the session
+        divisions = itinerary.divisions
+        for division in divisions:
+            division.permit.facility_id
+        lotteries = itinerary.permit.lotteries
+        lottery = None
+        if len(lotteries) == 1:
+            lottery = lotteries[0]
+        elif len(lotteries) > 1:
+            wanted = (watch.lottery_id or "").lower()
+            lottery = next(
+                (l for l in lotteries if str(l.lottery_id).lower() == wanted), None
+            )
+            if lottery is None:
+                raise ValueError(
+                    f'Itinerary "{watch.target}" needs a lottery_id, one of: '
+                    + ", ".join(str(l.lottery_id) for l in lotteries)
+                )
+        return itinerary, divisions, lottery
+
+    def _load_campground(
+        self, session, watch: Watch
+    ) -> tuple[Facility, dict[str, Campsite]]:
+        stmt = (
+            select(Facility)
+            .options(selectinload(Facility.campsites))  # type: ignore
+            .where(Facility.facility_id == watch.target)
+        )
+        campground = session.scalars(stmt).first()
+        if not campground:
+            raise ValueError(
+                f"Could not find Campground (Facility) with ID {watch.target}"
+            )
+        campsites = {str(c.campsite_id): c for c in campground.campsites}
+        return campground, campsites
+
+    def check(self, watch: Watch) -> str:
+        """Run one check and return its results as text (empty if nothing found)."""
+        history = self.record_history and HistoryRecorder() or None
+        if watch.kind == "itinerary":
+            results = self._check_itinerary(watch, history)
+        else:
+            results = self._check_campground(watch, history)
+        if history is not None:
+            with self._history_lock:
+                retry_if_locked(lambda: self._flush_history(history))
+        return results
+
+    def _flush_history(self, history: HistoryRecorder) -> None:
+        with Session.begin() as session:
+            history.flush(session)
+
+    def _check_itinerary(
+        self, watch: Watch, history: Optional[HistoryRecorder] = None
+    ) -> str:
+        itinerary, divisions, lottery = self._targets[watch.key]
+        snapshot = AvailabilitySnapshot()
+        orders = [("", divisions)]
+        if watch.reversable:
+            orders.append(("reversed-itinerary ", divisions[::-1]))
+        # only new openings are reported, and which are new isn't known until every
+        # date has been fetched, so the limit has to wait until they're filtered
+        limit = self.snapshots is None and watch.limit or None
+        found: list[tuple[str, list[DivisionMatch]]] = []
+        for desc, ordered_divisions in orders:
+            ranked = rank_matches(
+                iter_itinerary_matches(
+                    self.rdg,
+                    ordered_divisions,
+                    watch.start_date,
+                    watch.end_date,
+                    lottery,
+                    match_cache=self.match_cache,
+                    snapshot=snapshot,
+                    history=history,
+                ),
+                lambda m: 0,
+                0,
+                limit,
+            )
+            found.append((desc, list(ranked)))
+
+        delta = self._diff(watch, snapshot)
+        lines = []
+        for desc, matches in found:
+            if self.snapshots is not None:
+                new_matches = [m for m in matches if delta.is_new_match(m)]
+                matches = new_matches[: watch.limit]
+            if not matches:
+                continue
+            lines.append(f"{len(matches)} {self._new()}{desc}date matches found:")
+            for match in matches:
+                lines.append(f"{match[0][1]:%a, %b %-d} - {match[-1][1]:%a, %b %-d}")
+                lines.extend(f"{d:%-m/%-d/%y}: {a.division.name}" for a, d in match)
+        return self._with_delta_summary(lines, delta)
+
+    def _check_campground(
+        self, watch: Watch, history: Optional[HistoryRecorder] = None
+    ) -> str:
+        campground, campsites = self._targets[watch.key]
+        snapshot = AvailabilitySnapshot()
+        # like itineraries, new blocks are only known once everything's been fetched
+        limit = self.snapshots is None and watch.limit or None
+        blocks = list(
+            rank_matches(
+                iter_campsite_blocks(
+                    self.rdg,
+                    campground,
+                    watch.start_date,
+                    watch.end_date,
+                    watch.num_days,
+                    watch.include_nyr,
+                    self.match_cache,
+                    snapshot,
+                    history,
+                ),
+                lambda b: 0,
+                0,
+                limit,
+            )
+        )
+        delta = self._diff(watch, snapshot)
+        if self.snapshots is not None:
+            blocks = [b for b in blocks if delta.is_new_block(b)][: watch.limit]
+
+        lines = []
+        for block in blocks:
+            cs = campsites.get(str(block.campsite_id))
+            site = cs and f"Site {cs.name} ({cs.loop})" or f"Site {block.campsite_id}"
+            nyr = not block.available and " (NYR)" or ""
+            lines.append(f"{site}: {block.start:%a, %b %-d}{nyr}")
+        if lines:
+            lines.insert(
+                0, f"{campground.name}: {len(lines)} {self._new()}blocks found:"
+            )
+        return self._with_delta_summary(lines, delta)
+
+    def _diff(self, watch: Watch, snapshot: AvailabilitySnapshot) -> SnapshotDelta:
+        if self.snapshots is not None:
+            delta = self.snapshots.update(watch.key, snapshot)
+        else:
+            # nothing is persisted, but the schedule still wants to know about changes
+            previous = self._previous.get(watch.key)
+            delta = snapshot.diff(previous)
+            self._previous[watch.key] = snapshot.merged_into(previous)
+        self._changed[watch.key] = bool(delta)
+        return delta
+
+    def _new(self) -> str:
+        return self.snapshots is not None and "new " or ""
+
+    def _with_delta_summary(self, lines: list[str], delta: SnapshotDelta) -> str:
+        if lines and self.snapshots is not None:
+            lines.append(
+                f"({len(delta.opened)} nights opened, {len(delta.closed)} closed "
+                "since the last check)"
+            )
+        return "\n".join(lines)
+
+    def run(self, once: bool = False) -> None:
+        """Check every watch until stopped (or each once).
+
+        A watch is only scheduled again once its check has finished, so a slow check
+        never piles up behind itself, and its next check time can depend on what the
+        check found.
+        """
+        self._once = once
+        with self._lock:
+            self._queue = [(time.monotonic(), i, w) for i, w in enumerate(self.watches)]
+            heapq.heapify(self._queue)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while not self._stop.is_set():
+                with self._wakeup:
+                    if not self._queue:
+                        if not self._running:
+                            break
+                        self._wakeup.wait()
+                        continue
+                    due, i, watch = self._queue[0]
+                    wait = due - time.monotonic()
+                    if wait > 0:
+                        self._wakeup.wait(wait)
+                        continue
+                    heapq.heappop(self._queue)
+                    self._running.add(watch.key)
+                pool.submit(self._run_check, watch, i)
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def next_delay(self, watch: Watch) -> float:
+        """Seconds until `watch` should be checked again, given its last check."""
+        schedule = self._schedules.get(watch.key)
+        if not watch.adaptive or schedule is None:
+            return watch.interval
+        return schedule.next_delay(self._changed.pop(watch.key, False))
+
+    def _run_check(self, watch: Watch, order: int) -> None:
+        results = ""
+        result = "error"
+        started = time.perf_counter()
+        try:
+            results = self.check(watch)
+            result = "ok"
+        except Exception:
+            print_failure(watch.label)
+        finally:
+            WATCH_CHECK_SECONDS.observe(time.perf_counter() - started, kind=watch.kind)
+            WATCH_CHECKS.inc(kind=watch.kind, result=result)
+            if self.metrics_file:
+                REGISTRY.write_textfile(self.metrics_file)
+            with self._wakeup:
+                self._running.discard(watch.key)
+                if not self._once and not self._stop.is_set():
+                    due = time.monotonic() + self.next_delay(watch)
+                    heapq.heappush(self._queue, (due, order, watch))
+                self._wakeup.notify_all()
+        if results:
+            self.report(watch, results)
+
+    def report(self, watch: Watch, results: str) -> None:
+        text = f"{datetime.datetime.now():%Y-%m-%dT%H:%M:%S} {watch.label}\n{results}"
+        with self._lock:
+            self.output(text)
+        if self.alert_cmd:
+            subprocess.run(
+                self.alert_cmd,
+                shell=True,
+                input=text,
+                text=True,
+                env={**os.environ, "RECYOSELF_WATCH_NAME": watch.label},
+            )
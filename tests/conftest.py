@@ -0,0 +1,155 @@
+import datetime
+import re
+
+import pytest
+
+from recyoself import db
+from recyoself.models import (
+    Campsite,
+    Division,
+    Facility,
+    FacilityType,
+    Itinerary,
+    Lottery,
+    Organization,
+    RecreationArea,
+)
+from recyoself.recreationdotgov import RecreationDotGov
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Points the engines and sessions at a fresh database file under `tmp_path`."""
+    path = tmp_path / "database.db"
+    monkeypatch.setattr(db, "DATABASE_URL", f"sqlite:///{path}")
+    monkeypatch.setattr(db, "_engines", {})
+    monkeypatch.setattr(db, "_schema_checked", False)
+    monkeypatch.setitem(db.Session.kw, "bind", None)
+    monkeypatch.setitem(db.ReadSession.kw, "bind", None)
+    yield path
+    for engine in db._engines.values():
+        engine.dispose()
+
+
+@pytest.fixture
+def seeded(database):
+    """A permit with three itineraries over six divisions ("Camp 0".."Camp 5"), and
+    a campground (facility "2001") with five campsites and a lottery."""
+    db.init_db()
+    with db.Session.begin() as session:
+        org = Organization(name="National Park Service", abbr="NPS", org_id=1)
+        park = RecreationArea(name="Glacier", rec_area_id="10", org=org)
+        permit = Facility(
+            name="Glacier Wilderness Permits",
+            facility_id="4675321",
+            type=FacilityType.permit,
+            org=org,
+            rec_area=park,
+        )
+        campground = Facility(
+            name="Apgar Campground",
+            facility_id="2001",
+            type=FacilityType.campground,
+            org=org,
+            rec_area=park,
+            latitude=48.53,
+            longitude=-113.99,
+        )
+        divisions = [
+            Division(
+                name=f"Camp {i}",
+                type="Camp",
+                division_id=100 + i,
+                district="Lake McDonald",
+                is_hidden=False,
+                is_active=True,
+                permit=permit,
+            )
+            for i in range(6)
+        ]
+        for j, name in enumerate(["loop", "north", "south"]):
+            itinerary = Itinerary(name=name, permit=permit)
+            for division in divisions[j : j + 3]:
+                itinerary.add_division(division)
+            session.add(itinerary)
+        for i in range(1, 6):
+            session.add(
+                Campsite(
+                    name=f"{i:03}",
+                    loop="A",
+                    campsite_id=i,
+                    type="STANDARD",
+                    electric=False,
+                    group_site=False,
+                    use="Overnight",
+                    facility=campground,
+                )
+            )
+        moment = datetime.datetime(2024, 1, 1)
+        session.add(
+            Lottery(
+                lottery_id="abc",
+                name="Apgar Summer Lottery",
+                desc="Campsites for the summer",
+                summary="",
+                status="LotteryStatusActive",
+                type="permit",
+                facility=campground,
+                display_at=moment,
+                open_at=moment,
+                close_at=moment,
+                scheduled_run_at=moment,
+                ran_at=moment,
+                announced_at=moment,
+                access_start_at=moment,
+                access_end_at=moment,
+            )
+        )
+    return database
+
+
+def division_is_open(division_id: int, date: datetime.date) -> bool:
+    return (date.toordinal() * 7 + division_id * 3) % 5 != 0
+
+
+def campsite_is_open(campsite_id: int, date: datetime.date) -> bool:
+    return (date.toordinal() + campsite_id) % 2 == 0
+
+
+@pytest.fixture
+def fake_recgov(monkeypatch):
+    """Answers rec.gov requests from `division_is_open`/`campsite_is_open`, and
+    counts them by endpoint."""
+    calls: dict[str, int] = {}
+
+    def fetch(self, endpoint: str, params=None) -> dict:
+        calls[endpoint] = calls.get(endpoint, 0) + 1
+        division = re.search(r"/division/(\d+)/", endpoint)
+        if division:
+            day = datetime.date(params["year"], params["month"], 1)
+            nights = {}
+            while day.month == params["month"]:
+                remaining = division_is_open(int(division[1]), day) and 2 or 0
+                nights[day.isoformat()] = {
+                    "total": 2,
+                    "remaining": remaining,
+                    "show_walkup": False,
+                }
+                day += datetime.timedelta(1)
+            return {"payload": {"quota_type_maps": {"ConstantQuotaUsageDaily": nights}}}
+        if "campground" in endpoint:
+            first = datetime.date.fromisoformat(params["start_date"][:10])
+            campsites = {}
+            for campsite_id in range(1, 6):
+                nights = {}
+                day = first
+                while day.month == first.month:
+                    status = campsite_is_open(campsite_id, day) and "Available"
+                    nights[f"{day}T00:00:00Z"] = status or "Reserved"
+                    day += datetime.timedelta(1)
+                campsites[str(campsite_id)] = {"availabilities": nights}
+            return {"campsites": campsites}
+        raise AssertionError(f"unexpected request to {endpoint}")
+
+    monkeypatch.setattr(RecreationDotGov, "_fetch", fetch)
+    return calls
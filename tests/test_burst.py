@@ -0,0 +1,156 @@
+import datetime
+import threading
+from types import SimpleNamespace
+from typing import Any, Iterable
+
+import requests
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+
+from recyoself import db
+from recyoself.burst import (
+    BurstPlan,
+    CampgroundPlan,
+    PlannedRequest,
+    Window,
+    percentiles,
+    run_burst,
+)
+from recyoself.models import Facility
+from recyoself.recreationdotgov import RecreationDotGov
+
+from .conftest import campsite_is_open
+
+START = datetime.date(2024, 7, 1)
+
+
+def request(name: str) -> PlannedRequest:
+    return PlannedRequest.of(f"/{name}", {"month": 7})
+
+
+class OpenPlan(BurstPlan):
+    """Matches every key listed as open by the responses of a window."""
+
+    def __init__(self, label: str, *windows: list[PlannedRequest]) -> None:
+        super().__init__()
+        self.label = label
+        self.windows = [Window(START, START, START, [rs]) for rs in windows]
+
+    def parse(self, response: dict) -> dict:
+        return response
+
+    def search(self, window: Window) -> Iterable[tuple[Any, Any]]:
+        for r in window.requests[0]:
+            for key in self._responses[r]["open"]:
+                yield key, key
+
+
+def test_percentiles_are_nearest_rank():
+    values = [float(v) for v in range(100, 0, -1)]
+    assert percentiles(values, (50, 90, 99, 100)) == {
+        50: 50,
+        90: 90,
+        99: 99,
+        100: 100,
+    }
+    assert percentiles([3.0], (50, 99)) == {50: 3.0, 99: 3.0}
+    assert percentiles([], (50,)) == {}
+
+
+def test_observe_searches_a_window_once_all_its_responses_are_in():
+    a, b, c = request("a"), request("b"), request("c")
+    plan = OpenPlan("plan", [a, b], [b, c])
+    assert plan.requests == [a, b, c]
+
+    assert plan.observe(a, {"open": ["x"]}) == []
+    assert plan.observe(b, {"open": ["y"]}) == ["x", "y"]
+    # unchanged responses aren't searched again
+    assert plan.observe(b, {"open": ["y"]}) == []
+    # only matches that weren't reported before
+    assert plan.observe(c, {"open": ["x", "z"]}) == ["z"]
+    assert plan.observe(a, {"open": ["w"]}) == ["w"]
+
+
+def test_shared_requests_are_made_once_per_round():
+    a, shared = request("a"), request("shared")
+    calls: dict[str, int] = {}
+
+    def fetch(endpoint: str, params: dict) -> dict:
+        calls[endpoint] = calls.get(endpoint, 0) + 1
+        return {"open": [endpoint]}
+
+    found = []
+    stats = run_burst(
+        SimpleNamespace(_fetch=fetch),  # type: ignore
+        [OpenPlan("first", [a, shared]), OpenPlan("second", [shared])],
+        duration=0.2,
+        interval=10,
+        on_found=lambda plan, match, seconds: found.append((plan.label, match)),
+    )
+    assert calls == {"/a": 1, "/shared": 1}
+    assert sorted(found) == [
+        ("first", "/a"),
+        ("first", "/shared"),
+        ("second", "/shared"),
+    ]
+    assert (stats.requests, stats.errors, stats.found) == (2, 0, 3)
+    assert stats.first_found is not None
+
+
+def test_failed_requests_are_counted_and_made_again():
+    a = request("a")
+    calls = []
+    lock = threading.Lock()
+
+    def fetch(endpoint: str, params: dict) -> dict:
+        with lock:
+            calls.append(endpoint)
+            if len(calls) == 1:
+                raise requests.ConnectionError("reset")
+            return {"open": [f"night {len(calls)}"]}
+
+    stats = run_burst(
+        SimpleNamespace(_fetch=fetch),  # type: ignore
+        [OpenPlan("plan", [a])],
+        duration=10,
+        interval=0.01,
+        limit=2,
+    )
+    assert stats.errors == 1
+    assert stats.found == 2
+    # ended once the plan had its matches, not after the full duration
+    assert stats.elapsed < 5
+    assert len(stats.latencies) == len(calls) - 1
+
+
+def test_campground_plan_finds_open_campsites(seeded, fake_recgov):
+    with db.ReadSession.begin() as session:
+        campground = session.scalars(
+            select(Facility)
+            .where(Facility.facility_id == "2001")
+            .options(selectinload(Facility.campsites))  # type: ignore
+        ).one()
+        plan = CampgroundPlan(
+            campground,
+            START,
+            START + datetime.timedelta(days=4),
+            num_days=1,
+            campsite_ids=["1", "2"],
+        )
+
+    found = []
+    stats = run_burst(
+        RecreationDotGov(),
+        [plan],
+        duration=0.2,
+        interval=10,
+        on_found=lambda plan, block, seconds: found.append(block),
+    )
+    assert stats.found == len(found)
+    assert {(b.campsite_id, b.start) for b in found} == {
+        (str(campsite_id), START + datetime.timedelta(days=n))
+        for campsite_id in (1, 2)
+        for n in range(5)
+        if campsite_is_open(campsite_id, START + datetime.timedelta(days=n))
+    }
+    assert plan.sites["2"] == ("002", "A")
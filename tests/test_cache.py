@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from recyoself import cache
+from recyoself.cache import MatchCache, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Makes the cache see `clock.now` as the time."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_concurrent_callers_share_one_factory_call():
+    ttl_cache = TTLCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def factory() -> str:
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "response"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(ttl_cache.get_or_set, "key", factory) for _ in range(8)]
+        assert started.wait(5)
+        release.set()
+        results = [f.result(5) for f in futures]
+
+    assert results == ["response"] * 8
+    assert len(calls) == 1
+    assert ttl_cache.get_or_set("key", lambda: "other") == "response"
+
+
+def test_concurrent_callers_share_the_factory_exception():
+    ttl_cache = TTLCache()
+    started, release = threading.Event(), threading.Event()
+
+    def factory() -> str:
+        started.set()
+        release.wait(5)
+        raise ValueError("rec.gov is down")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(ttl_cache.get_or_set, "key", factory) for _ in range(4)]
+        assert started.wait(5)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="rec.gov is down"):
+                future.result(5)
+
+    # nothing is cached, so the next caller tries again
+    assert "key" not in ttl_cache._pending
+    assert ttl_cache.get_or_set("key", lambda: "response") == "response"
+
+
+def test_entries_expire_after_the_ttl(clock):
+    ttl_cache = TTLCache(ttl=60)
+    ttl_cache.set("key", "value")
+    clock.now += 60
+    assert ttl_cache.get("key") == "value"
+    clock.now += 1
+    assert ttl_cache.get("key", "gone") == "gone"
+    assert len(ttl_cache) == 0
+    assert ttl_cache.get_or_set("key", lambda: "fresh") == "fresh"
+
+
+def test_maxsize_evicts_the_least_recently_used():
+    ttl_cache = TTLCache(maxsize=2)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    assert ttl_cache.get("a") == 1
+    ttl_cache.set("c", 3)
+    assert (ttl_cache.get("a"), ttl_cache.get("b"), ttl_cache.get("c")) == (1, None, 3)
+
+
+def test_match_cache_round_trips_bounded(tmp_path):
+    path = str(tmp_path / "matches.pickle")
+    match_cache = MatchCache(maxsize=3)
+    for i in range(3):
+        match_cache.get_or_compute(i, lambda: [i])
+    assert match_cache.get_or_compute(0, lambda: "recomputed") == [0]
+    assert (match_cache.hits, match_cache.misses) == (1, 3)
+    match_cache.save(path)
+
+    loaded = MatchCache.load(path, maxsize=2)
+    # the least recently used entry is dropped to fit
+    assert list(loaded._results) == [2, 0]
+    assert MatchCache.load(str(tmp_path / "missing.pickle"))._results == {}
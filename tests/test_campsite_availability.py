@@ -0,0 +1,25 @@
+import datetime
+
+from recyoself.campsite_availability import CampsiteAvailability, CampsiteStatus
+
+NIGHT = datetime.date(2024, 7, 1)
+
+
+def test_known_statuses_map_to_codes():
+    availability = CampsiteAvailability("1")
+    availability.add_availability(NIGHT, "NYR")
+    (info,) = availability.availabilities
+    assert info.status is CampsiteStatus.not_yet_reservable
+    assert info.availability == "NYR"
+    assert info.raw is None
+
+
+def test_unknown_statuses_keep_what_recgov_returned():
+    availability = CampsiteAvailability("1")
+    availability.add_availability(NIGHT, "Open Soon")
+    availability.add_availability(NIGHT + datetime.timedelta(1), CampsiteStatus.unknown)
+    soon, unknown = availability.availabilities
+    assert soon.status is CampsiteStatus.unknown
+    assert soon.availability == "Open Soon"
+    assert unknown.availability == "Unknown"
+    assert not soon.available
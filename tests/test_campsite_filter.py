@@ -0,0 +1,112 @@
+import pytest
+from sqlmodel import select
+
+from recyoself import db
+from recyoself.campsite_filter import CampsiteFilter
+from recyoself.models import (
+    Campsite,
+    CampsiteAttribute,
+    Facility,
+    FacilityType,
+    Organization,
+    PermittedEquipment,
+)
+
+SITES = {
+    # campsite_id: ({attribute: value}, {equipment: max length})
+    1: (
+        {"Max Vehicle Length": "30", "Driveway Entry": "Pull-Through"},
+        {"Trailer": 25},
+    ),
+    2: ({}, {"Trailer": 40, "RV": 20}),
+    3: ({"Driveway Entry": "Back-In"}, {"Tent": None}),
+    4: ({}, {}),
+}
+
+
+@pytest.fixture
+def campgrounds(database):
+    db.init_db()
+    with db.Session.begin() as session:
+        org = Organization(name="NPS", abbr="NPS", org_id=1)
+        empty = Facility(
+            name="Empty", facility_id="2", type=FacilityType.campground, org=org
+        )
+        campground = Facility(
+            name="Camp", facility_id="1", type=FacilityType.campground, org=org
+        )
+        session.add(empty)
+        for campsite_id, (attributes, equipment) in SITES.items():
+            campsite = Campsite(
+                name=f"{campsite_id:03}",
+                campsite_id=campsite_id,
+                type="STANDARD",
+                electric=False,
+                group_site=False,
+                use="Overnight",
+                facility=campground,
+            )
+            campsite.attributes = [
+                CampsiteAttribute(
+                    name=name,
+                    value=value,
+                    number=value.isdigit() and float(value) or None,
+                )
+                for name, value in attributes.items()
+            ]
+            campsite.equipment = [
+                PermittedEquipment(name=name, max_length=length)
+                for name, length in equipment.items()
+            ]
+            session.add(campsite)
+    with db.ReadSession.begin() as session:
+        yield session, session.scalars(select(Facility)).all()
+
+
+def fitting(session, campsite_filter: CampsiteFilter) -> set[int]:
+    stmt = campsite_filter.apply(select(Campsite.campsite_id))
+    return set(session.scalars(stmt))
+
+
+@pytest.mark.parametrize(
+    "campsite_filter,expected",
+    [
+        (CampsiteFilter(), {1, 2, 3, 4}),
+        (CampsiteFilter(min_vehicle_length=28), {1, 2}),
+        (CampsiteFilter(min_vehicle_length=35), {2}),
+        (CampsiteFilter(min_vehicle_length=50), set()),
+        (CampsiteFilter(equipment=("TRAILER",)), {1, 2}),
+        (CampsiteFilter(equipment=("tent", "rv")), {2, 3}),
+        # the length has to come from the equipment asked for
+        (CampsiteFilter(min_vehicle_length=28, equipment=("rv",)), set()),
+        (CampsiteFilter(min_vehicle_length=15, equipment=("rv",)), {2}),
+        (CampsiteFilter(attributes=(("driveway entry", "pull-through"),)), {1}),
+        (
+            CampsiteFilter(
+                min_vehicle_length=20,
+                attributes=(("Driveway Entry", "Back-In"),),
+            ),
+            set(),
+        ),
+    ],
+)
+def test_conditions(campgrounds, campsite_filter, expected):
+    session, _ = campgrounds
+    assert fitting(session, campsite_filter) == expected
+
+
+def test_campsite_ids_by_campground_leaves_out_empty_campgrounds(campgrounds):
+    session, facilities = campgrounds
+    by_id = {f.facility_id: f for f in facilities}
+    found = CampsiteFilter(equipment=("trailer",)).campsite_ids_by_campground(
+        session, facilities
+    )
+    assert found == {by_id["1"].id: {"1", "2"}}
+
+
+def test_key_ignores_order_and_case():
+    first = CampsiteFilter(28, ("RV", "trailer"), (("A", "x"), ("b", "Y")))
+    second = CampsiteFilter(28, ("Trailer", "rv"), (("b", "y"), ("a", "X")))
+    assert first.key() == second.key()
+    assert first.key() != CampsiteFilter(30, ("RV", "trailer")).key()
+    assert not CampsiteFilter()
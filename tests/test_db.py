@@ -0,0 +1,56 @@
+import sqlite3
+
+from click.testing import CliRunner
+from sqlmodel import select
+
+from recyoself import db
+from recyoself.cli import cli
+from recyoself.models import Facility
+
+
+def test_help_does_not_open_the_database(database):
+    result = CliRunner().invoke(cli, ["make-launchd-configs", "--help"])
+    assert result.exit_code == 0, result.output
+    assert not database.exists()
+    assert not db._engines
+
+
+def test_init_marks_the_database_current(database):
+    db.init_db()
+    with sqlite3.connect(database) as connection:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+    assert version == db.SCHEMA_VERSION
+
+
+def test_older_database_is_upgraded_on_first_connect(database):
+    db.init_db()
+    with sqlite3.connect(database) as connection:
+        connection.execute("ALTER TABLE recreationarea DROP COLUMN latitude")
+        connection.execute("DROP INDEX ix_campsite_campsite_id")
+        connection.execute("PRAGMA user_version = 0")
+    db._engines.clear()
+    db._schema_checked = False
+    db.ReadSession.kw["bind"] = None
+
+    with db.ReadSession.begin() as session:
+        session.scalars(select(Facility)).all()
+
+    with sqlite3.connect(database) as connection:
+        columns = {
+            row[1] for row in connection.execute("PRAGMA table_info(recreationarea)")
+        }
+        indexes = {row[1] for row in connection.execute("PRAGMA index_list(campsite)")}
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+    assert "latitude" in columns
+    assert "ix_campsite_campsite_id" in indexes
+    assert version == db.SCHEMA_VERSION
+
+
+def test_uninitialized_database_is_left_for_init(database):
+    with db.ReadSession.begin() as session:
+        session.connection()
+    with sqlite3.connect(database) as connection:
+        tables = connection.execute("SELECT name FROM sqlite_master").fetchall()
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+    assert tables == []
+    assert version == 0
@@ -0,0 +1,67 @@
+from prompt_toolkit.document import Document
+
+from recyoself.division_index import DivisionIndex, division_index, normalize
+from recyoself.models import Division
+
+NAMES = [
+    "Lake Isabel",
+    "Isabel Pass",
+    "Upper Isabel",
+    "Bowman Lake",
+    "Bowman Lake Head",
+    "Lake Ľuna's Camp",
+    "Kintla Lake",
+]
+
+
+def make_index() -> DivisionIndex:
+    return DivisionIndex((name, "Camp, North Fork") for name in NAMES)
+
+
+def test_normalize_drops_case_accents_and_punctuation():
+    assert normalize("Lake Ľuna's Camp") == "lake luna s camp"
+
+
+def test_exact_then_word_prefixes_then_substrings():
+    index = make_index()
+    assert index.lookup("bowman lake") == ["Bowman Lake", "Bowman Lake Head"]
+    # names starting with what was typed, then shorter names, come first
+    assert index.lookup("isa") == ["Isabel Pass", "Lake Isabel", "Upper Isabel"]
+    # equally long names are alphabetical
+    assert index.lookup("sabel") == ["Isabel Pass", "Lake Isabel", "Upper Isabel"]
+    assert index.lookup("luna") == ["Lake Ľuna's Camp"]
+
+
+def test_short_queries_match_substrings():
+    index = make_index()
+    assert index.lookup("ab") == ["Isabel Pass", "Lake Isabel", "Upper Isabel"]
+    assert index.lookup("ab", limit=1) == ["Isabel Pass"]
+    assert index.lookup("  '") == []
+
+
+def test_suggestions_catch_misspellings():
+    index = make_index()
+    assert index.lookup("kintle lake") == []
+    assert index.suggestions("kintle lake")[0] == "Kintla Lake"
+    assert index.suggestions("zzz") == []
+
+
+def complete(completer, text: str) -> list[str]:
+    return [c.text for c in completer.get_completions(Document(text), None)]
+
+
+def test_completer_offers_commands_then_matches():
+    completer = make_index().completer({"done": "finish the itinerary"})
+    assert complete(completer, "d") == ["done", "Bowman Lake Head"]
+    assert complete(completer, "bowman") == ["Bowman Lake", "Bowman Lake Head"]
+    assert complete(completer, "")[:2] == ["done", "Lake Isabel"]
+    assert complete(make_index().completer(), "d") == ["Bowman Lake Head"]
+
+
+def test_division_index_is_rebuilt_only_when_divisions_change():
+    divisions = [
+        Division(name=name, type="Camp", district="North Fork") for name in NAMES
+    ]
+    first = division_index("permit", divisions)
+    assert division_index("permit", divisions) is first
+    assert division_index("permit", divisions[:3]) is not first
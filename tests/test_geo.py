@@ -0,0 +1,99 @@
+import math
+import random
+
+import pytest
+from sqlmodel import select
+
+from recyoself import db, geo
+from recyoself.models import Facility, FacilityType, Organization
+
+
+def destination(lat: float, lon: float, miles: float, bearing: float):
+    """The point `miles` away from (lat, lon) heading `bearing` degrees."""
+    angle = miles / geo.EARTH_RADIUS_MILES
+    lat1, lon1, theta = map(math.radians, (lat, lon, bearing))
+    lat2 = math.asin(
+        math.sin(lat1) * math.cos(angle)
+        + math.cos(lat1) * math.sin(angle) * math.cos(theta)
+    )
+    lon2 = lon1 + math.atan2(
+        math.sin(theta) * math.sin(angle) * math.cos(lat1),
+        math.cos(angle) - math.sin(lat1) * math.sin(lat2),
+    )
+    lon2 = (math.degrees(lon2) + 540) % 360 - 180
+    return math.degrees(lat2), lon2
+
+
+def in_box(box: geo.BoundingBox, lat: float, lon: float) -> bool:
+    min_lat, max_lat, lon_ranges = box
+    return min_lat <= lat <= max_lat and any(lo <= lon <= hi for lo, hi in lon_ranges)
+
+
+@pytest.mark.parametrize(
+    "lat,lon", [(48.7, -113.8), (0, 179.9), (-12, -179.95), (89.5, 20), (-70, 60)]
+)
+@pytest.mark.parametrize("radius", [1, 50, 500])
+def test_bounding_box_holds_every_point_in_range(lat, lon, radius):
+    box = geo.bounding_box(lat, lon, radius)
+    rng = random.Random(radius)
+    for _ in range(200):
+        miles = radius * rng.random()
+        point = destination(lat, lon, miles, rng.uniform(0, 360))
+        assert geo.haversine_miles(lat, lon, *point) == pytest.approx(miles, abs=1e-6)
+        assert in_box(box, *point)
+
+
+def test_bounding_box_splits_at_the_antimeridian():
+    _, _, lon_ranges = geo.bounding_box(0, 179.9, 50)
+    assert len(lon_ranges) == 2
+    assert lon_ranges[0][1] == 180 and lon_ranges[1][0] == -180
+
+
+def test_bounding_box_covers_every_longitude_near_a_pole():
+    assert geo.bounding_box(89.9, 0, 50)[2] == ((-180, 180),)
+
+
+def test_nearest_keeps_facilities_in_range_closest_first():
+    facilities = [
+        Facility(name="far", latitude=49.7, longitude=-113.8),
+        Facility(name="near", latitude=48.71, longitude=-113.8),
+        Facility(name="middle", latitude=48.9, longitude=-113.8),
+        Facility(name="unknown"),
+    ]
+    found = geo.nearest(facilities, 48.7, -113.8, 50)
+    assert [f.name for f, _ in found] == ["near", "middle"]
+    assert found[0][1] == pytest.approx(0.69, abs=0.01)
+
+
+@pytest.mark.parametrize("rtree", [True, False])
+def test_within_box_finds_the_same_facilities_either_way(database, rtree):
+    db.init_db()
+    points = {
+        "glacier": (48.7, -113.8),
+        "fiji": (-17.8, 179.99),
+        "samoa": (-13.8, -179.9),
+    }
+    with db.Session.begin() as session:
+        org = Organization(name="NPS", abbr="NPS", org_id=1)
+        for i, (name, (lat, lon)) in enumerate(points.items()):
+            session.add(
+                Facility(
+                    name=name,
+                    facility_id=str(i),
+                    type=FacilityType.campground,
+                    org=org,
+                    latitude=lat,
+                    longitude=lon,
+                )
+            )
+
+    def names_near(lat: float, lon: float, radius: float) -> set[str]:
+        box = geo.bounding_box(lat, lon, radius)
+        with db.ReadSession.begin() as session:
+            stmt = geo.within_box(select(Facility), box, rtree)
+            return {f.name for f in session.scalars(stmt)}
+
+    assert names_near(48.5, -113.5, 50) == {"glacier"}
+    # across the antimeridian
+    assert names_near(-15.5, 180, 300) == {"fiji", "samoa"}
+    assert names_near(0, 0, 100) == set()
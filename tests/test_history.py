@@ -0,0 +1,103 @@
+import datetime
+import random
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import Session
+from sqlmodel import SQLModel, create_engine
+
+from recyoself import history
+from recyoself.division_availability import DivisionAvailability
+from recyoself.history import HistoryRecorder, compact_history, entity_history
+from recyoself.models import AvailabilityHistory, Division, HistoryEntityType
+
+START = datetime.date(2024, 7, 1)
+FIRST_POLL = datetime.datetime(2024, 6, 1, 12)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine, tables=[AvailabilityHistory.__table__])
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Makes the recorder stamp observations with `clock.now`."""
+    clock = SimpleNamespace(now=FIRST_POLL)
+    monkeypatch.setattr(history, "_utcnow", lambda: clock.now)
+    return clock
+
+
+def poll(division: Division, slots: list[int]) -> DivisionAvailability:
+    avail = DivisionAvailability(division)
+    for n, remaining in enumerate(slots):
+        avail.set_availability(START + datetime.timedelta(n), 4, remaining, False)
+    return avail
+
+
+def test_runs_decode_back_to_every_poll(session, clock):
+    rng = random.Random(3)
+    division = Division(name="Camp", division_id=42)
+    recorder = HistoryRecorder()
+    polls = []
+    for i in range(12):
+        clock.now = FIRST_POLL + datetime.timedelta(hours=i)
+        # mostly unchanged between polls, like real availability
+        slots = polls and list(polls[-1][1]) or [rng.randrange(3) for _ in range(5)]
+        slots[rng.randrange(5)] = rng.randrange(3)
+        polls.append((clock.now, slots))
+        recorder.observe_divisions([poll(division, slots)])
+        recorder.flush(session)
+
+    runs = entity_history(session, HistoryEntityType.division, "42")
+    changes = sum(
+        a[n] != b[n] for (_, a), (_, b) in zip(polls, polls[1:]) for n in range(5)
+    )
+    assert len(runs) == 5 + changes
+    for at, slots in polls:
+        for n, remaining in enumerate(slots):
+            night = START + datetime.timedelta(n)
+            seen = [r for r in runs if r.night == night]
+            assert [
+                r.status for r in seen if r.first_seen_at <= at <= r.last_seen_at
+            ] == [remaining]
+    assert all(r.is_open == (r.status > 0) for r in runs)
+
+
+def test_unchanged_polls_extend_one_run(session, clock):
+    division = Division(name="Camp", division_id=42)
+    recorder = HistoryRecorder()
+    for i in range(3):
+        clock.now = FIRST_POLL + datetime.timedelta(hours=i)
+        recorder.observe_divisions([poll(division, [1])])
+        assert recorder.flush(session) == (i == 0 and (1, 0) or (0, 1))
+
+    (run,) = entity_history(session, HistoryEntityType.division, "42")
+    assert (run.first_seen_at, run.last_seen_at) == (
+        FIRST_POLL,
+        FIRST_POLL + datetime.timedelta(hours=2),
+    )
+
+
+def test_compaction_merges_runs_left_with_the_same_status(session, clock):
+    division = Division(name="Camp", division_id=42)
+    recorder = HistoryRecorder()
+    for i, slots in enumerate([[1], [0], [1]]):
+        clock.now = FIRST_POLL + datetime.timedelta(days=i * 10)
+        recorder.observe_divisions([poll(division, slots)])
+        recorder.flush(session)
+    first, closed, reopened = entity_history(session, HistoryEntityType.division, "42")
+    session.delete(closed)
+    session.flush()
+
+    now = FIRST_POLL + datetime.timedelta(days=25)
+    assert compact_history(session, keep_days=60, now=now) == (0, 1)
+    (run,) = entity_history(session, HistoryEntityType.division, "42")
+    assert (run.status, run.first_seen_at, run.last_seen_at) == (
+        1,
+        FIRST_POLL,
+        FIRST_POLL + datetime.timedelta(days=20),
+    )
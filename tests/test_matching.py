@@ -0,0 +1,153 @@
+import datetime
+import itertools
+import random
+from typing import Iterator, Optional
+
+import pytest
+
+from recyoself.division_availability import DivisionAvailability
+from recyoself.matching import (
+    find_division_availability_date_matches,
+    iter_unordered_itinerary_matches,
+    rank_matches,
+)
+from recyoself.models import Division
+
+START = datetime.date(2024, 7, 1)
+
+
+def make_availabilities(
+    rng: random.Random, num_stops: int, num_days: int = 14
+) -> list[DivisionAvailability]:
+    availabilities = []
+    for i in range(num_stops):
+        avail = DivisionAvailability(Division(name=f"Stop {i}", division_id=100 + i))
+        for day in range(num_days):
+            slots = rng.random() < 0.6 and 1 or 0
+            avail.set_availability(START + datetime.timedelta(day), 2, slots, False)
+        availabilities.append(avail)
+    return availabilities
+
+
+def make_hops(rng: random.Random, num_stops: int) -> dict[int, set[int]]:
+    hops: dict[int, set[int]] = {100 + i: set() for i in range(num_stops)}
+    for a, b in itertools.combinations(range(num_stops), 2):
+        if rng.random() < 0.7:
+            hops[100 + a].add(100 + b)
+            hops[100 + b].add(100 + a)
+    return hops
+
+
+def brute_force_start_dates(
+    availabilities: list[DivisionAvailability],
+    fixed_entry: bool,
+    fixed_exit: bool,
+    hops: Optional[dict[int, set[int]]],
+) -> set[datetime.date]:
+    """Every start date with some feasible ordering, trying all permutations."""
+    num_stops = len(availabilities)
+    open_dates = [set(a.available_dates()) for a in availabilities]
+    starts = set()
+    for order in itertools.permutations(range(num_stops)):
+        if fixed_entry and order[0] != 0:
+            continue
+        if fixed_exit and num_stops > 1 and order[-1] != num_stops - 1:
+            continue
+        if hops is not None and any(
+            100 + b not in hops[100 + a] for a, b in zip(order, order[1:])
+        ):
+            continue
+        for start in open_dates[order[0]]:
+            if all(
+                start + datetime.timedelta(i) in open_dates[stop]
+                for i, stop in enumerate(order)
+            ):
+                starts.add(start)
+    return starts
+
+
+def assert_feasible(
+    match: list[tuple[DivisionAvailability, datetime.date]],
+    availabilities: list[DivisionAvailability],
+    fixed_entry: bool,
+    fixed_exit: bool,
+    hops: Optional[dict[int, set[int]]],
+) -> None:
+    stops = [avail for avail, _ in match]
+    assert sorted(id(a) for a in stops) == sorted(id(a) for a in availabilities)
+    if fixed_entry:
+        assert stops[0] is availabilities[0]
+    if fixed_exit:
+        assert stops[-1] is availabilities[-1]
+    for i, (avail, date) in enumerate(match):
+        assert date == match[0][1] + datetime.timedelta(i)
+        assert date in avail.available_dates()
+    if hops is not None:
+        for (a, _), (b, _) in zip(match, match[1:]):
+            assert b.division.division_id in hops[a.division.division_id]
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("num_stops", [1, 2, 4, 5])
+@pytest.mark.parametrize(
+    "fixed_entry,fixed_exit",
+    [(True, True), (True, False), (False, True), (False, False)],
+)
+@pytest.mark.parametrize("with_hops", [False, True])
+def test_unordered_matches_agree_with_brute_force(
+    seed, num_stops, fixed_entry, fixed_exit, with_hops
+):
+    rng = random.Random(seed)
+    availabilities = make_availabilities(rng, num_stops)
+    hops = with_hops and make_hops(rng, num_stops) or None
+
+    matches = list(
+        iter_unordered_itinerary_matches(availabilities, fixed_entry, fixed_exit, hops)
+    )
+
+    starts = [match[0][1] for match in matches]
+    assert starts == sorted(set(starts))
+    assert set(starts) == brute_force_start_dates(
+        availabilities, fixed_entry, fixed_exit, hops
+    )
+    for match in matches:
+        assert_feasible(match, availabilities, fixed_entry, fixed_exit, hops)
+
+
+def test_unordered_matches_with_fixed_ends_include_ordered_matches():
+    availabilities = make_availabilities(random.Random(7), 3, num_days=30)
+    ordered = find_division_availability_date_matches(availabilities)
+    unordered = list(iter_unordered_itinerary_matches(availabilities))
+    assert {m[0][1] for m in ordered} <= {m[0][1] for m in unordered}
+
+
+def test_rank_matches_orders_by_score_then_input_order():
+    scores = [3, 1, 2, 1, 0, 3, 2]
+    ranked = list(rank_matches(range(len(scores)), scores.__getitem__))
+    assert ranked == [4, 1, 3, 2, 6, 0, 5]
+
+
+@pytest.mark.parametrize("limit", [None, 0, 1, 3, 7, 20])
+@pytest.mark.parametrize("best_score", [None, 0])
+def test_rank_matches_limit_keeps_the_best(limit, best_score):
+    rng = random.Random(limit or 0)
+    scores = [rng.randrange(3) for _ in range(15)]
+    expected = sorted(range(len(scores)), key=lambda i: (scores[i], i))
+    ranked = list(
+        rank_matches(range(len(scores)), scores.__getitem__, best_score, limit)
+    )
+    assert ranked == expected[:limit]
+
+
+def test_rank_matches_stops_consuming_once_limit_is_reached():
+    consumed = []
+
+    def matches() -> Iterator[int]:
+        for i in range(10):
+            consumed.append(i)
+            yield i
+
+    # 0 and 2 can't be beaten, so the rest are never fetched
+    ranked = list(rank_matches(matches(), lambda i: i % 2, best_score=0, limit=2))
+    assert ranked == [0, 2]
+    assert consumed == [0, 1, 2]
@@ -0,0 +1,66 @@
+import pytest
+from click.testing import CliRunner
+from sqlmodel import select
+
+from recyoself import db
+from recyoself.cli import cli
+from recyoself.commands import common
+from recyoself.models import Facility, Itinerary
+
+
+def run_cli(*args: str) -> str:
+    result = CliRunner().invoke(cli, list(args), catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_list_facilities_loads_rec_areas_and_orgs_in_one_query(seeded):
+    with db.count_queries(limit=1):
+        output = run_cli("list-facilities")
+    assert output.count("Org: National Park Service (NPS)") == 2
+
+
+def test_list_lotteries_loads_facilities_in_one_query(seeded):
+    with db.count_queries(limit=1):
+        output = run_cli("list-lotteries")
+    assert "Facility: Apgar Campground (2001)" in output
+
+
+def test_list_itineraries_loads_divisions_with_them(seeded):
+    with db.count_queries(limit=2):
+        output = run_cli("list-itineraries")
+    assert "loop (Glacier Wilderness Permits)" in output
+    assert "3. Camp 4" in output
+
+
+def test_with_divisions_loads_divisions_and_permits_up_front(seeded):
+    with db.ReadSession.begin() as session, db.count_queries(limit=2):
+        stmt = select(Itinerary).options(Itinerary.with_divisions())
+        stops = {
+            i.name: [(d.name, d.permit.name) for d in i.divisions]
+            for i in session.scalars(stmt)
+        }
+    assert stops["north"] == [
+        (f"Camp {n}", "Glacier Wilderness Permits") for n in (1, 2, 3)
+    ]
+
+
+def test_campsites_by_id_looks_up_a_chunk_per_query(seeded, monkeypatch):
+    monkeypatch.setattr(common, "CHUNK_SIZE", 2)
+    with db.ReadSession.begin() as session:
+        campground = session.scalars(
+            select(Facility).where(Facility.facility_id == "2001")
+        ).one()
+        with db.count_queries(limit=3):
+            campsites = common.campsites_by_id(
+                session, campground, ["5", "1", "2", "3", "4", "3", "404"]
+            )
+        assert {i: c.name for i, c in campsites.items()} == {
+            str(i): f"{i:03}" for i in range(1, 6)
+        }
+
+
+def test_count_queries_fails_past_its_limit(seeded):
+    with pytest.raises(AssertionError, match="1 queries run, expected at most 0"):
+        with db.count_queries(limit=0):
+            run_cli("list-lotteries")
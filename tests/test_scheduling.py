@@ -0,0 +1,129 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from recyoself import scheduling
+from recyoself.scheduling import (
+    HOT_LEAD,
+    HOT_SPAN,
+    UTC,
+    AdaptiveSchedule,
+    RequestBudget,
+    release_moments,
+)
+
+NOW = datetime.datetime(2024, 7, 1, 12, tzinfo=UTC)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Makes `RequestBudget` see `clock.now` seconds, which sleeping advances."""
+    clock = SimpleNamespace(now=1000.0, sleeps=[])
+
+    def sleep(seconds: float) -> None:
+        clock.sleeps.append(seconds)
+        clock.now += seconds
+
+    fake_time = SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep)
+    monkeypatch.setattr(scheduling, "time", fake_time)
+    return clock
+
+
+def test_budget_needs_a_positive_rate():
+    with pytest.raises(ValueError):
+        RequestBudget(0)
+
+
+def test_budget_allows_a_burst_then_refills_at_its_rate(clock):
+    budget = RequestBudget(rate=60, burst=5)
+    assert [budget.try_acquire() for _ in range(6)] == [True] * 5 + [False]
+
+    clock.now += 2.5
+    assert budget.available == pytest.approx(2.5)
+    assert budget.try_acquire(2)
+    assert not budget.try_acquire()
+
+    # never more than the burst, however long it sat idle
+    clock.now += 3600
+    assert budget.available == 5
+
+
+def test_budget_burst_defaults_to_a_minute_of_requests(clock):
+    assert RequestBudget(rate=30).burst == 30
+    assert RequestBudget(rate=0.5).burst == 1
+
+
+def test_acquire_sleeps_until_enough_tokens_refill(clock):
+    budget = RequestBudget(rate=30, burst=2)
+    budget.acquire(2)
+    assert clock.sleeps == []
+
+    budget.acquire()
+    assert clock.sleeps == [pytest.approx(2)]
+    assert budget.available == pytest.approx(0)
+
+
+def test_quiet_checks_back_off_up_to_the_max():
+    schedule = AdaptiveSchedule(interval=60, min_interval=10, max_interval=300)
+    delays = [schedule.next_delay(False, NOW) for _ in range(4)]
+    assert delays == [120, 240, 300, 300]
+    assert schedule.next_delay(True, NOW) == 60
+
+
+def test_frequent_changes_shorten_the_wait():
+    schedule = AdaptiveSchedule(interval=600, min_interval=10, max_interval=3600)
+    for minutes in (0, 4, 8):
+        delay = schedule.next_delay(True, NOW + datetime.timedelta(minutes=minutes))
+    assert schedule.change_gap(NOW + datetime.timedelta(minutes=8)) == 240
+    # twice per expected change
+    assert delay == 120
+
+    # changes older than the window stop counting
+    later = NOW + scheduling.CHANGE_WINDOW + datetime.timedelta(minutes=5)
+    assert schedule.change_gap(later) is None
+
+
+def test_hot_moments_poll_at_the_min_interval():
+    moment = NOW + datetime.timedelta(hours=1)
+    schedule = AdaptiveSchedule(
+        interval=600, min_interval=10, max_interval=3600, hot_moments=[moment]
+    )
+    assert schedule.is_hot(moment - HOT_LEAD)
+    assert schedule.is_hot(moment + HOT_SPAN)
+    assert not schedule.is_hot(moment + HOT_SPAN + datetime.timedelta(seconds=1))
+    assert schedule.next_delay(False, moment) == 10
+
+    # a wait never runs past the start of the next hot moment
+    almost = moment - HOT_LEAD - datetime.timedelta(minutes=3)
+    assert schedule.next_delay(False, almost) == 180
+
+
+def test_naive_hot_moments_are_utc():
+    schedule = AdaptiveSchedule(
+        interval=600,
+        min_interval=10,
+        max_interval=3600,
+        hot_moments=[NOW.replace(tzinfo=None)],
+    )
+    assert schedule.is_hot(NOW)
+
+
+def test_daily_releases_recur_around_now():
+    local = (NOW + datetime.timedelta(minutes=10)).astimezone()
+    moments = release_moments([local.time().isoformat("minutes")], NOW)
+    assert len(moments) == 3
+    assert NOW + datetime.timedelta(minutes=10) in moments
+    assert [b - a for a, b in zip(moments, moments[1:])] == [
+        datetime.timedelta(days=1)
+    ] * 2
+
+    schedule = AdaptiveSchedule(
+        interval=600, min_interval=10, max_interval=3600, releases=[local.time()]
+    )
+    assert schedule.next_delay(False, NOW) == (10 * 60 - HOT_LEAD.seconds)
+
+
+def test_one_off_releases_happen_once():
+    release = NOW + datetime.timedelta(days=3)
+    assert release_moments([release], NOW) == [release]
@@ -0,0 +1,95 @@
+import pytest
+from click.testing import CliRunner
+from sqlmodel import select
+
+from recyoself import db, search_index
+from recyoself.cli import cli
+from recyoself.models import Division, Facility, FacilityType, Lottery, Organization
+
+
+@pytest.fixture
+def indexed(seeded):
+    assert db.ensure_search_index()
+    return seeded
+
+
+def search(entity: str, text: str) -> list[str]:
+    model = {"facility": Facility, "lottery": Lottery, "division": Division}[entity]
+    with db.ReadSession.begin() as session:
+        stmt = search_index.apply(select(model), model, entity, text)
+        return [row.name for row in session.scalars(stmt)]
+
+
+def test_match_query_makes_every_word_a_prefix():
+    assert search_index.match_query("glac  nat!") == '"glac"* "nat"*'
+    assert search_index.match_query("--") is None
+    assert not search_index.has_words("  ,. ")
+    assert not search_index.has_words(None)
+    assert search_index.has_words("ab")
+
+
+def test_prefixes_of_every_word_must_match(indexed):
+    assert search("facility", "apg camp") == ["Apgar Campground"]
+    assert search("facility", "apg permits") == []
+    assert search("division", "camp 3") == ["Camp 3"]
+
+
+def test_names_outrank_extra_text(indexed):
+    # the permit has "Glacier" in its name, the campground only through its rec area
+    assert search("facility", "glacier") == [
+        "Glacier Wilderness Permits",
+        "Apgar Campground",
+    ]
+
+
+def test_punctuation_matches_nothing(indexed):
+    assert search("facility", "?!") == []
+
+    result = CliRunner().invoke(cli, ["search", "?!"])
+    assert result.exit_code == 2
+    assert "QUERY needs at least one word" in result.output
+
+
+def test_triggers_index_new_and_renamed_rows(indexed):
+    with db.Session.begin() as session:
+        (org,) = session.scalars(select(Organization)).all()
+        session.add(
+            Facility(
+                name="Many Glacier Campground",
+                facility_id="2002",
+                type=FacilityType.campground,
+                org=org,
+            )
+        )
+    assert search("facility", "many") == ["Many Glacier Campground"]
+
+    with db.Session.begin() as session:
+        facility = session.scalars(
+            select(Facility).where(Facility.facility_id == "2002")
+        ).one()
+        facility.name = "Two Medicine Campground"
+    assert search("facility", "many") == []
+    assert search("facility", "two med") == ["Two Medicine Campground"]
+
+
+def test_search_command_mixes_entities_by_rank(indexed):
+    result = CliRunner().invoke(cli, ["search", "apgar"])
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [
+        "Facility: Apgar Campground (Campground, 2001)",
+        "Lottery: Apgar Summer Lottery (abc)",
+    ]
+
+    result = CliRunner().invoke(cli, ["search", "-t", "division", "lake mcd"])
+    assert result.exit_code == 0, result.output
+    assert len(result.output.splitlines()) == 6
+
+
+def test_list_lotteries_full_text_search(indexed):
+    result = CliRunner().invoke(cli, ["list-lotteries", "summer camp"])
+    assert result.exit_code == 0, result.output
+    assert "Apgar Summer Lottery" in result.output
+
+    result = CliRunner().invoke(cli, ["list-lotteries", "winter"])
+    assert result.exit_code == 0, result.output
+    assert "Apgar Summer Lottery" not in result.output
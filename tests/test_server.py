@@ -0,0 +1,150 @@
+import datetime
+import threading
+
+import pytest
+import requests
+
+from recyoself.server import AvailabilityServer
+
+from .conftest import campsite_is_open, division_is_open
+
+MATCHES = "/itineraries/loop/matches?start=2024-07-01&end=2024-07-20"
+
+
+@pytest.fixture
+def queries(seeded, fake_recgov):
+    return AvailabilityServer()
+
+
+@pytest.fixture
+def base(queries):
+    httpd = queries.serve(0)
+    thread = threading.Thread(
+        target=httpd.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def get(base):
+    def get(path: str) -> tuple[int, dict]:
+        response = requests.get(f"{base}{path}", timeout=10)
+        return response.status_code, response.json()
+
+    return get
+
+
+def test_facilities(get):
+    status, body = get("/facilities?q=apgar")
+    assert status == 200
+    assert [f["facility_id"] for f in body["results"]] == ["2001"]
+
+    status, body = get("/facilities?type=permit")
+    assert [f["name"] for f in body["results"]] == ["Glacier Wilderness Permits"]
+
+    status, body = get("/facilities?near=48.5,-114&radius=10")
+    (facility,) = body["results"]
+    assert facility["name"] == "Apgar Campground"
+    assert facility["distance"] == pytest.approx(2.1, abs=0.1)
+
+
+def test_itinerary_matches(get):
+    status, body = get(MATCHES)
+    assert status == 200
+    first_nights = [r["first_night"] for r in body["results"]]
+    assert first_nights and first_nights == sorted(first_nights)
+    for record in body["results"]:
+        assert record["itinerary"] == "loop" and not record["reversed"]
+        for night in record["nights"]:
+            date = datetime.date.fromisoformat(night["date"])
+            assert division_is_open(night["division_id"], date)
+
+
+def test_reversable_matches_are_ranked_together(get):
+    _, forward = get(MATCHES)
+    _, both = get(f"{MATCHES}&reversable=true")
+    records = both["results"]
+    assert {r["reversed"] for r in records} == {False, True}
+    assert [r for r in records if not r["reversed"]] == forward["results"]
+    first_nights = [r["first_night"] for r in records]
+    assert first_nights == sorted(first_nights)
+
+    _, limited = get(f"{MATCHES}&reversable=true&limit=3")
+    assert limited["results"] == records[:3]
+
+
+def test_campsite_blocks(get):
+    status, body = get(
+        "/campgrounds/2001/blocks?start=2024-07-01&end=2024-07-04&limit=4"
+    )
+    assert status == 200
+    records = body["results"]
+    assert len(records) == 4
+    for record in records:
+        date = datetime.date.fromisoformat(record["first_night"])
+        assert campsite_is_open(int(record["campsite_id"]), date)
+        assert (record["campground"], record["loop"]) == ("Apgar Campground", "A")
+
+
+def test_metrics(base, get):
+    get(MATCHES)
+    response = requests.get(f"{base}/metrics", timeout=10)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert "recyoself_requests_total" in response.text
+
+
+@pytest.mark.parametrize(
+    "path,status,error",
+    [
+        ("/nowhere", 404, "No such endpoint: /nowhere"),
+        (
+            "/itineraries/nowhere/matches?start=2024-07-01",
+            404,
+            'No itinerary found with name "nowhere"',
+        ),
+        (
+            "/campgrounds/4675321/blocks?start=2024-07-01",
+            404,
+            "Could not find Campground (Facility) with ID 4675321",
+        ),
+        (
+            "/itineraries/loop/matches?start=2024-07-01&lottery=xyz",
+            404,
+            'No lottery with id "xyz" for itinerary "loop"',
+        ),
+        ("/itineraries/loop/matches", 400, "start is required"),
+        (
+            "/itineraries/loop/matches?start=July",
+            400,
+            '"July" is not a date (YYYY-MM-DD)',
+        ),
+        (
+            "/itineraries/loop/matches?start=2024-07-02&end=2024-07-01",
+            400,
+            "end must not be before start",
+        ),
+        (f"{MATCHES}&limit=0", 400, "limit is too small"),
+        (f"{MATCHES}&limit=ten", 400, 'limit must be a number, not "ten"'),
+        ("/facilities?type=castle", 400, 'Unknown facility type "castle"'),
+        (
+            "/facilities?near=north",
+            400,
+            'near must be LAT,LON, e.g. 48.7,-113.8, not "north"',
+        ),
+    ],
+)
+def test_errors(get, path, status, error):
+    assert get(path) == (status, {"error": error})
+
+
+def test_unexpected_errors_are_logged(get, queries, monkeypatch, capsys):
+    def fail(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(queries, "search_facilities", fail)
+    assert get("/facilities") == (500, {"error": "Query failed"})
+    assert "/facilities failed:" in capsys.readouterr().err
@@ -0,0 +1,63 @@
+import datetime
+
+from recyoself.snapshots import AvailabilitySnapshot, SnapshotStore
+
+ENTITY = "division:1"
+START = datetime.date(2024, 7, 1)
+
+
+def day(n: int) -> int:
+    return (START + datetime.timedelta(n)).toordinal()
+
+
+def check(open_days: set[int], fetched_days: int) -> AvailabilitySnapshot:
+    """A check that fetched the first `fetched_days` nights."""
+    snapshot = AvailabilitySnapshot()
+    snapshot.observe(
+        ENTITY,
+        ((START + datetime.timedelta(n), n in open_days) for n in range(fetched_days)),
+    )
+    return snapshot
+
+
+def test_first_check_reports_every_opening():
+    delta = check({1, 3}, 10).diff(None)
+    assert delta.opened == {(ENTITY, day(1)), (ENTITY, day(3))}
+    assert not delta.closed
+
+
+def test_partial_fetch_does_not_close_unfetched_openings():
+    previous = check({1, 8}, 10)
+    current = check({1, 2}, 5)
+
+    delta = current.diff(previous)
+    assert delta.opened == {(ENTITY, day(2))}
+    assert not delta.closed
+
+    merged = current.merged_into(previous)
+    assert merged.openings[ENTITY] == {day(1), day(2), day(8)}
+
+
+def test_partial_fetch_reports_closings_it_saw():
+    previous = check({1, 2, 8}, 10)
+    delta = check({2}, 5).diff(previous)
+    assert delta.closed == {(ENTITY, day(1))}
+    assert not delta.opened
+
+
+def test_unchanged_recheck_after_partial_fetch_is_empty():
+    first = check({1, 8}, 10)
+    second = check({1}, 5).merged_into(first)
+    assert not check({1, 8}, 10).diff(second)
+
+
+def test_store_round_trips_merged_snapshots(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    assert store.update("cli:test", check({1, 8}, 10)).opened == {
+        (ENTITY, day(1)),
+        (ENTITY, day(8)),
+    }
+    assert not store.update("cli:test", check({1}, 5))
+    assert store.update("cli:test", check({8, 9}, 10)).opened == {(ENTITY, day(9))}
+    assert store.load("cli:test").openings[ENTITY] == {day(8), day(9)}
+    assert store.load("watch:test") is None
@@ -0,0 +1,106 @@
+import datetime
+
+import pytest
+
+from recyoself.watch import Watch, load_watches
+
+WATCH_FILE = """
+interval = 300
+releases = ["07:00"]
+
+[[itinerary]]
+name = "Loop"
+start = 2024-07-01
+end = "2024-07-31"
+lottery_id = "abc"
+
+[[campground]]
+id = 247592
+num_days = 2
+start = 2024-09-01T00:00:00
+releases = [08:30:00, 2024-08-01T09:00:00-06:00]
+"""
+
+
+def load(tmp_path, text: str) -> list[Watch]:
+    path = tmp_path / "watches.toml"
+    path.write_text(text)
+    return load_watches(str(path))
+
+
+def test_load_watches(tmp_path):
+    itinerary, campground = load(tmp_path, WATCH_FILE)
+
+    assert (itinerary.kind, itinerary.target) == ("itinerary", "Loop")
+    assert itinerary.start_date == datetime.date(2024, 7, 1)
+    assert itinerary.end_date == datetime.date(2024, 7, 31)
+    assert (itinerary.interval, itinerary.lottery_id) == (300, "abc")
+    assert itinerary.releases == [datetime.time(7)]
+
+    assert (campground.kind, campground.target) == ("campground", "247592")
+    assert campground.start_date == campground.end_date == datetime.date(2024, 9, 1)
+    assert campground.releases == [
+        datetime.time(8, 30),
+        datetime.datetime.fromisoformat("2024-08-01T09:00:00-06:00"),
+    ]
+
+
+def test_defaults_are_copied_into_each_watch(tmp_path):
+    first, second = load(tmp_path, WATCH_FILE)
+    first.releases.append(datetime.time(12))
+    assert second.releases != first.releases
+
+
+def test_single_release_is_not_split(tmp_path):
+    (watch,) = load(
+        tmp_path, 'releases = "08:00"\n[[itinerary]]\nname = "Loop"\nstart = 2024-07-01'
+    )
+    assert watch.releases == [datetime.time(8)]
+
+
+@pytest.mark.parametrize(
+    "text,error",
+    [
+        ("[[itinerary]]\nstart = 2024-07-01", r"\[\[itinerary\]\] number 1 needs"),
+        ("[[campground]]\nid = 1", r'\[\[campground\]\] "1" needs both id and start'),
+        (
+            '[[itinerary]]\nname = "Loop"\nstart = 2024-07-01\nnum_nights = 2',
+            r'"Loop" has unknown keys: num_nights',
+        ),
+        (
+            '[[itinerary]]\nname = "Loop"\nstart = "July 1st"',
+            r"needs start as a date",
+        ),
+        (
+            '[[itinerary]]\nname = "Loop"\nstart = 2024-07-02\nend = 2024-07-01',
+            r'"Loop" ends before it starts',
+        ),
+        (
+            'releases = ["8am"]\n[[itinerary]]\nname = "Loop"\nstart = 2024-07-01',
+            r"\"Loop\" needs releases as times .* not '8am'",
+        ),
+        (
+            '[[itinerary]]\nname = "Loop"\nstart = 2024-07-01\nreleases = [2024-07-01]',
+            r"needs releases as times",
+        ),
+    ],
+)
+def test_invalid_watches_name_the_entry(tmp_path, text, error):
+    with pytest.raises(ValueError, match=error):
+        load(tmp_path, text)
+
+
+def test_keys_tell_watches_apart():
+    start = datetime.date(2024, 7, 1)
+    watches = [
+        Watch("itinerary", "Loop", start, start),
+        Watch("itinerary", "Loop", start, start, lottery_id="abc"),
+        Watch("itinerary", "Loop", start, start, lottery_id="def"),
+        Watch("itinerary", "Loop", start, start, reversable=True),
+        Watch("campground", "Loop", start, start),
+        Watch("campground", "Loop", start, start, num_days=2),
+        Watch("campground", "Loop", start, start, include_nyr=True),
+    ]
+    assert len({w.key for w in watches}) == len(watches)
+    # settings that don't change what's checked don't change the key
+    assert Watch("itinerary", "Loop", start, start, interval=60).key == watches[0].key